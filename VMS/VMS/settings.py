@@ -10,8 +10,11 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.1/ref/settings/
 """
 
+import os
 from pathlib import Path
 
+from django.core.exceptions import ImproperlyConfigured
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -44,12 +47,33 @@ INSTALLED_APPS = [
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'app.api.authentication.CachedTokenAuthentication',
+    ],
+    # orjson is used when installed, the stdlib json module otherwise
+    'DEFAULT_RENDERER_CLASSES': [
+        'app.api.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'app.api.parsers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
     ],
 }
 
+# Vendor metric recompute on PurchaseOrder save:
+# 'immediate' - update the metrics inside the request (default)
+# 'deferred'  - only queue the vendor; run `manage.py process_metric_queue`
+METRICS_RECOMPUTE_MODE = 'immediate'
+
+# Per-request profiling (app/instrumentation.py): Server-Timing headers and
+# rolling per-view stats at /api/stats/. Off unless enabled.
+REQUEST_PROFILING = False
+REQUEST_PROFILING_WINDOW = 1000
+
 
 MIDDLEWARE = [
+    'app.instrumentation.RequestProfilingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -90,6 +114,82 @@ DATABASES = {
     }
 }
 
+# Database profiles, selected with the VMS_DB_PROFILE environment variable.
+# 'development' keeps Django's SQLite defaults. 'production' keeps
+# connections open across requests and runs SQLITE_PRAGMAS on every new
+# connection (app/db.py): WAL so readers and the writer do not block each
+# other, fsync only at checkpoints, a 64 MiB page cache, 256 MiB of
+# memory-mapped reads, and waiting up to 5s for a lock rather than failing
+# with "database is locked".
+DATABASE_PROFILES = {
+    'development': {
+        'DATABASE': {},
+        'SQLITE_PRAGMAS': {},
+    },
+    'production': {
+        'DATABASE': {
+            'CONN_MAX_AGE': 600,
+            'CONN_HEALTH_CHECKS': True,
+        },
+        'SQLITE_PRAGMAS': {
+            'journal_mode': 'wal',
+            'synchronous': 'normal',
+            'busy_timeout': 5000,
+            'cache_size': -65536,
+            'mmap_size': 268435456,
+            'temp_store': 'memory',
+        },
+    },
+}
+
+DATABASE_PROFILE = os.environ.get('VMS_DB_PROFILE', 'development')
+if DATABASE_PROFILE not in DATABASE_PROFILES:
+    raise ImproperlyConfigured(
+        f"VMS_DB_PROFILE must be one of {', '.join(DATABASE_PROFILES)}, not {DATABASE_PROFILE!r}"
+    )
+DATABASES['default'].update(DATABASE_PROFILES[DATABASE_PROFILE]['DATABASE'])
+SQLITE_PRAGMAS = DATABASE_PROFILES[DATABASE_PROFILE]['SQLITE_PRAGMAS']
+
+# Read replica (app/db.py): set VMS_DB_REPLICA to the path of a copy of the
+# database, refreshed with `manage.py refresh_replica --loop`, and GET
+# requests and the performance endpoints read from it. The copy lags by up
+# to the refresh interval; writes, and reads after a write in the same
+# request, go to default.
+REPLICA_DATABASE = os.environ.get('VMS_DB_REPLICA')
+if REPLICA_DATABASE:
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'NAME': REPLICA_DATABASE,
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['app.db.ReadReplicaRouter']
+
+
+# Cache
+# https://docs.djangoproject.com/en/4.1/topics/cache/
+# 'performance' backs the vendor performance read-through cache and 'tokens'
+# the API token -> user cache (app/cache.py); locmem evicts least-recently-used
+# entries beyond MAX_ENTRIES.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'performance': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'vendor-performance',
+        'TIMEOUT': 60,
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
+    'tokens': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'auth-tokens',
+        'TIMEOUT': 300,
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.1/ref/settings/#auth-password-validators
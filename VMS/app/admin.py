@@ -1,3 +1,75 @@
-from django.contrib import admin
+from django import forms
+from django.contrib import admin, messages
+from django.http import HttpResponseRedirect
 
-# Register your models here.
+from .models import Vendor, PurchaseOrder, HistoricalPerformance, VersionConflict
+
+
+def _conflict_message(opts):
+    return (
+        f"This {opts.verbose_name} was changed by someone else since you loaded it. "
+        "Review the current values and save again."
+    )
+
+
+class VersionedAdminForm(forms.ModelForm):
+    """
+    Carries the version the editor loaded, so saving over someone else's
+    change is a form error rather than a silent overwrite
+    """
+    loaded_version = forms.IntegerField(widget=forms.HiddenInput, required=False)
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if self.instance.pk is not None:
+            self.fields['loaded_version'].initial = self.instance.version
+
+    def clean(self):
+        cleaned_data = super().clean()
+        loaded_version = cleaned_data.get('loaded_version')
+        if (
+            self.instance.pk is not None and loaded_version is not None
+            and loaded_version != self.instance.version
+        ):
+            raise forms.ValidationError(_conflict_message(self._meta.model._meta), code='conflict')
+        return cleaned_data
+
+
+class VersionedModelAdmin(admin.ModelAdmin):
+    """ModelAdmin for Versioned models: concurrent edits are reported, not a 500"""
+    form = VersionedAdminForm
+
+    def changeform_view(self, request, object_id=None, form_url='', extra_context=None):
+        try:
+            return super().changeform_view(request, object_id, form_url, extra_context)
+        except VersionConflict:
+            # The row changed between validating the form and saving it; the
+            # save (and its log entry) was rolled back
+            self.message_user(request, _conflict_message(self.opts), messages.ERROR)
+            return HttpResponseRedirect(request.get_full_path())
+
+
+@admin.register(Vendor)
+class VendorAdmin(VersionedModelAdmin):
+    list_display = ('vendor_code', 'name', 'on_time_delivery_rate', 'quality_rating_avg',
+                    'average_response_time', 'fulfillment_rate')
+    search_fields = ('vendor_code', 'name')
+
+
+@admin.register(PurchaseOrder)
+class PurchaseOrderAdmin(VersionedModelAdmin):
+    list_display = ('po_number', 'vendor', 'status', 'order_date', 'delivery_date', 'completed_date')
+    list_filter = ('status',)
+    search_fields = ('po_number',)
+    # One JOIN for the vendor column instead of a query per row, and no
+    # <select> of every vendor on the change form
+    list_select_related = ('vendor',)
+    raw_id_fields = ('vendor',)
+
+
+@admin.register(HistoricalPerformance)
+class HistoricalPerformanceAdmin(admin.ModelAdmin):
+    list_display = ('vendor', 'date', 'on_time_delivery_rate', 'quality_rating_avg',
+                    'average_response_time', 'fulfillment_rate')
+    list_select_related = ('vendor',)
+    raw_id_fields = ('vendor',)
@@ -0,0 +1,212 @@
+"""
+Async read endpoints for VMS API
+
+DRF views are synchronous, so under ASGI each request holds a worker thread
+for its whole lifetime. These views are plain Django async views that reuse
+the API's authentication, filters, serializers, pagination and JSON
+rendering, and read through the async ORM (``aget``, ``async for``), so one
+worker process can keep many slow clients in flight. Responses match the synchronous
+endpoints byte for byte, except that pagination links point at the async
+endpoint.
+"""
+from django.http import Http404, HttpResponse
+from django.shortcuts import aget_object_or_404
+from django.views import View
+from rest_framework import exceptions, status
+from rest_framework.request import Request
+
+from app.cache import aget_vendor_performance
+from app.db import replica_reads
+from app.models import Vendor, PurchaseOrder
+from .authentication import CachedTokenAuthentication
+from .conditional import (
+    LIST_VALIDATOR_HEADERS,
+    is_conditional,
+    not_modified,
+    object_etag,
+    page_etag,
+    set_validators,
+    validator_query,
+)
+from .filters import parse_sparse_fields
+from .pagination import KeysetPagination
+from .renderers import dumps
+from .serializers import VendorSerializer, PurchaseOrderSerializer, values_serializer
+from .viewsets import PurchaseOrderListCreate, VendorListCreate, etag_matches
+
+
+def render(data, status_code=status.HTTP_200_OK, headers=None):
+    """Render ``data`` the way FastJSONRenderer does for the sync views"""
+    if data is None:
+        response = HttpResponse(status=status_code, headers=headers)
+        del response['Content-Type']
+        return response
+    return HttpResponse(
+        dumps(data),
+        status=status_code,
+        headers=headers,
+        content_type='application/json',
+    )
+
+
+class AsyncReadAPIView(View):
+    """
+    Base class for async read-only endpoints.
+
+    Authenticates with CachedTokenAuthentication (``IsAuthenticated``
+    semantics), reads from the replica database when one is configured
+    (app/db.py) and turns API exceptions into JSON error responses the same
+    way DRF's exception handler does.
+    """
+    http_method_names = ['get', 'head']
+    authenticator = CachedTokenAuthentication()
+
+    async def dispatch(self, request, *args, **kwargs):
+        try:
+            with replica_reads():
+                await self.authenticate(request)
+                return await super().dispatch(request, *args, **kwargs)
+        except Http404 as exc:
+            return self.handle_exception(exceptions.NotFound(*exc.args))
+        except exceptions.APIException as exc:
+            return self.handle_exception(exc)
+
+    async def authenticate(self, request):
+        result = await self.authenticator.aauthenticate(request)
+        if result is None:
+            raise exceptions.NotAuthenticated()
+        request.user, request.auth = result
+
+    def handle_exception(self, exc):
+        headers = {}
+        if isinstance(exc, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)):
+            headers['WWW-Authenticate'] = self.authenticator.authenticate_header(None)
+        data = exc.detail if isinstance(exc.detail, (list, dict)) else {'detail': exc.detail}
+        return render(data, exc.status_code, headers)
+
+
+class AsyncListAPIView(AsyncReadAPIView):
+    """
+    List endpoint with the same filtering, ordering, sparse fieldsets and
+    opt-in keyset pagination as the sync views
+    """
+    queryset = None
+    serializer_class = None
+    keyset_ordering = ('id',)
+    filter_backends = []
+
+    async def get(self, request):
+        drf_request = Request(request)
+        queryset = self.queryset.all()
+        for backend in self.filter_backends:
+            queryset = backend().filter_queryset(drf_request, queryset, self)
+        serializer = values_serializer(
+            self.serializer_class, parse_sparse_fields(drf_request, self.serializer_class)
+        )
+        keys = (*queryset.query.order_by, *self.keyset_ordering, queryset.model._meta.pk.name)
+        paginator = KeysetPagination()
+        if is_conditional(request, LIST_VALIDATOR_HEADERS):
+            rows = validator_query(queryset, keys)
+            page = await paginator.apaginate_queryset(rows, drf_request, view=self)
+            if page is None:
+                etag = page_etag([row async for row in rows])
+            else:
+                etag = page_etag(page, paginator)
+            response = not_modified(request, etag)
+            if response is not None:
+                return response
+
+        rows = serializer.values(queryset, extra=(*keys, 'version'))
+        page = await paginator.apaginate_queryset(rows, drf_request, view=self)
+        if page is None:
+            rows = [row async for row in rows]
+            return render(serializer.many(rows), headers={'ETag': page_etag(rows)})
+        return render(
+            paginator.get_paginated_response(serializer.many(page)).data,
+            headers={'ETag': page_etag(page, paginator)},
+        )
+
+
+class AsyncRetrieveAPIView(AsyncReadAPIView):
+    """
+    Detail endpoint with the sync views' ETag / Last-Modified handling
+    (see ConditionalRetrieveMixin)
+    """
+    queryset = None
+    serializer_class = None
+    lookup_url_kwarg = 'pk'
+
+    async def get(self, request, **kwargs):
+        lookup = {'pk': kwargs[self.lookup_url_kwarg]}
+        if is_conditional(request):
+            validators = await self.queryset.filter(**lookup).values('version', 'last_modified').afirst()
+            if validators is None:
+                raise Http404(f"No {self.queryset.model._meta.object_name} matches the given query.")
+            response = not_modified(
+                request, object_etag(validators['version']), validators['last_modified']
+            )
+            if response is not None:
+                return response
+        instance = await aget_object_or_404(self.queryset, **lookup)
+        response = render(self.serializer_class(instance).data)
+        return set_validators(response, object_etag(instance.version), instance.last_modified)
+
+
+class AsyncVendorList(AsyncListAPIView):
+    """
+    List all vendors.
+    GET /api/async/vendors/  (same query parameters as /api/vendors/)
+    """
+    queryset = Vendor.objects.all()
+    serializer_class = VendorSerializer
+    filter_backends = VendorListCreate.filter_backends
+    filter_params = VendorListCreate.filter_params
+    ordering_fields = VendorListCreate.ordering_fields
+
+
+class AsyncVendorDetail(AsyncRetrieveAPIView):
+    """
+    Retrieve a vendor.
+    GET /api/async/vendors/{vendor_id}/
+    """
+    queryset = Vendor.objects.all()
+    serializer_class = VendorSerializer
+    lookup_url_kwarg = 'vendor_id'
+
+
+class AsyncVendorPerformance(AsyncReadAPIView):
+    """
+    Retrieve vendor performance metrics, from the shared performance cache.
+    GET /api/async/vendors/{vendor_id}/performance/
+    """
+
+    async def get(self, request, vendor_id):
+        entry = await aget_vendor_performance(vendor_id)
+        if entry is None:
+            return render({"message": "Vendor not found"}, status.HTTP_404_NOT_FOUND)
+        headers = {'ETag': entry['etag']}
+        if etag_matches(request, entry['etag']):
+            return render(None, status.HTTP_304_NOT_MODIFIED, headers)
+        return render(entry['data'], headers=headers)
+
+
+class AsyncPurchaseOrderList(AsyncListAPIView):
+    """
+    List all purchase orders.
+    GET /api/async/purchase_orders/  (same query parameters as /api/purchase_orders/)
+    """
+    queryset = PurchaseOrder.objects.all()
+    serializer_class = PurchaseOrderSerializer
+    keyset_ordering = PurchaseOrderListCreate.keyset_ordering
+    filter_backends = PurchaseOrderListCreate.filter_backends
+    filter_params = PurchaseOrderListCreate.filter_params
+    ordering_fields = PurchaseOrderListCreate.ordering_fields
+
+
+class AsyncPurchaseOrderDetail(AsyncRetrieveAPIView):
+    """
+    Retrieve a purchase order.
+    GET /api/async/purchase_orders/{pk}/
+    """
+    queryset = PurchaseOrder.objects.all()
+    serializer_class = PurchaseOrderSerializer
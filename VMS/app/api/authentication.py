@@ -0,0 +1,59 @@
+"""
+Authentication for VMS API
+"""
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication, get_authorization_header
+
+from app.cache import cache_token, get_cached_token
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    TokenAuthentication that remembers resolved tokens in the ``tokens``
+    cache alias (bounded LRU with a TTL, see settings.CACHES), so repeat
+    requests identify the caller without a database round trip.
+
+    Entries are dropped by the Token and User signals when a token is
+    deleted or regenerated, or its user is changed or deleted.
+    """
+
+    def authenticate_credentials(self, key):
+        cached = get_cached_token(key)
+        if cached is not None:
+            return cached
+        user, token = super().authenticate_credentials(key)
+        cache_token(key, user, token)
+        return user, token
+
+    async def aauthenticate(self, request):
+        """
+        ``authenticate`` for async views: same header parsing and errors,
+        with the token looked up through the async ORM on a cache miss.
+        """
+        auth = get_authorization_header(request).split()
+        if not auth or auth[0].lower() != self.keyword.lower().encode():
+            return None
+        if len(auth) == 1:
+            raise exceptions.AuthenticationFailed(_('Invalid token header. No credentials provided.'))
+        if len(auth) > 2:
+            raise exceptions.AuthenticationFailed(_('Invalid token header. Token string should not contain spaces.'))
+        try:
+            key = auth[1].decode()
+        except UnicodeError:
+            raise exceptions.AuthenticationFailed(
+                _('Invalid token header. Token string should not contain invalid characters.')
+            )
+
+        cached = get_cached_token(key)
+        if cached is not None:
+            return cached
+        model = self.get_model()
+        try:
+            token = await model.objects.select_related('user').aget(key=key)
+        except model.DoesNotExist:
+            raise exceptions.AuthenticationFailed(_('Invalid token.'))
+        if not token.user.is_active:
+            raise exceptions.AuthenticationFailed(_('User inactive or deleted.'))
+        cache_token(key, token.user, token)
+        return token.user, token
@@ -0,0 +1,77 @@
+"""
+Conditional GET for VMS API
+
+Vendors and purchase orders carry a ``version`` that every write bumps
+(saves, and the metric updates made by the PurchaseOrder signals) and a
+``last_modified`` timestamp (see ``app.models.Versioned``). Detail responses
+use them as ETag and Last-Modified; list responses get an ETag hashed from
+the (id, version) pairs of the rows on the page and whether there is a next
+or previous page. A request carrying If-None-Match / If-Modified-Since is
+checked against those columns alone - one indexed lookup, nothing
+serialized - before the full response is built.
+
+ETags are weak: the same version is served as JSON, indented JSON or the
+browsable API.
+"""
+import hashlib
+
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+VALIDATOR_HEADERS = ('HTTP_IF_NONE_MATCH', 'HTTP_IF_MODIFIED_SINCE')
+# Lists have no Last-Modified: a deleted row would not move it
+LIST_VALIDATOR_HEADERS = ('HTTP_IF_NONE_MATCH',)
+
+
+def is_conditional(request, headers=VALIDATOR_HEADERS):
+    """True for a GET/HEAD request that can be answered with 304"""
+    return request.method in ('GET', 'HEAD') and any(header in request.META for header in headers)
+
+
+def object_etag(version):
+    return f'W/"{version}"'
+
+
+def list_etag(rows, has_next=False, has_previous=False):
+    """ETag for a list of ``.values()`` rows holding at least id and version"""
+    payload = ','.join(f"{row['id']}.{row['version']}" for row in rows)
+    payload += f';{has_next:d}{has_previous:d}'
+    return 'W/"%s"' % hashlib.md5(payload.encode(), usedforsecurity=False).hexdigest()
+
+
+def page_etag(rows, paginator=None):
+    """``list_etag`` for a page from KeysetPagination, or all rows if ``paginator`` is None"""
+    if paginator is None:
+        return list_etag(rows)
+    return list_etag(rows, paginator.next_key is not None, paginator.previous_key is not None)
+
+
+def set_validators(response, etag, last_modified=None):
+    response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified.timestamp())
+    return response
+
+
+def not_modified(request, etag, last_modified=None):
+    """
+    A 304 Not Modified response if the request's validators match ``etag``
+    or ``last_modified`` (a datetime), else None.
+    """
+    response = get_conditional_response(
+        request,
+        etag=etag,
+        last_modified=None if last_modified is None else int(last_modified.timestamp()),
+    )
+    if response is None:
+        return None
+    return set_validators(response, etag, last_modified)
+
+
+def validator_query(queryset, keys=()):
+    """
+    The columns a list ETag is computed from, plus ``keys`` (ordering and
+    keyset columns, possibly ``-`` prefixed) for pagination
+    """
+    names = (*(name.lstrip('-') for name in keys), 'id', 'version')
+    return queryset.values(*dict.fromkeys(names))
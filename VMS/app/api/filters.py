@@ -0,0 +1,115 @@
+"""
+Filtering, ordering and sparse fieldsets for VMS API list endpoints
+"""
+import datetime
+
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import BaseFilterBackend
+
+
+def parse_date_param(request, name):
+    """Parse an ISO date or datetime query parameter, or return None"""
+    value = request.query_params.get(name)
+    if not value:
+        return None
+    parsed = parse_datetime(value)
+    if parsed is None:
+        date = parse_date(value)
+        if date is None:
+            raise ValidationError({name: "Expected an ISO 8601 date or datetime"})
+        parsed = datetime.datetime.combine(date, datetime.time.min)
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+def parse_int_param(request, name):
+    value = request.query_params.get(name)
+    if not value:
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        raise ValidationError({name: "Expected an integer"})
+
+
+def parse_list_param(request, name):
+    """Comma separated values, e.g. ``?status=pending,completed``"""
+    value = request.query_params.get(name)
+    if not value:
+        return None
+    return [part.strip() for part in value.split(',') if part.strip()] or None
+
+
+def parse_str_param(request, name):
+    return request.query_params.get(name) or None
+
+
+class QueryParamFilter(BaseFilterBackend):
+    """
+    Filter on the query parameters declared in the view's ``filter_params``,
+    a mapping of parameter name to ``(ORM lookup, parser)``. Parsers return
+    None for absent parameters and raise ValidationError for bad values.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        filters = {}
+        for name, (lookup, parse) in getattr(view, 'filter_params', {}).items():
+            value = parse(request, name)
+            if value is not None:
+                filters[lookup] = value
+        return queryset.filter(**filters) if filters else queryset
+
+
+def parse_sparse_fields(request, serializer_class, param='fields'):
+    """
+    The serializer fields requested with ``?fields=a,b``, in serializer
+    order, or None for all fields. Only read requests can be sparse.
+    """
+    if request.method not in ('GET', 'HEAD'):
+        return None
+    requested = parse_list_param(request, param)
+    if not requested:
+        return None
+    available = list(serializer_class().fields)
+    unknown = sorted(set(requested) - set(available))
+    if unknown:
+        raise ValidationError({param: f"Unknown fields: {', '.join(unknown)}"})
+    return [name for name in available if name in requested]
+
+
+def project_queryset(queryset, fields, ordering=()):
+    """
+    Restrict a queryset to the columns behind ``fields`` plus the ones it is
+    ordered (and may be keyset-paginated) by.
+    """
+    if fields is None:
+        return queryset
+    names = {*fields, *(name.lstrip('-') for name in (*queryset.query.order_by, *ordering))}
+    return queryset.only(*names)
+
+
+class SparseFieldsMixin:
+    """
+    View mixin for ``?fields=`` sparse fieldsets: the projection is applied
+    to the queryset with ``.only()`` and passed to the serializer through
+    ``context['fields']`` (see SparseFieldsSerializerMixin).
+    """
+
+    def get_sparse_fields(self):
+        if not hasattr(self, '_sparse_fields'):
+            self._sparse_fields = parse_sparse_fields(self.request, self.get_serializer_class())
+        return self._sparse_fields
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        return project_queryset(
+            queryset, self.get_sparse_fields(), getattr(self, 'keyset_ordering', ())
+        )
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['fields'] = self.get_sparse_fields()
+        return context
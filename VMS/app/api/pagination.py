@@ -0,0 +1,164 @@
+"""
+Pagination for VMS API
+"""
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from functools import reduce
+from operator import or_
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Opt-in keyset (cursor) pagination.
+
+    Pages are selected with ``WHERE (key) > (last key seen)`` on the
+    queryset's ordering, or the view's ``keyset_ordering`` when it has none,
+    with the primary key appended as a tiebreaker. A deep page costs the
+    same as the first one and cursors stay stable while rows are inserted.
+    Requests without ``cursor`` or ``page_size`` are not paginated.
+    """
+    page_size = 100
+    max_page_size = 1000
+    page_size_query_param = 'page_size'
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        page = self.page_queryset(queryset, request, view)
+        if page is None:
+            return None
+        return self.finish_page(list(page))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """``paginate_queryset`` for async views, fetching with ``async for``"""
+        page = self.page_queryset(queryset, request, view)
+        if page is None:
+            return None
+        return self.finish_page([row async for row in page])
+
+    def page_queryset(self, queryset, request, view=None):
+        """The unevaluated queryset for the requested page, or None"""
+        params = request.query_params
+        if self.cursor_query_param not in params and self.page_size_query_param not in params:
+            return None
+
+        self.request = request
+        self.ordering = self.get_ordering(queryset, view)
+        self.fields = [queryset.model._meta.get_field(name.lstrip('-')) for name in self.ordering]
+        self.page_size = self.get_page_size(request)
+        self.key, self.reverse = self.decode_cursor(request)
+
+        if self.key is not None:
+            queryset = queryset.filter(self.after(self.key, self.reverse))
+        ordering = [self._flip(name) if self.reverse else name for name in self.ordering]
+        return queryset.order_by(*ordering)[:self.page_size + 1]
+
+    def get_ordering(self, queryset, view):
+        """
+        The queryset's own ordering (e.g. from OrderingFilter) or the view's
+        ``keyset_ordering``, made unique with a primary key tiebreaker.
+        """
+        ordering = tuple(queryset.query.order_by) or tuple(getattr(view, 'keyset_ordering', ('id',)))
+        pk = queryset.model._meta.pk.name
+        if ordering[-1].lstrip('-') not in (pk, 'pk'):
+            ordering += (pk,)
+        return ordering
+
+    @staticmethod
+    def _flip(name):
+        return name[1:] if name.startswith('-') else f'-{name}'
+
+    def finish_page(self, rows):
+        """Trim the look-ahead row and work out the next/previous keys"""
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if self.reverse:
+            rows.reverse()
+
+        self.next_key = self.previous_key = None
+        if rows:
+            if has_more or self.reverse:
+                self.next_key = self.key_of(rows[-1])
+            if self.key is not None and (has_more or not self.reverse):
+                self.previous_key = self.key_of(rows[0])
+        return rows
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(max(page_size, 1), self.max_page_size)
+
+    def after(self, key, reverse=False):
+        """Q object selecting rows strictly after (or before) ``key``"""
+        names = [name.lstrip('-') for name in self.ordering]
+        descending = [name.startswith('-') for name in self.ordering]
+        clauses = []
+        for index, name in enumerate(names):
+            equal = {prefix: value for prefix, value in zip(names[:index], key)}
+            lookup = 'lt' if descending[index] != reverse else 'gt'
+            clauses.append(Q(**equal, **{f'{name}__{lookup}': key[index]}))
+        # The leading-column bound lets the database use an index range scan
+        leading = 'lte' if descending[0] != reverse else 'gte'
+        return Q(**{f'{names[0]}__{leading}': key[0]}) & reduce(or_, clauses)
+
+    def key_of(self, obj):
+        if isinstance(obj, dict):
+            # .values() rows are keyed by field name
+            return [obj[field.name] for field in self.fields]
+        return [getattr(obj, field.attname) for field in self.fields]
+
+    def encode_cursor(self, key, reverse):
+        values = [self._dump(value) for value in key]
+        payload = json.dumps({'k': values, 'r': reverse}, separators=(',', ':'))
+        return urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        try:
+            payload = json.loads(urlsafe_b64decode(encoded + '=' * (-len(encoded) % 4)))
+            values = payload['k']
+            if len(values) != len(self.fields):
+                raise ValueError
+            key = [field.to_python(value) for field, value in zip(self.fields, values)]
+            return key, bool(payload.get('r'))
+        except (KeyError, TypeError, ValueError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    @staticmethod
+    def _dump(value):
+        return value.isoformat() if hasattr(value, 'isoformat') else value
+
+    def get_link(self, key, reverse):
+        if key is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(key, reverse))
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_link(self.next_key, False),
+            'previous': self.get_link(self.previous_key, True),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
@@ -0,0 +1,46 @@
+"""
+JSON parsing for VMS API
+
+FastJSONParser is a drop-in replacement for DRF's JSONParser that decodes
+the request body as bytes in one call (orjson when installed, the stdlib
+otherwise) instead of through a text stream reader.
+"""
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.utils import json
+
+try:
+    import orjson
+except ImportError:  # optional accelerator
+    orjson = None
+
+
+def _stdlib_loads(data):
+    return json.loads(data, parse_constant=json.strict_constant)
+
+
+if orjson is not None:
+    def loads(data):
+        """Decode JSON ``data`` (bytes or str); NaN/Infinity are rejected"""
+        return orjson.loads(data)
+else:
+    def loads(data):
+        """Decode JSON ``data`` (bytes or str); NaN/Infinity are rejected"""
+        return _stdlib_loads(data)
+
+
+class FastJSONParser(JSONParser):
+    """
+    JSONParser using ``loads``. Bodies in a charset other than UTF-8 and
+    a non-default STRICT_JSON setting are left to JSONParser.
+    """
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        encoding = (parser_context or {}).get('encoding', settings.DEFAULT_CHARSET)
+        if not self.strict or encoding.lower().replace('_', '-') not in ('utf-8', 'utf8'):
+            return super().parse(stream, media_type, parser_context)
+        try:
+            return loads(stream.read())
+        except ValueError as exc:
+            raise ParseError('JSON parse error - %s' % str(exc))
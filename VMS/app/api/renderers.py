@@ -0,0 +1,112 @@
+"""
+JSON rendering for VMS API
+
+FastJSONRenderer is a drop-in replacement for DRF's JSONRenderer that
+encodes straight to bytes with orjson when it is installed, and otherwise
+reuses one compact stdlib encoder instead of building a new one per
+response. Datetimes, Decimals, UUIDs, querysets etc. go through DRF's own
+encoder hook, so the output matches JSONRenderer byte for byte. The only
+difference with orjson is the spelling of very large or very small floats
+(``1e-05`` vs ``0.00001``), which decode to the same value. NaN and Infinity,
+which orjson would write as ``null``, raise ValueError as with JSONRenderer.
+"""
+import datetime
+import math
+import uuid
+from decimal import Decimal
+
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:  # optional accelerator
+    orjson = None
+
+_encoder = JSONEncoder(ensure_ascii=False, allow_nan=False, separators=(',', ':'))
+
+
+def _escape_line_separators(ret):
+    # Same as JSONRenderer: U+2028/U+2029 are valid JSON but not valid
+    # JavaScript, so escape them. Both are rare; check before copying.
+    if b'\xe2\x80\xa8' in ret or b'\xe2\x80\xa9' in ret:
+        ret = ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+    return ret
+
+
+def _stdlib_dumps(data):
+    return _escape_line_separators(_encoder.encode(data).encode())
+
+
+# Values that cannot hold a NaN: exact types first (the common case), then
+# the ones DRF's encoder hook turns into strings
+_FINITE_TYPES = frozenset({str, int, bool, type(None)})
+_FINITE_CLASSES = (datetime.date, datetime.time, datetime.timedelta, uuid.UUID)
+
+
+def _has_non_finite(data):
+    """
+    True if ``data`` may hold a NaN or Infinity (float, or Decimal, which
+    DRF's encoder turns into a float). Containers are walked; objects left
+    to the encoder hook (querysets etc.) are not, so they count as True.
+    """
+    stack = [data]
+    while stack:
+        value = stack.pop()
+        kind = type(value)
+        if kind in _FINITE_TYPES:
+            continue
+        if kind is float:
+            if not math.isfinite(value):
+                return True
+        elif isinstance(value, dict):
+            stack.extend(value.values())
+        elif isinstance(value, (list, tuple)):
+            stack.extend(value)
+        elif isinstance(value, Decimal):
+            if not value.is_finite():
+                return True
+        elif not isinstance(value, _FINITE_CLASSES):
+            return True
+    return False
+
+
+if orjson is not None:
+    # Datetimes are passed through to DRF's encoder for its ISO 8601 format
+    # (milliseconds, 'Z' for UTC); Decimals and timedeltas go there anyway.
+    _OPTIONS = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+
+    def dumps(data):
+        """Compact JSON for ``data`` as UTF-8 bytes"""
+        try:
+            ret = orjson.dumps(data, default=_encoder.default, option=_OPTIONS)
+        except orjson.JSONEncodeError:
+            # e.g. integers wider than 64 bits, which the stdlib handles
+            return _stdlib_dumps(data)
+        if b'null' in ret and _has_non_finite(data):
+            # orjson wrote NaN/Infinity (or something the walk cannot see
+            # into) as null: let the stdlib encoder raise, or confirm
+            return _stdlib_dumps(data)
+        return _escape_line_separators(ret)
+else:
+    def dumps(data):
+        """Compact JSON for ``data`` as UTF-8 bytes"""
+        return _stdlib_dumps(data)
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer using ``dumps``. Requests for indented output
+    (``Accept: application/json; indent=4``) and non-default UNICODE_JSON,
+    COMPACT_JSON or STRICT_JSON settings are left to JSONRenderer.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if (
+            self.ensure_ascii or not self.compact or not self.strict
+            or self.get_indent(accepted_media_type, renderer_context or {})
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+        return dumps(data)
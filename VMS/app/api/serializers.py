@@ -1,19 +1,55 @@
 """
 Serializers for VMS API
 """
-from rest_framework import serializers
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.utils import timezone
+from rest_framework import ISO_8601, serializers
+from rest_framework.settings import api_settings
+from app.instrumentation import profile_section
 from app.models import Vendor, PurchaseOrder
 
 
-class VendorSerializer(serializers.ModelSerializer):
+class ProfiledSerializerMixin:
+    """Charge validation and representation time to the request profile"""
+
+    def is_valid(self, *args, **kwargs):
+        with profile_section('serializer'):
+            return super().is_valid(*args, **kwargs)
+
+    @property
+    def data(self):
+        with profile_section('serializer'):
+            return super().data
+
+
+class ProfiledListSerializer(ProfiledSerializerMixin, serializers.ListSerializer):
+    """ListSerializer used for ``many=True`` so list responses are profiled too"""
+
+
+class SparseFieldsSerializerMixin:
+    """Only expose the fields listed in ``context['fields']``, when given"""
+
+    def get_fields(self):
+        fields = super().get_fields()
+        requested = self.context.get('fields')
+        if requested is None:
+            return fields
+        return {name: field for name, field in fields.items() if name in requested}
+
+
+class VendorSerializer(SparseFieldsSerializerMixin, ProfiledSerializerMixin, serializers.ModelSerializer):
     """Serializer for Vendor model with all fields"""
     
     class Meta:
         model = Vendor
         fields = '__all__'
+        list_serializer_class = ProfiledListSerializer
 
 
-class VendorPerformanceSerializer(serializers.ModelSerializer):
+class VendorPerformanceSerializer(ProfiledSerializerMixin, serializers.ModelSerializer):
     """Serializer for Vendor performance metrics only"""
     
     class Meta:
@@ -25,11 +61,157 @@ class VendorPerformanceSerializer(serializers.ModelSerializer):
             'average_response_time',
             'fulfillment_rate'
         ]
+        list_serializer_class = ProfiledListSerializer
 
 
-class PurchaseOrderSerializer(serializers.ModelSerializer):
+class PurchaseOrderSerializer(SparseFieldsSerializerMixin, ProfiledSerializerMixin, serializers.ModelSerializer):
     """Serializer for PurchaseOrder model with all fields"""
     
     class Meta:
         model = PurchaseOrder
         fields = '__all__'
+        list_serializer_class = ProfiledListSerializer
+        # Validating the vendor only needs to know it exists
+        extra_kwargs = {'vendor': {'queryset': Vendor.objects.only('pk')}}
+
+
+class CachedVendorField(serializers.PrimaryKeyRelatedField):
+    """
+    Vendor primary key field that resolves ids from ``context['vendors']``
+    (an ``in_bulk`` dict) instead of issuing one query per row.
+    """
+
+    def to_internal_value(self, data):
+        vendors = self.context.get('vendors')
+        if vendors is None:
+            return super().to_internal_value(data)
+        if isinstance(data, bool):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        try:
+            return vendors[int(data)]
+        except KeyError:
+            self.fail('does_not_exist', pk_value=data)
+        except (TypeError, ValueError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+
+
+class PurchaseOrderBulkSerializer(PurchaseOrderSerializer):
+    """
+    PurchaseOrderSerializer for bulk upserts: po_number may already exist
+    and vendors are looked up once per batch
+    """
+    vendor = CachedVendorField(queryset=Vendor.objects.only('pk'))
+
+    class Meta(PurchaseOrderSerializer.Meta):
+        extra_kwargs = {'po_number': {'validators': []}}
+
+
+def _constant(converter):
+    return lambda tz: converter
+
+
+def _datetime_converter(field):
+    """
+    Precompiled DateTimeField.to_representation for ISO 8601 output, as a
+    factory taking the current timezone (looked up once per batch of rows)
+    """
+    output_format = getattr(field, 'format', api_settings.DATETIME_FORMAT)
+    if output_format is None or output_format.lower() != ISO_8601 or not settings.USE_TZ:
+        return _constant(field.to_representation)
+
+    def bind(current_timezone):
+        field_timezone = getattr(field, 'timezone', current_timezone)
+
+        def convert(value):
+            if value.tzinfo is None:
+                return field.to_representation(value)
+            if value.tzinfo is not field_timezone:
+                value = value.astimezone(field_timezone)
+            value = value.isoformat()
+            return value[:-6] + 'Z' if value.endswith('+00:00') else value
+        return convert
+    return bind
+
+
+# Fields whose to_representation is a no-op on the Python values the ORM
+# returns (PrimaryKeyRelatedField: values() already yields the key)
+_PASSTHROUGH_FIELDS = (
+    serializers.CharField,
+    serializers.BooleanField,
+    serializers.JSONField,
+    serializers.PrimaryKeyRelatedField,
+)
+
+
+class ValuesSerializer:
+    """
+    Read-only fast path for a ModelSerializer.
+
+    Builds the serializer's fields once, compiles one converter per field
+    (datetime formatting, float/int coercion; strings, JSON and foreign keys
+    pass straight through) and then turns ``.values()`` rows into the same
+    dicts ``serializer_class(many=True).data`` would produce, without model
+    instances or per-value field objects. Only plain model fields are
+    supported.
+    """
+
+    def __init__(self, serializer_class, fields=None):
+        serializer = serializer_class(context={'fields': fields})
+        self.plan = []
+        for name, field in serializer.fields.items():
+            self.plan.append((name, field.source, self.compile(field)))
+        self.sources = [source for _, source, _ in self.plan]
+
+    @staticmethod
+    def compile(field):
+        """A factory returning the field's converter, or None to pass values through"""
+        if isinstance(field, serializers.ManyRelatedField) or field.source == '*' or '.' in field.source:
+            raise ImproperlyConfigured(f"ValuesSerializer cannot serialize field '{field.field_name}'")
+        if isinstance(field, serializers.DateTimeField):
+            return _datetime_converter(field)
+        if isinstance(field, serializers.FloatField):
+            return _constant(float)
+        if isinstance(field, serializers.IntegerField):
+            return _constant(int)
+        if isinstance(field, _PASSTHROUGH_FIELDS):
+            return None
+        if isinstance(field, (serializers.DateField, serializers.DecimalField)):
+            return _constant(field.to_representation)
+        raise ImproperlyConfigured(f"ValuesSerializer cannot serialize field '{field.field_name}'")
+
+    def values(self, queryset, extra=()):
+        """
+        ``queryset.values()`` with the columns this serializer needs, plus
+        ``extra`` ones (e.g. ordering keys) that are fetched but not output.
+        """
+        extra = [name.lstrip('-') for name in extra if name.lstrip('-') not in self.sources]
+        return queryset.values(*self.sources, *dict.fromkeys(extra))
+
+    def bind(self):
+        current_timezone = timezone.get_current_timezone() if settings.USE_TZ else None
+        return [
+            (name, source, None if factory is None else factory(current_timezone))
+            for name, source, factory in self.plan
+        ]
+
+    def to_representation(self, row, plan=None):
+        data = {}
+        for name, source, convert in plan or self.bind():
+            value = row[source]
+            data[name] = value if convert is None or value is None else convert(value)
+        return data
+
+    def many(self, rows):
+        with profile_section('serializer'):
+            plan = self.bind()
+            return [self.to_representation(row, plan) for row in rows]
+
+
+@lru_cache(maxsize=64)
+def _values_serializer(serializer_class, fields):
+    return ValuesSerializer(serializer_class, fields=None if fields is None else list(fields))
+
+
+def values_serializer(serializer_class, fields=None):
+    """Shared ValuesSerializer for a serializer class and field selection"""
+    return _values_serializer(serializer_class, None if fields is None else tuple(fields))
@@ -2,13 +2,27 @@
 URL Configuration for VMS API
 """
 from django.urls import path
+from .async_views import (
+    AsyncVendorList,
+    AsyncVendorDetail,
+    AsyncVendorPerformance,
+    AsyncPurchaseOrderList,
+    AsyncPurchaseOrderDetail,
+)
 from .viewsets import (
     VendorListCreate,
+    VendorExport,
     VendorRetrieveUpdateDestroy,
     VendorPerformanceAPIView,
+    VendorPerformanceBatchAPIView,
+    VendorPerformanceHistoryAPIView,
+    VendorPerformanceWindowAPIView,
     PurchaseOrderListCreate,
+    PurchaseOrderBulkUpsert,
+    PurchaseOrderExport,
     PurchaseOrderRetrieveUpdateDestroy,
     AcknowledgePurchaseOrderAPIView,
+    RequestStatsAPIView,
     generate_token,
 )
 
@@ -20,11 +34,27 @@ urlpatterns = [
     
     # Vendor endpoints
     path('vendors/', VendorListCreate.as_view(), name='vendor-list-create'),
+    path('vendors/performance/', VendorPerformanceBatchAPIView.as_view(), name='vendor-performance-batch'),
+    path('vendors/export/', VendorExport.as_view(), name='vendor-export'),
     path('vendors/<int:vendor_id>/', VendorRetrieveUpdateDestroy.as_view(), name='vendor-detail'),
     path('vendors/<int:vendor_id>/performance/', VendorPerformanceAPIView.as_view(), name='vendor-performance'),
+    path('vendors/<int:vendor_id>/performance/history/', VendorPerformanceHistoryAPIView.as_view(), name='vendor-performance-history'),
+    path('vendors/<int:vendor_id>/performance/window/', VendorPerformanceWindowAPIView.as_view(), name='vendor-performance-window'),
     
     # Purchase Order endpoints
     path('purchase_orders/', PurchaseOrderListCreate.as_view(), name='purchase-order-list-create'),
+    path('purchase_orders/export/', PurchaseOrderExport.as_view(), name='purchase-order-export'),
+    path('purchase_orders/bulk/', PurchaseOrderBulkUpsert.as_view(), name='purchase-order-bulk-upsert'),
     path('purchase_orders/<int:pk>/', PurchaseOrderRetrieveUpdateDestroy.as_view(), name='purchase-order-detail'),
     path('purchase_orders/<int:po_id>/acknowledge/', AcknowledgePurchaseOrderAPIView.as_view(), name='purchase-order-acknowledge'),
+
+    # Async read endpoints (serve under ASGI: VMS/asgi.py)
+    path('async/vendors/', AsyncVendorList.as_view(), name='async-vendor-list'),
+    path('async/vendors/<int:vendor_id>/', AsyncVendorDetail.as_view(), name='async-vendor-detail'),
+    path('async/vendors/<int:vendor_id>/performance/', AsyncVendorPerformance.as_view(), name='async-vendor-performance'),
+    path('async/purchase_orders/', AsyncPurchaseOrderList.as_view(), name='async-purchase-order-list'),
+    path('async/purchase_orders/<int:pk>/', AsyncPurchaseOrderDetail.as_view(), name='async-purchase-order-detail'),
+
+    # Profiling
+    path('stats/', RequestStatsAPIView.as_view(), name='request-stats'),
 ]
@@ -1,19 +1,67 @@
 """
 API ViewSets for VMS
 """
+from itertools import islice
+
 from rest_framework import generics, status
+from rest_framework.filters import OrderingFilter
+from rest_framework.exceptions import APIException, ParseError, ValidationError
 from rest_framework.views import APIView
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
-from rest_framework.authentication import TokenAuthentication
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
 from rest_framework.authtoken.models import Token
+from django.conf import settings
 from django.contrib.auth.models import User
-from django.shortcuts import get_object_or_404
+from django.db import transaction
+from django.http import Http404
 from django.utils import timezone
+from django.utils.http import parse_etags
 
-from app.models import Vendor, PurchaseOrder
-from .serializers import VendorSerializer, VendorPerformanceSerializer, PurchaseOrderSerializer
+from app.cache import get_vendor_performance
+from app.db import REPLICA_METHODS, replica_reads
+from app.history import (
+    HISTORY_BUCKETS,
+    MAX_WINDOW_DAYS,
+    METRIC_WINDOWS,
+    performance_history,
+    windowed_metrics,
+)
+from app.instrumentation import stats, stats_summary
+from app.models import Vendor, PurchaseOrder, VersionConflict, retry_on_conflict
+from app.metrics import (
+    METRIC_FIELDS,
+    deferred_recompute_enabled,
+    mark_vendors_dirty,
+    recompute_vendors,
+)
+from .authentication import CachedTokenAuthentication
+from .conditional import (
+    LIST_VALIDATOR_HEADERS,
+    is_conditional,
+    not_modified,
+    object_etag,
+    page_etag,
+    set_validators,
+    validator_query,
+)
+from .export import CONTENT_TYPES, streaming_export
+from .filters import (
+    QueryParamFilter,
+    SparseFieldsMixin,
+    parse_date_param,
+    parse_int_param,
+    parse_list_param,
+    parse_str_param,
+)
+from .pagination import KeysetPagination
+from .parsers import loads
+from .serializers import (
+    VendorSerializer,
+    PurchaseOrderSerializer,
+    PurchaseOrderBulkSerializer,
+    values_serializer,
+)
 
 
 @api_view(['POST'])
@@ -34,78 +82,484 @@ def generate_token(request):
         return Response({'error': 'Method not allowed'}, status=status.HTTP_405_METHOD_NOT_ALLOWED)
 
 
-class VendorListCreate(generics.ListCreateAPIView):
+class ReplicaReadMixin:
+    """
+    Requests whose method is in ``replica_methods`` read from the replica
+    database when one is configured, up to their first write (app/db.py)
+    """
+    replica_methods = REPLICA_METHODS
+
+    def dispatch(self, request, *args, **kwargs):
+        if request.method not in self.replica_methods:
+            return super().dispatch(request, *args, **kwargs)
+        with replica_reads():
+            return super().dispatch(request, *args, **kwargs)
+
+
+class ValuesListMixin:
+    """
+    Serve GET lists through ValuesSerializer: rows come straight from
+    ``.values()`` and skip model instances and DRF field objects, while the
+    JSON stays identical to the ModelSerializer's.
+    """
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        # Ordering and keyset columns are fetched even when not requested
+        keys = (*queryset.query.order_by, *self.keyset_ordering, queryset.model._meta.pk.name)
+        if is_conditional(request, LIST_VALIDATOR_HEADERS):
+            rows = validator_query(queryset, keys)
+            page = self.paginate_queryset(rows)
+            etag = page_etag(rows, None) if page is None else page_etag(page, self.paginator)
+            response = not_modified(request, etag)
+            if response is not None:
+                return response
+
+        serializer = values_serializer(self.get_serializer_class(), self.get_sparse_fields())
+        rows = serializer.values(queryset, extra=(*keys, 'version'))
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            response = self.get_paginated_response(serializer.many(page))
+            return set_validators(response, page_etag(page, self.paginator))
+        rows = list(rows)
+        return set_validators(Response(serializer.many(rows)), page_etag(rows))
+
+
+class Conflict(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = 'The object kept changing while it was being saved; try again.'
+    default_code = 'conflict'
+
+
+class RetryOnConflictMixin:
+    """
+    Saves of versioned objects are compare-and-swap (see app.models.Versioned).
+    If another request wrote the object after it was loaded - an order
+    acknowledgement, a metric update - reload it and apply the validated data
+    again, rather than overwrite the other write.
+    """
+
+    def perform_update(self, serializer):
+        def reload():
+            serializer.instance = self.get_object()
+        try:
+            retry_on_conflict(serializer.save, before_retry=reload)
+        except VersionConflict:
+            raise Conflict()
+
+
+class ConditionalRetrieveMixin:
+    """
+    Detail GETs carry ETag/Last-Modified from the object's version columns;
+    If-None-Match / If-Modified-Since are answered from those columns alone
+    """
+
+    def retrieve(self, request, *args, **kwargs):
+        if is_conditional(request):
+            queryset = self.get_queryset()
+            lookup = {self.lookup_field: self.kwargs[self.lookup_url_kwarg or self.lookup_field]}
+            validators = queryset.filter(**lookup).values('version', 'last_modified').first()
+            if validators is None:
+                raise Http404(f"No {queryset.model._meta.object_name} matches the given query.")
+            response = not_modified(
+                request, object_etag(validators['version']), validators['last_modified']
+            )
+            if response is not None:
+                return response
+        instance = self.get_object()
+        response = Response(self.get_serializer(instance).data)
+        return set_validators(response, object_etag(instance.version), instance.last_modified)
+
+
+class VendorListCreate(
+    ReplicaReadMixin, ValuesListMixin, SparseFieldsMixin, generics.ListCreateAPIView
+):
     """
     List all vendors or create a new vendor.
     GET /api/vendors/
+    GET /api/vendors/?page_size={n}&cursor={cursor}
+    GET /api/vendors/?name={text}&vendor_code={code}&ordering=-quality_rating_avg&fields=id,name
     POST /api/vendors/
     """
     queryset = Vendor.objects.all()
     serializer_class = VendorSerializer
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
+    keyset_ordering = ('id',)
+    filter_backends = [QueryParamFilter, OrderingFilter]
+    filter_params = {
+        'name': ('name__icontains', parse_str_param),
+        'vendor_code': ('vendor_code', parse_str_param),
+    }
+    ordering_fields = ['id', 'name', 'vendor_code', *METRIC_FIELDS]
 
 
-class VendorRetrieveUpdateDestroy(generics.RetrieveUpdateDestroyAPIView):
+def _get_export_format(request):
+    output = request.query_params.get('output', 'ndjson')
+    if output not in CONTENT_TYPES:
+        raise ValidationError({'output': f"Choose one of: {', '.join(CONTENT_TYPES)}"})
+    return output
+
+
+def etag_matches(request, etag):
+    """True if the request's If-None-Match covers ``etag``"""
+    if_none_match = request.headers.get('If-None-Match')
+    return bool(if_none_match) and (
+        if_none_match.strip() == '*' or etag in parse_etags(if_none_match)
+    )
+
+
+class VendorExport(ReplicaReadMixin, APIView):
+    """
+    Stream all vendors as NDJSON or CSV.
+    GET /api/vendors/export/?output=ndjson|csv
+    """
+    authentication_classes = [CachedTokenAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        output = _get_export_format(request)
+        return streaming_export(Vendor.objects.order_by('pk'), output, 'vendors')
+
+
+class VendorRetrieveUpdateDestroy(
+    ReplicaReadMixin,
+    RetryOnConflictMixin,
+    ConditionalRetrieveMixin,
+    generics.RetrieveUpdateDestroyAPIView,
+):
     """
     Retrieve, update or delete a vendor instance.
-    GET /api/vendors/{id}/
+    GET /api/vendors/{id}/  (ETag / Last-Modified; 304 on If-None-Match / If-Modified-Since)
     PUT /api/vendors/{id}/
     DELETE /api/vendors/{id}/
     """
     queryset = Vendor.objects.all()
     serializer_class = VendorSerializer
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [IsAuthenticated]
+    lookup_field = 'id'
+    lookup_url_kwarg = 'vendor_id'
 
-    def get_object(self):
-        """Get vendor by ID from URL parameter"""
-        vendor_id = self.kwargs.get('vendor_id')
-        return get_object_or_404(Vendor, id=vendor_id)
 
-
-class VendorPerformanceAPIView(APIView):
+class VendorPerformanceAPIView(ReplicaReadMixin, APIView):
     """
     Retrieve vendor performance metrics.
     GET /api/vendors/{vendor_id}/performance/
+
+    Served from a read-through cache; responses carry an ETag and a matching
+    If-None-Match is answered with 304 Not Modified.
+    """
+    authentication_classes = [CachedTokenAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, vendor_id):
+        entry = get_vendor_performance(vendor_id)
+        if entry is None:
+            return Response(
+                {"message": "Vendor not found"},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        headers = {'ETag': entry['etag']}
+        if etag_matches(request, entry['etag']):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        return Response(entry['data'], headers=headers)
+
+
+class VendorPerformanceHistoryAPIView(ReplicaReadMixin, APIView):
+    """
+    Retrieve a vendor's performance history, downsampled in SQL.
+    GET /api/vendors/{vendor_id}/performance/history/?bucket=daily|weekly|monthly&start={date}&end={date}
+    """
+    authentication_classes = [CachedTokenAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, vendor_id):
+        bucket = request.query_params.get('bucket', 'daily')
+        if bucket not in HISTORY_BUCKETS:
+            raise ValidationError({'bucket': f"Choose one of: {', '.join(HISTORY_BUCKETS)}"})
+        if not Vendor.objects.filter(pk=vendor_id).exists():
+            return Response(
+                {"message": "Vendor not found"},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        rows = performance_history(
+            vendor_id,
+            bucket=bucket,
+            start=parse_date_param(request, 'start'),
+            end=parse_date_param(request, 'end'),
+        )
+        return Response([
+            {'date': row.pop('bucket'), **row} for row in rows
+        ])
+
+
+class VendorPerformanceWindowAPIView(ReplicaReadMixin, APIView):
     """
-    authentication_classes = [TokenAuthentication]
+    Retrieve a vendor's metrics over the last N days, for each N in ``days``.
+    GET /api/vendors/{vendor_id}/performance/window/?days=30,90
+
+    Summed from the vendor's daily rollups, so the cost depends on the
+    window, not on how many orders the vendor has.
+    """
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [IsAuthenticated]
 
     def get(self, request, vendor_id):
+        windows = parse_list_param(request, 'days') or METRIC_WINDOWS
         try:
-            vendor = Vendor.objects.get(pk=vendor_id)
-            serializer = VendorPerformanceSerializer(vendor)
-            return Response(serializer.data)
-        except Vendor.DoesNotExist:
+            windows = [int(days) for days in windows]
+        except ValueError:
+            raise ValidationError({'days': "Expected comma separated integers"})
+        if not all(1 <= days <= MAX_WINDOW_DAYS for days in windows):
+            raise ValidationError({'days': f"Windows must be 1 to {MAX_WINDOW_DAYS} days"})
+        if not Vendor.objects.filter(pk=vendor_id).exists():
             return Response(
                 {"message": "Vendor not found"},
                 status=status.HTTP_404_NOT_FOUND
             )
+        return Response({
+            'vendor': vendor_id,
+            'windows': windowed_metrics(vendor_id, windows=list(dict.fromkeys(windows))),
+        })
+
+
+class VendorPerformanceBatchAPIView(ReplicaReadMixin, APIView):
+    """
+    Retrieve performance metrics for many vendors in one request.
+    GET /api/vendors/performance/?ids=1,2,3
+    GET /api/vendors/performance/?ids=all&name={text}&vendor_code={code}
+    POST /api/vendors/performance/  {"ids": [1, 2, 3]} or {"ids": "all", ...}
+
+    Metrics come from a single .values() query; no model instances or
+    serializer fields are involved.
+    """
+    authentication_classes = [CachedTokenAuthentication]
+    permission_classes = [IsAuthenticated]
+    # The POST form is a read too
+    replica_methods = (*REPLICA_METHODS, 'POST')
+    fields = ['id', *METRIC_FIELDS]
+    max_ids = 5000
+
+    def get(self, request):
+        return self.respond(request.query_params)
+
+    def post(self, request):
+        if not isinstance(request.data, dict):
+            raise ParseError("Expected a JSON object")
+        return self.respond(request.data)
+
+    def parse_ids(self, ids):
+        if isinstance(ids, str):
+            if ids == 'all':
+                return None
+            ids = [part for part in ids.split(',') if part.strip()]
+        if not isinstance(ids, list) or not ids:
+            raise ValidationError({'ids': 'Provide a list of vendor ids or "all"'})
+        if len(ids) > self.max_ids:
+            raise ValidationError({'ids': f'At most {self.max_ids} ids per request'})
+        try:
+            return [int(vendor_id) for vendor_id in ids]
+        except (TypeError, ValueError):
+            raise ValidationError({'ids': 'Vendor ids must be integers'})
+
+    def respond(self, params):
+        vendor_ids = self.parse_ids(params.get('ids', ''))
+        queryset = Vendor.objects.order_by('id')
+        if vendor_ids is not None:
+            queryset = queryset.filter(pk__in=vendor_ids)
+        if params.get('name'):
+            queryset = queryset.filter(name__icontains=params['name'])
+        if params.get('vendor_code'):
+            queryset = queryset.filter(vendor_code=params['vendor_code'])
+        return Response(list(queryset.values(*self.fields)))
 
 
-class PurchaseOrderListCreate(generics.ListCreateAPIView):
+class PurchaseOrderListCreate(
+    ReplicaReadMixin, ValuesListMixin, SparseFieldsMixin, generics.ListCreateAPIView
+):
     """
     List all purchase orders or create a new purchase order.
     GET /api/purchase_orders/
+    GET /api/purchase_orders/?page_size={n}&cursor={cursor}  (keyed on order_date, id)
+    GET /api/purchase_orders/?vendor={id}&status=pending,completed&order_date_after={date}
+        &order_date_before={date}&ordering=-delivery_date&fields=po_number,status
     POST /api/purchase_orders/
+
+    *_after bounds are inclusive, *_before bounds exclusive.
     """
     queryset = PurchaseOrder.objects.all()
     serializer_class = PurchaseOrderSerializer
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
+    permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
+    keyset_ordering = ('order_date', 'id')
+    filter_backends = [QueryParamFilter, OrderingFilter]
+    filter_params = {
+        'vendor': ('vendor_id', parse_int_param),
+        'status': ('status__in', parse_list_param),
+        'order_date_after': ('order_date__gte', parse_date_param),
+        'order_date_before': ('order_date__lt', parse_date_param),
+        'delivery_date_after': ('delivery_date__gte', parse_date_param),
+        'delivery_date_before': ('delivery_date__lt', parse_date_param),
+    }
+    # Non-null columns only, so keyset cursors can page through any ordering
+    ordering_fields = [
+        'id', 'po_number', 'order_date', 'delivery_date', 'issue_date', 'quantity', 'status',
+    ]
+
+
+class PurchaseOrderExport(ReplicaReadMixin, APIView):
+    """
+    Stream purchase orders as NDJSON or CSV.
+    GET /api/purchase_orders/export/?output=ndjson|csv&vendor={id}&start={date}&end={date}
+
+    start/end filter on order_date (inclusive start, exclusive end).
+    """
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [IsAuthenticated]
 
+    def get(self, request):
+        output = _get_export_format(request)
+        queryset = PurchaseOrder.objects.order_by('pk')
+        vendor_id = request.query_params.get('vendor')
+        if vendor_id:
+            if not vendor_id.isdigit():
+                raise ValidationError({'vendor': "Expected a vendor id"})
+            queryset = queryset.filter(vendor_id=vendor_id)
+        start = parse_date_param(request, 'start')
+        if start:
+            queryset = queryset.filter(order_date__gte=start)
+        end = parse_date_param(request, 'end')
+        if end:
+            queryset = queryset.filter(order_date__lt=end)
+        return streaming_export(queryset, output, 'purchase_orders')
+
+
+class PurchaseOrderBulkUpsert(APIView):
+    """
+    Create or update many purchase orders in one request, matched on po_number.
+    POST /api/purchase_orders/bulk/
+
+    Accepts a JSON array, or an NDJSON stream (Content-Type: application/x-ndjson)
+    which is read line by line. Rows are validated and written in batches and
+    vendor metrics are recomputed once per affected vendor at the end. The
+    whole request is atomic: any invalid row rolls everything back.
+    """
+    authentication_classes = [CachedTokenAuthentication]
+    permission_classes = [IsAuthenticated]
+    batch_size = 1000
+    upsert_fields = [
+        field.name for field in PurchaseOrder._meta.concrete_fields
+        if not field.primary_key and field.name != 'po_number'
+    ]
+
+    def iter_rows(self, request):
+        if request.content_type.startswith('application/x-ndjson'):
+            for line_number, line in enumerate(request.stream or (), 1):
+                if not line.strip():
+                    continue
+                try:
+                    yield loads(line)
+                except ValueError as exc:
+                    raise ParseError(f"Invalid JSON on line {line_number}: {exc}")
+        else:
+            if not isinstance(request.data, list):
+                raise ParseError("Expected a JSON array of purchase orders")
+            yield from request.data
+
+    def get_vendors(self, rows):
+        vendor_ids = set()
+        for row in rows:
+            try:
+                vendor_ids.add(int(row['vendor']))
+            except (KeyError, TypeError, ValueError):
+                continue
+        # Only the key is needed to assign the foreign key
+        return Vendor.objects.only('pk').in_bulk(vendor_ids)
+
+    def upsert_batch(self, validated_data):
+        orders = {}
+        for attrs in validated_data:
+            orders[attrs['po_number']] = PurchaseOrder(**attrs)
+        existing = {
+            po_number: (vendor_id, completed_date, version)
+            for po_number, vendor_id, completed_date, version in PurchaseOrder.objects.filter(
+                po_number__in=orders
+            ).values_list('po_number', 'vendor_id', 'completed_date', 'version')
+        }
+        for po_number, order in orders.items():
+            if po_number in existing:
+                _, completed_date, version = existing[po_number]
+                if order.completed_date is None:
+                    # Keep the original completion time of re-sent completed orders
+                    order.completed_date = completed_date
+                order.version = version + 1
+            order.stamp_completed_date()
+            order.stamp_derived_fields()
+
+        PurchaseOrder.objects.bulk_create(
+            orders.values(),
+            update_conflicts=True,
+            unique_fields=['po_number'],
+            update_fields=self.upsert_fields,
+        )
+        vendor_ids = {order.vendor_id for order in orders.values()}
+        vendor_ids.update(vendor_id for vendor_id, _, _ in existing.values())
+        return len(orders) - len(existing), len(existing), vendor_ids
+
+    def post(self, request):
+        rows = self.iter_rows(request)
+        created = updated = 0
+        vendor_ids = set()
+        offset = 0
+        with transaction.atomic():
+            while batch := list(islice(rows, self.batch_size)):
+                serializer = PurchaseOrderBulkSerializer(
+                    data=batch, many=True, context={'vendors': self.get_vendors(batch)}
+                )
+                if not serializer.is_valid():
+                    transaction.set_rollback(True)
+                    errors = {
+                        offset + index: error
+                        for index, error in enumerate(serializer.errors) if error
+                    }
+                    return Response({'errors': errors}, status=status.HTTP_400_BAD_REQUEST)
+                batch_created, batch_updated, batch_vendor_ids = self.upsert_batch(
+                    serializer.validated_data
+                )
+                created += batch_created
+                updated += batch_updated
+                vendor_ids |= batch_vendor_ids
+                offset += len(batch)
 
-class PurchaseOrderRetrieveUpdateDestroy(generics.RetrieveUpdateDestroyAPIView):
+            if deferred_recompute_enabled():
+                mark_vendors_dirty(vendor_ids)
+            else:
+                recompute_vendors(Vendor.objects.filter(pk__in=vendor_ids))
+
+        return Response(
+            {'created': created, 'updated': updated, 'vendors': len(vendor_ids)},
+            status=status.HTTP_200_OK
+        )
+
+
+class PurchaseOrderRetrieveUpdateDestroy(
+    ReplicaReadMixin,
+    RetryOnConflictMixin,
+    ConditionalRetrieveMixin,
+    generics.RetrieveUpdateDestroyAPIView,
+):
     """
     Retrieve, update or delete a purchase order instance.
-    GET /api/purchase_orders/{pk}/
+    GET /api/purchase_orders/{pk}/  (ETag / Last-Modified; 304 on If-None-Match / If-Modified-Since)
     PUT /api/purchase_orders/{pk}/
     DELETE /api/purchase_orders/{pk}/
     """
     queryset = PurchaseOrder.objects.all()
     serializer_class = PurchaseOrderSerializer
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [IsAuthenticated]
 
 
@@ -114,14 +568,18 @@ class AcknowledgePurchaseOrderAPIView(APIView):
     Acknowledge a purchase order by setting acknowledgment date.
     POST /api/purchase_orders/{po_id}/acknowledge/
     """
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [IsAuthenticated]
 
     def post(self, request, po_id):
-        try:
+        def acknowledge():
             purchase_order = PurchaseOrder.objects.get(pk=po_id)
             purchase_order.acknowledgment_date = timezone.now()
-            purchase_order.save()
+            # Also writes the derived response_seconds (and the version)
+            purchase_order.save(update_fields=['acknowledgment_date'])
+
+        try:
+            retry_on_conflict(acknowledge)
             return Response(
                 {"message": "Purchase order acknowledged successfully"},
                 status=status.HTTP_200_OK
@@ -131,3 +589,28 @@ class AcknowledgePurchaseOrderAPIView(APIView):
                 {"message": "Purchase order not found"},
                 status=status.HTTP_404_NOT_FOUND
             )
+        except VersionConflict:
+            raise Conflict()
+
+
+class RequestStatsAPIView(APIView):
+    """
+    Rolling per-view request profile collected by RequestProfilingMiddleware.
+    GET /api/stats/     - percentiles of total/DB/serializer/signal time and query count
+    DELETE /api/stats/  - reset the window
+
+    Only populated when REQUEST_PROFILING is enabled.
+    """
+    authentication_classes = [CachedTokenAuthentication]
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response({
+            'enabled': settings.REQUEST_PROFILING,
+            'window': stats.window,
+            'views': stats_summary(),
+        })
+
+    def delete(self, request):
+        stats.clear()
+        return Response(status=status.HTTP_204_NO_CONTENT)
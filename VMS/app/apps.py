@@ -7,4 +7,5 @@ class AppConfig(DjangoAppConfig):
 
     def ready(self):
         """Import signal handlers when app is ready"""
+        import app.db
         import app.signals
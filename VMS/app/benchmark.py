@@ -0,0 +1,510 @@
+"""
+Benchmark harness for the VMS API hot paths.
+
+Seeds synthetic vendors and purchase orders, then drives the API in-process
+through DRF's APIClient and reports latency percentiles, throughput and the
+SQL query count of every scenario. Used by the ``benchmark_api`` command.
+"""
+import asyncio
+import math
+import platform
+import random
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import timedelta
+
+import django
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import close_old_connections, connection, connections, reset_queries
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from django.test import AsyncClient, Client
+from rest_framework.test import APIClient
+
+from .metrics import compute_vendor_metrics, recompute_vendors
+from .models import Vendor, PurchaseOrder
+
+
+STATUS_WEIGHTS = (('completed', 7), ('pending', 2), ('canceled', 1))
+
+SCENARIOS = ('po_create', 'po_acknowledge', 'vendor_list', 'po_list', 'vendor_performance')
+
+# Read endpoints served by both the sync (WSGI) and async (ASGI) views
+CONCURRENCY_ENDPOINTS = {
+    'vendor_detail': ('/api/vendors/{vendor_id}/', '/api/async/vendors/{vendor_id}/'),
+    'vendor_performance': (
+        '/api/vendors/{vendor_id}/performance/', '/api/async/vendors/{vendor_id}/performance/'
+    ),
+    'po_list': ('/api/purchase_orders/?page_size=100', '/api/async/purchase_orders/?page_size=100'),
+}
+
+
+def seed(vendor_count, order_count, batch_size=5000, rng=None):
+    """
+    Bulk-insert synthetic vendors and purchase orders, then recompute the
+    vendors' metrics once. Returns the list of seeded vendor ids.
+    """
+    rng = rng or random.Random(0)
+    Vendor.objects.bulk_create(
+        [
+            Vendor(
+                name=f'Bench Vendor {i}',
+                contact_details=f'vendor{i}@bench.example',
+                address=f'{i} Bench St',
+                vendor_code=f'BENCH{i:07}',
+                on_time_delivery_rate=0.0,
+                quality_rating_avg=0.0,
+                average_response_time=0.0,
+                fulfillment_rate=0.0,
+            )
+            for i in range(vendor_count)
+        ],
+        batch_size=batch_size,
+    )
+    vendor_ids = list(
+        Vendor.objects.filter(vendor_code__startswith='BENCH').values_list('pk', flat=True)
+    )
+
+    statuses = [name for name, _ in STATUS_WEIGHTS]
+    weights = [weight for _, weight in STATUS_WEIGHTS]
+    now = timezone.now()
+    for start in range(0, order_count, batch_size):
+        orders = []
+        for i in range(start, min(start + batch_size, order_count)):
+            order_date = now - timedelta(minutes=rng.randrange(365 * 24 * 60))
+            issue_date = order_date + timedelta(hours=rng.randrange(24))
+            status = rng.choices(statuses, weights)[0]
+            order = PurchaseOrder(
+                po_number=f'BENCH-PO-{i:08}',
+                vendor_id=rng.choice(vendor_ids),
+                order_date=order_date,
+                delivery_date=order_date + timedelta(days=rng.randrange(3, 15)),
+                items={'sku': f'SKU-{rng.randrange(1000)}', 'quantity': rng.randrange(1, 100)},
+                quantity=rng.randrange(1, 100),
+                status=status,
+                quality_rating=round(rng.uniform(1, 5), 1) if status == 'completed' else None,
+                issue_date=issue_date,
+                acknowledgment_date=(
+                    issue_date + timedelta(hours=rng.randrange(1, 72))
+                    if rng.random() < 0.8 else None
+                ),
+            )
+            if status == 'completed':
+                order.completed_date = order_date + timedelta(days=rng.randrange(1, 17))
+            order.stamp_derived_fields()
+            orders.append(order)
+        PurchaseOrder.objects.bulk_create(orders)
+    recompute_vendors(Vendor.objects.filter(pk__in=vendor_ids))
+    return vendor_ids
+
+
+def summarize(samples, elapsed):
+    """Latency percentiles (ms) and throughput for a list of durations (s)"""
+    ordered = sorted(samples)
+
+    def percentile(fraction):
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] * 1000
+
+    return {
+        'iterations': len(ordered),
+        'mean_ms': statistics.fmean(ordered) * 1000,
+        'min_ms': ordered[0] * 1000,
+        'p50_ms': percentile(0.50),
+        'p90_ms': percentile(0.90),
+        'p99_ms': percentile(0.99),
+        'max_ms': ordered[-1] * 1000,
+        'throughput_rps': len(ordered) / elapsed if elapsed else 0.0,
+    }
+
+
+def measure(request, iterations):
+    """
+    Run ``request(i)`` once to count its queries, then ``iterations`` timed
+    times. ``request`` returns a response; non-2xx responses are counted.
+    """
+    # A full query log (e.g. after seeding) would make the capture read zero
+    reset_queries()
+    with CaptureQueriesContext(connection) as queries:
+        request(-1)
+    query_count = len(queries)
+    samples, errors = [], 0
+    started = time.perf_counter()
+    for i in range(iterations):
+        t0 = time.perf_counter()
+        response = request(i)
+        samples.append(time.perf_counter() - t0)
+        if response.status_code >= 300:
+            errors += 1
+    result = summarize(samples, time.perf_counter() - started)
+    result.update(queries=query_count, errors=errors)
+    return result
+
+
+def benchmark_token():
+    user, _ = User.objects.get_or_create(username='benchmark')
+    token, _ = Token.objects.get_or_create(user=user)
+    return token.key
+
+
+def authenticated_client():
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION='Token ' + benchmark_token())
+    return client
+
+
+def api_scenarios(client, vendor_ids, rng, page_size=100):
+    """The benchmarked requests, keyed by scenario name"""
+    order_ids = list(PurchaseOrder.objects.values_list('pk', flat=True)[:10000])
+    now = timezone.now()
+    counter = iter(range(10 ** 9))
+
+    def po_create(i):
+        return client.post('/api/purchase_orders/', {
+            'po_number': f'BENCH-NEW-{next(counter):09}',
+            'vendor': rng.choice(vendor_ids),
+            'order_date': now.isoformat(),
+            'delivery_date': (now + timedelta(days=7)).isoformat(),
+            'items': {'sku': 'SKU-1', 'quantity': 1},
+            'quantity': 1,
+            'status': 'completed',
+            'quality_rating': 4.0,
+            'issue_date': now.isoformat(),
+        }, format='json')
+
+    def po_acknowledge(i):
+        return client.post(f'/api/purchase_orders/{rng.choice(order_ids)}/acknowledge/')
+
+    def vendor_list(i):
+        return client.get('/api/vendors/', {'page_size': page_size})
+
+    def po_list(i):
+        return client.get('/api/purchase_orders/', {'page_size': page_size})
+
+    def vendor_performance(i):
+        return client.get(f'/api/vendors/{rng.choice(vendor_ids)}/performance/')
+
+    return {
+        'po_create': po_create,
+        'po_acknowledge': po_acknowledge,
+        'vendor_list': vendor_list,
+        'po_list': po_list,
+        'vendor_performance': vendor_performance,
+    }
+
+
+def run_benchmarks(vendor_ids, iterations, scenarios=None, page_size=100, rng=None):
+    """Measure every (or the selected) API scenario; returns a results dict"""
+    rng = rng or random.Random(1)
+    available = api_scenarios(authenticated_client(), vendor_ids, rng, page_size)
+    selected = scenarios or list(available)
+    return {name: measure(available[name], iterations) for name in selected}
+
+
+def _wsgi_level(paths, concurrency, headers):
+    """``concurrency`` threads each issuing its share of ``paths`` through the WSGI handler"""
+    def worker(chunk):
+        client = Client()
+        samples, errors = [], 0
+        try:
+            for path in chunk:
+                t0 = time.perf_counter()
+                response = client.get(path, headers=headers)
+                samples.append(time.perf_counter() - t0)
+                errors += response.status_code >= 300
+        finally:
+            connections.close_all()
+        return samples, errors
+
+    chunks = [paths[i::concurrency] for i in range(concurrency)]
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        outcomes = list(pool.map(worker, chunks))
+    return outcomes, time.perf_counter() - started
+
+
+def _asgi_level(paths, concurrency, headers):
+    """``concurrency`` tasks on one event loop issuing ``paths`` through the ASGI handler"""
+    async def worker(chunk):
+        client = AsyncClient()
+        samples, errors = [], 0
+        for path in chunk:
+            t0 = time.perf_counter()
+            response = await client.get(path, headers=headers)
+            samples.append(time.perf_counter() - t0)
+            errors += response.status_code >= 300
+        return samples, errors
+
+    async def run():
+        chunks = [paths[i::concurrency] for i in range(concurrency)]
+        return await asyncio.gather(*(worker(chunk) for chunk in chunks))
+
+    started = time.perf_counter()
+    outcomes = asyncio.run(run())
+    return outcomes, time.perf_counter() - started
+
+
+def run_concurrency_benchmarks(vendor_ids, levels=(1, 8, 32), requests_per_client=20,
+                               endpoint='vendor_detail', rng=None):
+    """
+    Compare the sync views behind the WSGI handler (one thread per in-flight
+    request) with the async views behind the ASGI handler (one event loop)
+    at each concurrency level. Returns ``{'wsgi': {level: ...}, 'asgi': ...}``.
+    """
+    rng = rng or random.Random(2)
+    headers = {'Authorization': 'Token ' + benchmark_token()}
+    sync_path, async_path = CONCURRENCY_ENDPOINTS[endpoint]
+    results = {'wsgi': {}, 'asgi': {}}
+    for level in levels:
+        ids = [rng.choice(vendor_ids) for _ in range(level * requests_per_client)]
+        for mode, template, run in (('wsgi', sync_path, _wsgi_level), ('asgi', async_path, _asgi_level)):
+            paths = [template.format(vendor_id=vendor_id) for vendor_id in ids]
+            outcomes, elapsed = run(paths, level, headers)
+            samples = [sample for chunk_samples, _ in outcomes for sample in chunk_samples]
+            result = summarize(samples, elapsed)
+            result['errors'] = sum(errors for _, errors in outcomes)
+            results[mode][level] = result
+    return results
+
+
+def _write_level(requests, concurrency, headers):
+    """``concurrency`` threads each PATCHing its share of ``(path, data)`` requests"""
+    def worker(chunk):
+        # A failing request is counted (5xx) rather than aborting the run
+        client = Client(raise_request_exception=False)
+        samples, errors, conflicts = [], 0, 0
+        try:
+            for path, data in chunk:
+                t0 = time.perf_counter()
+                response = client.patch(path, data, content_type='application/json', headers=headers)
+                samples.append(time.perf_counter() - t0)
+                conflicts += response.status_code == 409
+                errors += response.status_code >= 300
+        finally:
+            connections.close_all()
+        return samples, errors, conflicts
+
+    chunks = [requests[i::concurrency] for i in range(concurrency)]
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        outcomes = list(pool.map(worker, chunks))
+    return outcomes, time.perf_counter() - started
+
+
+def metrics_consistent(vendor_ids):
+    """True if every vendor's stored metrics match a full recompute from its orders"""
+    for vendor in Vendor.objects.filter(pk__in=vendor_ids):
+        expected = compute_vendor_metrics(vendor)
+        if any(not math.isclose(getattr(vendor, name), value, abs_tol=1e-6)
+               for name, value in expected.items()):
+            return False
+    return True
+
+
+def run_write_concurrency_benchmarks(vendor_ids, levels=(1, 4, 16), requests_per_client=20,
+                                     hot_vendors=4, rng=None):
+    """
+    Parallel PATCHes of completed orders of a few ``hot_vendors``, so the
+    writers contend on the same vendor rows, at each concurrency level. Each
+    result reports 409 conflicts and whether the metrics still match a full
+    recount afterwards.
+    """
+    rng = rng or random.Random(3)
+    headers = {'Authorization': 'Token ' + benchmark_token()}
+    hot = vendor_ids[:hot_vendors]
+    order_ids = list(
+        PurchaseOrder.objects.filter(vendor_id__in=hot, status='completed').values_list('pk', flat=True)
+    )
+    if not order_ids:
+        return {}
+    results = {}
+    for level in levels:
+        requests = [
+            (f'/api/purchase_orders/{rng.choice(order_ids)}/', {'quality_rating': rng.randrange(1, 6)})
+            for _ in range(level * requests_per_client)
+        ]
+        outcomes, elapsed = _write_level(requests, level, headers)
+        result = summarize([sample for samples, _, _ in outcomes for sample in samples], elapsed)
+        result['errors'] = sum(errors for _, errors, _ in outcomes)
+        result['conflicts'] = sum(conflicts for _, _, conflicts in outcomes)
+        result['consistent'] = metrics_consistent(hot)
+        results[level] = result
+    return results
+
+
+@contextmanager
+def database_profile(name):
+    """
+    Reconnect with a database profile from settings.DATABASE_PROFILES (its
+    connection settings and SQLite pragmas) for the duration of the block
+    """
+    profile = settings.DATABASE_PROFILES[name]
+    settings_dict = connections['default'].settings_dict
+    saved = {key: settings_dict.get(key) for key in profile['DATABASE']}
+    # The journal mode is stored in the database file: reset it to SQLite's default
+    pragmas = {'journal_mode': 'delete', **profile['SQLITE_PRAGMAS']}
+    connections.close_all()
+    settings_dict.update(profile['DATABASE'])
+    try:
+        with override_settings(SQLITE_PRAGMAS=pragmas):
+            yield profile
+    finally:
+        connections.close_all()
+        settings_dict.update(saved)
+
+
+def _mixed_level(requests, concurrency, headers):
+    """
+    ``concurrency`` threads each issuing its share of ``(path, data)``
+    requests: a GET when ``data`` is None, a PATCH otherwise. Connections
+    are released after each request as the WSGI handler does, so
+    CONN_MAX_AGE applies.
+    """
+    def worker(chunk):
+        client = Client(raise_request_exception=False)
+        samples, errors = [], 0
+        try:
+            for path, data in chunk:
+                t0 = time.perf_counter()
+                if data is None:
+                    response = client.get(path, headers=headers)
+                else:
+                    response = client.patch(
+                        path, data, content_type='application/json', headers=headers
+                    )
+                close_old_connections()
+                samples.append(time.perf_counter() - t0)
+                errors += response.status_code >= 300
+        finally:
+            connections.close_all()
+        return samples, errors
+
+    chunks = [requests[i::concurrency] for i in range(concurrency)]
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        outcomes = list(pool.map(worker, chunks))
+    return outcomes, time.perf_counter() - started
+
+
+def run_profile_benchmarks(vendor_ids, levels=(1, 4, 16), requests_per_client=20,
+                           write_ratio=0.2, profiles=('development', 'production'), seed=4):
+    """
+    Run the same concurrent mix of reads (vendor detail, a page of orders)
+    and order rating PATCHes under each database profile. Needs an on-disk
+    SQLite database. Returns ``{profile: {level: summary}}``.
+    """
+    headers = {'Authorization': 'Token ' + benchmark_token()}
+    order_ids = list(
+        PurchaseOrder.objects.filter(status='completed').values_list('pk', flat=True)
+    )
+    results = {}
+    for name in profiles:
+        rng = random.Random(seed)
+        results[name] = {}
+        with database_profile(name):
+            for level in levels:
+                requests = []
+                for _ in range(level * requests_per_client):
+                    if order_ids and rng.random() < write_ratio:
+                        requests.append((
+                            f'/api/purchase_orders/{rng.choice(order_ids)}/',
+                            {'quality_rating': rng.randrange(1, 6)},
+                        ))
+                    elif rng.random() < 0.5:
+                        requests.append((f'/api/vendors/{rng.choice(vendor_ids)}/', None))
+                    else:
+                        requests.append(('/api/purchase_orders/?page_size=20', None))
+                outcomes, elapsed = _mixed_level(requests, level, headers)
+                result = summarize([sample for samples, _ in outcomes for sample in samples], elapsed)
+                result['errors'] = sum(errors for _, errors in outcomes)
+                results[name][level] = result
+    return results
+
+
+def compare_serializers(limit=1000, repeat=5):
+    """
+    Time ModelSerializer vs ValuesSerializer on the same rows, end to end
+    (query, serialize, render to JSON bytes), and check the bytes match.
+    """
+    from rest_framework.renderers import JSONRenderer
+
+    from .api.serializers import PurchaseOrderSerializer, VendorSerializer, values_serializer
+
+    render = JSONRenderer().render
+    results = {}
+    for name, serializer_class in (('vendors', VendorSerializer), ('purchase_orders', PurchaseOrderSerializer)):
+        queryset = serializer_class.Meta.model.objects.order_by('pk')[:limit]
+        fast = values_serializer(serializer_class)
+
+        def model_path():
+            return render(serializer_class(list(queryset), many=True).data)
+
+        def values_path():
+            return render(fast.many(list(fast.values(queryset))))
+
+        timings = {}
+        for label, path in (('model_serializer', model_path), ('values_serializer', values_path)):
+            samples = []
+            for _ in range(repeat):
+                t0 = time.perf_counter()
+                path()
+                samples.append(time.perf_counter() - t0)
+            timings[label] = min(samples) * 1000
+        results[name] = {
+            'rows': queryset.count(),
+            'model_serializer_ms': timings['model_serializer'],
+            'values_serializer_ms': timings['values_serializer'],
+            'speedup': timings['model_serializer'] / timings['values_serializer'],
+            'identical': model_path() == values_path(),
+        }
+    return results
+
+
+def compare_renderers(limit=1000, repeat=5):
+    """
+    Time DRF's JSONRenderer/JSONParser against FastJSONRenderer/FastJSONParser
+    on a serialized page of purchase orders, and check the bytes match.
+    """
+    from io import BytesIO
+
+    from rest_framework.parsers import JSONParser
+    from rest_framework.renderers import JSONRenderer
+
+    from .api.parsers import FastJSONParser
+    from .api.renderers import FastJSONRenderer, orjson
+    from .api.serializers import PurchaseOrderSerializer
+
+    data = PurchaseOrderSerializer(PurchaseOrder.objects.order_by('pk')[:limit], many=True).data
+    body = JSONRenderer().render(data)
+
+    def best(func):
+        samples = []
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            func()
+            samples.append(time.perf_counter() - t0)
+        return min(samples) * 1000
+
+    results = {'rows': len(data), 'bytes': len(body), 'accelerator': 'orjson' if orjson else None}
+    for name, drf, fast in (
+        ('render', lambda: JSONRenderer().render(data), lambda: FastJSONRenderer().render(data)),
+        ('parse', lambda: JSONParser().parse(BytesIO(body)), lambda: FastJSONParser().parse(BytesIO(body))),
+    ):
+        drf_ms, fast_ms = best(drf), best(fast)
+        results[name] = {'drf_ms': drf_ms, 'fast_ms': fast_ms, 'speedup': drf_ms / fast_ms}
+    results['identical'] = FastJSONRenderer().render(data) == body
+    return results
+
+
+def environment():
+    """Metadata stored with results so runs can be compared"""
+    return {
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'database': connection.vendor,
+        'platform': platform.platform(),
+        'timestamp': timezone.now().isoformat(),
+    }
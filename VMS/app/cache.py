@@ -0,0 +1,115 @@
+"""
+Read-through caches for vendor performance metrics and API tokens.
+
+Entries hold the VendorPerformanceSerializer output (built through its
+ValuesSerializer fast path) plus an ETag and live in the ``performance``
+cache alias (TTL and LRU size are configured in settings.CACHES). They are
+invalidated whenever vendor metrics are written. With a per-process backend
+such as locmem, invalidations only reach the current process; other
+processes fall back on the TTL.
+"""
+import hashlib
+import json
+
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS, transaction
+
+from .models import Vendor
+
+
+CACHE_ALIAS = 'performance'
+TOKEN_CACHE_ALIAS = 'tokens'
+
+
+def _key(vendor_id):
+    return f'vendor-performance:{vendor_id}'
+
+
+def _etag(data):
+    payload = json.dumps(data, sort_keys=True, separators=(',', ':')).encode()
+    return '"%s"' % hashlib.md5(payload, usedforsecurity=False).hexdigest()
+
+
+def _performance_query(vendor_id):
+    # Imported here: app.api.serializers imports the models at module load
+    from app.api.serializers import VendorPerformanceSerializer, values_serializer
+
+    serializer = values_serializer(VendorPerformanceSerializer)
+    # Filled from the primary even inside replica_reads(): a lagging replica
+    # row cached after an invalidation would be served for the whole TTL
+    queryset = Vendor.objects.using(DEFAULT_DB_ALIAS).filter(pk=vendor_id)
+    return serializer, serializer.values(queryset)
+
+
+def _performance_entry(serializer, row):
+    data = serializer.to_representation(row)
+    return {'data': data, 'etag': _etag(data)}
+
+
+def get_vendor_performance(vendor_id):
+    """
+    Return ``{'data': ..., 'etag': ...}`` for a vendor, from the cache when
+    possible. Returns None if the vendor does not exist.
+    """
+    cache = caches[CACHE_ALIAS]
+    entry = cache.get(_key(vendor_id))
+    if entry is not None:
+        return entry
+    serializer, queryset = _performance_query(vendor_id)
+    row = queryset.first()
+    if row is None:
+        return None
+    entry = _performance_entry(serializer, row)
+    cache.set(_key(vendor_id), entry)
+    return entry
+
+
+async def aget_vendor_performance(vendor_id):
+    """Async ``get_vendor_performance``"""
+    cache = caches[CACHE_ALIAS]
+    entry = await cache.aget(_key(vendor_id))
+    if entry is not None:
+        return entry
+    serializer, queryset = _performance_query(vendor_id)
+    row = await queryset.afirst()
+    if row is None:
+        return None
+    entry = _performance_entry(serializer, row)
+    await cache.aset(_key(vendor_id), entry)
+    return entry
+
+
+def invalidate_vendor_performance(vendor_ids):
+    """
+    Drop cached performance entries for the given vendors.
+
+    Entries are dropped immediately and again once the surrounding
+    transaction commits, so a concurrent reader cannot re-cache the
+    pre-commit values.
+    """
+    keys = [_key(vendor_id) for vendor_id in vendor_ids]
+    if not keys:
+        return
+    cache = caches[CACHE_ALIAS]
+    cache.delete_many(keys)
+    transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def _token_key(key):
+    return f'auth-token:{key}'
+
+
+def get_cached_token(key):
+    """Return the cached ``(user, token)`` pair for a token key, or None"""
+    return caches[TOKEN_CACHE_ALIAS].get(_token_key(key))
+
+
+def cache_token(key, user, token):
+    caches[TOKEN_CACHE_ALIAS].set(_token_key(key), (user, token))
+
+
+def invalidate_tokens(keys):
+    """Drop cached authentications for the given token keys"""
+    keys = [_token_key(key) for key in keys]
+    if keys:
+        caches[TOKEN_CACHE_ALIAS].delete_many(keys)
@@ -0,0 +1,113 @@
+"""
+Database connection setup and routing for VMS
+
+Every new SQLite connection runs the pragmas in the SQLITE_PRAGMAS setting,
+which comes from the database profile selected in settings.py (WAL journal,
+relaxed fsync, larger page cache, memory-mapped reads and a busy timeout in
+production). Other database backends are left alone.
+
+When a ``replica`` database is configured (VMS_DB_REPLICA in settings.py),
+``ReadReplicaRouter`` sends the reads made inside ``replica_reads()`` blocks
+to it; the API views open such a block for GET requests (and the
+performance endpoints). The first write in a block pins the rest of it to
+``default``, so a request reads its own writes. Users and tokens are always
+read from ``default``, so a freshly generated token works straight away.
+"""
+import sqlite3
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+
+REPLICA_ALIAS = 'replica'
+REPLICA_METHODS = ('GET', 'HEAD')
+PRIMARY_ONLY_APPS = ('auth', 'authtoken')
+
+
+@receiver(connection_created)
+def apply_sqlite_pragmas(sender, connection, **kwargs):
+    """Run the SQLITE_PRAGMAS on a freshly opened SQLite connection"""
+    pragmas = getattr(settings, 'SQLITE_PRAGMAS', {})
+    if connection.vendor != 'sqlite' or not pragmas:
+        return
+    with connection.cursor() as cursor:
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
+
+
+class _ReplicaReads:
+    """State of one ``replica_reads()`` block, shared with sync_to_async threads"""
+    __slots__ = ('pinned',)
+
+    def __init__(self):
+        self.pinned = False
+
+
+_replica_reads = ContextVar('replica_reads', default=None)
+
+
+def replica_configured():
+    return REPLICA_ALIAS in settings.DATABASES
+
+
+@contextmanager
+def replica_reads():
+    """Route reads in the block to the replica, until the block writes"""
+    token = _replica_reads.set(_ReplicaReads())
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+def reads_from_replica():
+    """True while reads are being routed to the replica"""
+    state = _replica_reads.get()
+    return state is not None and not state.pinned and replica_configured()
+
+
+class ReadReplicaRouter:
+    """Reads to ``replica`` inside ``replica_reads()``; writes always to ``default``"""
+
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label not in PRIMARY_ONLY_APPS and reads_from_replica():
+            return REPLICA_ALIAS
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        state = _replica_reads.get()
+        if state is not None:
+            state.pinned = True
+        # Explicit, or Django would write an instance back to the alias it was read from
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        aliases = {DEFAULT_DB_ALIAS, REPLICA_ALIAS}
+        if obj1._state.db in aliases and obj2._state.db in aliases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # The replica is a copy of default, schema included
+        if db == REPLICA_ALIAS:
+            return False
+        return None
+
+
+def copy_sqlite_database(source, target):
+    """
+    Copy the SQLite database file ``source`` over ``target`` with SQLite's
+    online backup API: a consistent snapshot, taken while ``source`` is in
+    use, that replaces ``target`` in one transaction.
+    """
+    source_db = sqlite3.connect(source)
+    target_db = sqlite3.connect(target)
+    try:
+        source_db.backup(target_db)
+    finally:
+        target_db.close()
+        source_db.close()
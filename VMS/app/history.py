@@ -0,0 +1,114 @@
+"""
+Vendor performance history.
+
+Snapshots copy every vendor's current metrics into HistoricalPerformance,
+one row per vendor per period. History reads are range scans on the
+(vendor, date) unique index, downsampled into buckets in SQL.
+
+Windowed metrics ("last 30 days") sum the vendor's VendorDailyRollup rows
+instead of scanning its purchase orders.
+"""
+from datetime import timedelta
+
+from django.db.models import Avg, Count, Q, Sum
+from django.db.models.functions import TruncDay, TruncMonth, TruncWeek
+from django.utils import timezone
+
+from .metrics import METRIC_FIELDS, ROLLUP_FIELDS, rates_from_counters
+from .models import Vendor, HistoricalPerformance, VendorDailyRollup
+
+
+SNAPSHOT_PERIODS = ('hour', 'day')
+
+METRIC_WINDOWS = (30, 90)
+MAX_WINDOW_DAYS = 366
+
+HISTORY_BUCKETS = {
+    'daily': TruncDay,
+    'weekly': TruncWeek,
+    'monthly': TruncMonth,
+}
+
+
+def period_start(period, now=None):
+    """Start of the snapshot period containing ``now``"""
+    now = timezone.localtime(now or timezone.now())
+    now = now.replace(minute=0, second=0, microsecond=0)
+    if period == 'day':
+        now = now.replace(hour=0)
+    return now
+
+
+def snapshot_vendor_performance(period='day', now=None, batch_size=1000):
+    """
+    Write one HistoricalPerformance row per vendor for the current period.
+
+    Vendors already snapshotted in this period are skipped, so reruns are
+    harmless. Returns the number of vendors processed.
+    """
+    date = period_start(period, now)
+    rows = Vendor.objects.order_by('pk').values('pk', *METRIC_FIELDS)
+    batch, total = [], 0
+    for row in rows.iterator(chunk_size=batch_size):
+        vendor_id = row.pop('pk')
+        batch.append(HistoricalPerformance(vendor_id=vendor_id, date=date, **row))
+        if len(batch) >= batch_size:
+            HistoricalPerformance.objects.bulk_create(batch, ignore_conflicts=True)
+            total += len(batch)
+            batch = []
+    if batch:
+        HistoricalPerformance.objects.bulk_create(batch, ignore_conflicts=True)
+        total += len(batch)
+    return total
+
+
+def performance_history(vendor_id, bucket='daily', start=None, end=None):
+    """
+    Average a vendor's snapshots into daily/weekly/monthly buckets.
+
+    Returns a queryset of dicts with ``date``, the four metrics and
+    ``samples`` (number of snapshots in the bucket), oldest first.
+    """
+    queryset = HistoricalPerformance.objects.filter(vendor_id=vendor_id)
+    if start is not None:
+        queryset = queryset.filter(date__gte=start)
+    if end is not None:
+        queryset = queryset.filter(date__lt=end)
+    return (
+        queryset.annotate(bucket=HISTORY_BUCKETS[bucket]('date'))
+        .values('bucket')
+        .annotate(samples=Count('pk'), **{name: Avg(name) for name in METRIC_FIELDS})
+        .order_by('bucket')
+    )
+
+
+def windowed_metrics(vendor_id, windows=METRIC_WINDOWS, today=None):
+    """
+    A vendor's metrics over each of the last ``windows`` days (today
+    included), from one query over at most ``max(windows)`` rollup rows.
+
+    Returns one dict per window, in order, with ``days``, ``start``,
+    ``end``, the four metrics and the window's completed and canceled
+    order counts.
+    """
+    today = today or timezone.localdate()
+    starts = {days: today - timedelta(days=days - 1) for days in windows}
+    sums = VendorDailyRollup.objects.filter(
+        vendor_id=vendor_id, date__gte=min(starts.values()), date__lte=today
+    ).aggregate(**{
+        f'{name}_{days}': Sum(name, filter=Q(date__gte=start))
+        for days, start in starts.items()
+        for name in ROLLUP_FIELDS
+    })
+    results = []
+    for days, start in starts.items():
+        counters = {name: sums[f'{name}_{days}'] or 0 for name in ROLLUP_FIELDS}
+        results.append({
+            'days': days,
+            'start': start,
+            'end': today,
+            **rates_from_counters(counters),
+            'completed_count': counters['completed_count'],
+            'canceled_count': counters['canceled_count'],
+        })
+    return results
@@ -0,0 +1,211 @@
+"""
+Opt-in per-request profiling.
+
+``RequestProfilingMiddleware`` (enabled with ``REQUEST_PROFILING = True``)
+counts the SQL queries and database time of every request and collects the
+time spent in serializers and signal handlers, which report in through
+``profile_section``. Results go out in a ``Server-Timing`` header and into a
+rolling in-process window per view, summarized by ``stats_summary``.
+
+Queries are counted by ``count_query``, an execute wrapper installed on every
+database connection as it is opened. Connections are per thread, and under
+ASGI the ORM runs in ``sync_to_async`` worker threads rather than the one
+the middleware runs in; the wrapper finds the request's profile through a
+ContextVar, which asgiref carries into those threads.
+"""
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+
+SECTIONS = ('serializer', 'signal')
+
+_current_profile = ContextVar('request_profile', default=None)
+
+
+class RequestProfile:
+    """Timings collected while one request is handled"""
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.sections = dict.fromkeys(SECTIONS, 0.0)
+        self._active = set()
+
+    def execute_wrapper(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - started
+            self.queries += 1
+
+
+def count_query(execute, sql, params, many, context):
+    """Execute wrapper charging the query to the current request profile, if any"""
+    profile = _current_profile.get()
+    if profile is None:
+        return execute(sql, params, many, context)
+    return profile.execute_wrapper(execute, sql, params, many, context)
+
+
+def install_query_counter(connection):
+    if count_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(count_query)
+
+
+@receiver(connection_created)
+def install_query_counter_on_connect(sender, connection, **kwargs):
+    install_query_counter(connection)
+
+
+@contextmanager
+def profile_section(name):
+    """
+    Charge the enclosed block's wall time to ``name`` on the current request
+    profile. Nested blocks of the same name are only counted once; without
+    an active profile this does nothing.
+    """
+    profile = _current_profile.get()
+    if profile is None or name in profile._active:
+        yield
+        return
+    profile._active.add(name)
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile.sections[name] += time.perf_counter() - started
+        profile._active.discard(name)
+
+
+def profiled(name):
+    """Decorator form of ``profile_section``"""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with profile_section(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class RollingStats:
+    """Last ``window`` samples per view, guarded by a lock"""
+
+    def __init__(self, window=1000):
+        self.window = window
+        self._lock = threading.Lock()
+        self._samples = defaultdict(lambda: deque(maxlen=self.window))
+
+    def record(self, view, sample):
+        with self._lock:
+            self._samples[view].append(sample)
+
+    def snapshot(self):
+        with self._lock:
+            return {view: list(samples) for view, samples in self._samples.items()}
+
+    def clear(self):
+        with self._lock:
+            self._samples.clear()
+
+
+stats = RollingStats(getattr(settings, 'REQUEST_PROFILING_WINDOW', 1000))
+
+
+def _percentiles(values):
+    ordered = sorted(values)
+
+    def percentile(fraction):
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+    return {
+        'mean': sum(ordered) / len(ordered),
+        'p50': percentile(0.50),
+        'p90': percentile(0.90),
+        'p99': percentile(0.99),
+        'max': ordered[-1],
+    }
+
+
+def stats_summary():
+    """Percentile summary of the rolling window, per view"""
+    summary = {}
+    for view, samples in sorted(stats.snapshot().items()):
+        summary[view] = {
+            'count': len(samples),
+            **{
+                metric: _percentiles([sample[metric] for sample in samples])
+                for metric in ('total_ms', 'db_ms', 'queries', *(f'{name}_ms' for name in SECTIONS))
+            },
+        }
+    return summary
+
+
+class RequestProfilingMiddleware:
+    """Measure queries, DB time, serializer and signal time per request"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'REQUEST_PROFILING', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        started = time.perf_counter()
+        with self.profiling() as profile:
+            response = self.get_response(request)
+        return self.finish(request, response, profile, started)
+
+    async def __acall__(self, request):
+        started = time.perf_counter()
+        with self.profiling() as profile:
+            response = await self.get_response(request)
+        return self.finish(request, response, profile, started)
+
+    @contextmanager
+    def profiling(self):
+        profile = RequestProfile()
+        # Connections of this thread opened before this module was imported
+        for connection in connections.all(initialized_only=True):
+            install_query_counter(connection)
+        token = _current_profile.set(profile)
+        try:
+            yield profile
+        finally:
+            _current_profile.reset(token)
+
+    def finish(self, request, response, profile, started):
+        total = time.perf_counter() - started
+        sample = {
+            'total_ms': total * 1000,
+            'db_ms': profile.db_time * 1000,
+            'queries': profile.queries,
+            **{f'{name}_ms': value * 1000 for name, value in profile.sections.items()},
+        }
+        match = getattr(request, 'resolver_match', None)
+        view = f"{request.method} {match.view_name if match else 'unresolved'}"
+        stats.record(view, sample)
+
+        timings = [f'db;desc="{profile.queries} queries";dur={sample["db_ms"]:.2f}']
+        timings += [f'{name};dur={sample[f"{name}_ms"]:.2f}' for name in SECTIONS]
+        timings.append(f'total;dur={sample["total_ms"]:.2f}')
+        response['Server-Timing'] = ', '.join(timings)
+        return response
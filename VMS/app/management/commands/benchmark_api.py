@@ -0,0 +1,244 @@
+"""
+Benchmark the VMS API hot paths against a throwaway database.
+
+    python manage.py benchmark_api --orders 100000 --vendors 500
+    python manage.py benchmark_api --orders 1000 --output bench.json --scenario po_list
+    python manage.py benchmark_api --concurrency 1,8,32 --endpoint vendor_detail
+    python manage.py benchmark_api --serializers 5000
+    python manage.py benchmark_api --writers 1,4,16 --db-file bench.sqlite3
+    python manage.py benchmark_api --renderers 5000
+    python manage.py benchmark_api --profiles 1,4,16 --db-file bench.sqlite3
+
+A separate test database is created (in memory for SQLite unless --db-file
+is given), seeded with synthetic data and destroyed afterwards, so the
+development database is never touched.
+"""
+import json
+import random
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from app.benchmark import (
+    CONCURRENCY_ENDPOINTS,
+    SCENARIOS,
+    compare_renderers,
+    compare_serializers,
+    environment,
+    run_benchmarks,
+    run_concurrency_benchmarks,
+    run_profile_benchmarks,
+    run_write_concurrency_benchmarks,
+    seed,
+)
+
+
+class Command(BaseCommand):
+    help = "Seed synthetic data and measure latency/throughput/query counts of the API"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--vendors', type=int, default=100, help="Vendors to seed")
+        parser.add_argument('--orders', type=int, default=1000, help="Purchase orders to seed (1k-1M)")
+        parser.add_argument('--iterations', type=int, default=200, help="Timed requests per scenario")
+        parser.add_argument('--page-size', type=int, default=100, help="Page size for list scenarios")
+        parser.add_argument(
+            '--scenario', action='append', choices=SCENARIOS, dest='scenarios',
+            help="Only run this scenario (repeatable)",
+        )
+        parser.add_argument(
+            '--concurrency',
+            help="Also compare WSGI vs ASGI read paths at these concurrency levels, e.g. 1,8,32",
+        )
+        parser.add_argument(
+            '--endpoint', choices=CONCURRENCY_ENDPOINTS, default='vendor_detail',
+            help="Read endpoint used by --concurrency",
+        )
+        parser.add_argument(
+            '--requests-per-client', type=int, default=20,
+            help="Requests each concurrent client issues with --concurrency / --writers / --profiles",
+        )
+        parser.add_argument(
+            '--writers',
+            help="Also run parallel PO updates against a few hot vendors at these concurrency "
+                 "levels, e.g. 1,4,16, and check the metrics afterwards (needs --db-file)",
+        )
+        parser.add_argument(
+            '--hot-vendors', type=int, default=4,
+            help="Vendors whose orders the --writers clients update",
+        )
+        parser.add_argument(
+            '--profiles',
+            help="Also compare the development and production database profiles on a mix of "
+                 "concurrent reads and writes at these levels, e.g. 1,4,16 (needs --db-file)",
+        )
+        parser.add_argument(
+            '--serializers', type=int, metavar='ROWS',
+            help="Also compare ModelSerializer and ValuesSerializer on this many rows",
+        )
+        parser.add_argument(
+            '--renderers', type=int, metavar='ROWS',
+            help="Also compare DRF's JSON renderer/parser with the fast pair on this many rows",
+        )
+        parser.add_argument('--seed', type=int, default=0, help="Random seed for data and requests")
+        parser.add_argument('--db-file', help="Use an on-disk SQLite file for the benchmark database")
+        parser.add_argument('--output', help="Write results as JSON to this path")
+
+    def parse_levels(self, options, name):
+        if not options[name]:
+            return []
+        try:
+            levels = [int(level) for level in options[name].split(',')]
+        except ValueError:
+            raise CommandError(f"--{name} must be a comma separated list of integers")
+        if min(levels) < 1:
+            raise CommandError(f"--{name} levels must be at least 1")
+        return levels
+
+    def handle(self, *args, **options):
+        if options['vendors'] < 1:
+            raise CommandError("--vendors must be at least 1")
+        levels = self.parse_levels(options, 'concurrency')
+        writer_levels = self.parse_levels(options, 'writers')
+        profile_levels = self.parse_levels(options, 'profiles')
+        # Concurrent writers on a shared in-memory database fail with "table is locked"
+        if writer_levels and not options['db_file']:
+            raise CommandError("--writers needs an on-disk database (--db-file)")
+        if profile_levels and not options['db_file']:
+            raise CommandError("--profiles needs an on-disk database (--db-file)")
+        if options['db_file']:
+            settings.DATABASES['default'].setdefault('TEST', {})['NAME'] = options['db_file']
+
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            rng = random.Random(options['seed'])
+            started = time.perf_counter()
+            vendor_ids = seed(options['vendors'], options['orders'], rng=rng)
+            seed_seconds = time.perf_counter() - started
+            self.stdout.write(
+                f"Seeded {options['vendors']} vendors / {options['orders']} orders "
+                f"in {seed_seconds:.1f}s"
+            )
+            results = run_benchmarks(
+                vendor_ids,
+                options['iterations'],
+                scenarios=options['scenarios'],
+                page_size=options['page_size'],
+                rng=random.Random(options['seed'] + 1),
+            )
+            concurrency = run_concurrency_benchmarks(
+                vendor_ids,
+                levels,
+                requests_per_client=options['requests_per_client'],
+                endpoint=options['endpoint'],
+                rng=random.Random(options['seed'] + 2),
+            ) if levels else None
+            writers = run_write_concurrency_benchmarks(
+                vendor_ids,
+                writer_levels,
+                requests_per_client=options['requests_per_client'],
+                hot_vendors=options['hot_vendors'],
+                rng=random.Random(options['seed'] + 3),
+            ) if writer_levels else None
+            profiles = run_profile_benchmarks(
+                vendor_ids,
+                profile_levels,
+                requests_per_client=options['requests_per_client'],
+                seed=options['seed'] + 4,
+            ) if profile_levels else None
+            serializers = compare_serializers(options['serializers']) if options['serializers'] else None
+            renderers = compare_renderers(options['renderers']) if options['renderers'] else None
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        for name, result in results.items():
+            self.stdout.write(
+                f"{name:20} p50={result['p50_ms']:8.2f}ms p99={result['p99_ms']:8.2f}ms "
+                f"{result['throughput_rps']:8.1f} req/s queries={result['queries']} "
+                f"errors={result['errors']}"
+            )
+
+        if concurrency:
+            self.stdout.write(f"Concurrency ({options['endpoint']}):")
+            for level in levels:
+                line = f"  {level:4} clients"
+                for mode in ('wsgi', 'asgi'):
+                    result = concurrency[mode][level]
+                    line += (
+                        f"  {mode} p50={result['p50_ms']:8.2f}ms p99={result['p99_ms']:8.2f}ms "
+                        f"{result['throughput_rps']:8.1f} req/s errors={result['errors']}"
+                    )
+                self.stdout.write(line)
+
+        if writers:
+            self.stdout.write(f"Parallel writers ({options['hot_vendors']} hot vendors):")
+            for level, result in writers.items():
+                self.stdout.write(
+                    f"  {level:4} writers p50={result['p50_ms']:8.2f}ms p99={result['p99_ms']:8.2f}ms "
+                    f"{result['throughput_rps']:8.1f} req/s conflicts={result['conflicts']} "
+                    f"errors={result['errors']} consistent={result['consistent']}"
+                )
+
+        if profiles:
+            self.stdout.write("Database profiles (reads + 20% PATCH):")
+            for level in profile_levels:
+                line = f"  {level:4} clients"
+                for name, by_level in profiles.items():
+                    result = by_level[level]
+                    line += (
+                        f"  {name} p50={result['p50_ms']:8.2f}ms p99={result['p99_ms']:8.2f}ms "
+                        f"{result['throughput_rps']:8.1f} req/s errors={result['errors']}"
+                    )
+                self.stdout.write(line)
+
+        if serializers:
+            self.stdout.write("Serializers (query + serialize + render):")
+            for name, result in serializers.items():
+                self.stdout.write(
+                    f"  {name:16} rows={result['rows']} model={result['model_serializer_ms']:8.2f}ms "
+                    f"values={result['values_serializer_ms']:8.2f}ms speedup={result['speedup']:.1f}x "
+                    f"identical={result['identical']}"
+                )
+
+        if renderers:
+            self.stdout.write(
+                f"JSON ({renderers['rows']} rows, {renderers['bytes']} bytes, "
+                f"accelerator={renderers['accelerator']}, identical={renderers['identical']}):"
+            )
+            for name in ('render', 'parse'):
+                result = renderers[name]
+                self.stdout.write(
+                    f"  {name:16} drf={result['drf_ms']:8.2f}ms fast={result['fast_ms']:8.2f}ms "
+                    f"speedup={result['speedup']:.1f}x"
+                )
+
+        if options['output']:
+            report = {
+                'environment': environment(),
+                'scale': {
+                    'vendors': options['vendors'],
+                    'orders': options['orders'],
+                    'iterations': options['iterations'],
+                    'page_size': options['page_size'],
+                    'seed': options['seed'],
+                    'seed_seconds': seed_seconds,
+                },
+                'results': results,
+            }
+            if concurrency:
+                report['concurrency'] = {'endpoint': options['endpoint'], **concurrency}
+            if writers:
+                report['writers'] = {'hot_vendors': options['hot_vendors'], **writers}
+            if profiles:
+                report['profiles'] = profiles
+            if serializers:
+                report['serializers'] = serializers
+            if renderers:
+                report['renderers'] = renderers
+            with open(options['output'], 'w') as fh:
+                json.dump(report, fh, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Results written to {options['output']}"))
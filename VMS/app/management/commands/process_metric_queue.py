@@ -0,0 +1,48 @@
+"""
+Worker for deferred vendor metric recomputes.
+
+Used with ``METRICS_RECOMPUTE_MODE = 'deferred'``: PO saves only queue their
+vendor, and this worker recomputes each queued vendor once per flush.
+
+    python manage.py process_metric_queue --interval 5 --workers 4
+    python manage.py process_metric_queue --once
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from app.metrics import flush_dirty_vendors
+
+
+class Command(BaseCommand):
+    help = "Recompute metrics for vendors queued by deferred PO saves"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval', type=float, default=5.0,
+            help="Seconds between flushes",
+        )
+        parser.add_argument(
+            '--workers', type=int, default=1,
+            help="Threads recomputing vendor batches in parallel",
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help="Vendors recomputed per aggregate query",
+        )
+        parser.add_argument(
+            '--once', action='store_true',
+            help="Flush the queue once and exit",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            started = time.monotonic()
+            recomputed = flush_dirty_vendors(
+                workers=options['workers'], batch_size=options['batch_size']
+            )
+            if recomputed:
+                self.stdout.write(f"Recomputed metrics for {recomputed} vendor(s)")
+            if options['once']:
+                break
+            time.sleep(max(0.0, options['interval'] - (time.monotonic() - started)))
@@ -0,0 +1,106 @@
+"""
+Rebuild the incremental vendor metric counters and daily rollups from raw
+purchase orders, or check the stored ones against them.
+
+    python manage.py rebuild_vendor_metrics
+    python manage.py rebuild_vendor_metrics --vendor 1 --vendor 2 --check
+    python manage.py rebuild_vendor_metrics --batch-size 1000
+"""
+import math
+
+from django.core.management.base import BaseCommand, CommandError
+
+from app.models import Vendor, VendorDailyRollup, VendorMetricCounters
+from app.metrics import (
+    COUNTER_FIELDS,
+    METRIC_FIELDS,
+    ROLLUP_FIELDS,
+    compute_vendor_metrics,
+    count_vendor_counters,
+    recompute_vendors,
+    vendor_rollup_rows,
+)
+
+
+class Command(BaseCommand):
+    help = "Rebuild vendor metric counters from scratch, or verify the stored ones"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--vendor', action='append', type=int, dest='vendor_ids',
+            help="Only rebuild this vendor id (repeatable)",
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help="Vendors recomputed per aggregate query",
+        )
+        parser.add_argument(
+            '--check', action='store_true',
+            help="Don't rebuild: compare the stored counters and metrics with a recount of the "
+                 "raw orders, and the stored daily rollups with the ones rebuilt from them, and "
+                 "fail on mismatch",
+        )
+
+    def handle(self, *args, **options):
+        vendors = Vendor.objects.order_by('pk')
+        if options['vendor_ids']:
+            vendors = vendors.filter(pk__in=options['vendor_ids'])
+
+        if not options['check']:
+            rebuilt = recompute_vendors(vendors, batch_size=options['batch_size'])
+            self.stdout.write(self.style.SUCCESS(f"Rebuilt metric counters for {rebuilt} vendor(s)"))
+            return
+
+        mismatches = []
+        checked = 0
+        for vendor in vendors.iterator():
+            mismatches.extend(self.check_vendor(vendor))
+            checked += 1
+        for line in mismatches:
+            self.stderr.write(line)
+        if mismatches:
+            raise CommandError(f"{len(mismatches)} metric mismatch(es) found")
+        self.stdout.write(self.style.SUCCESS(f"Checked metric counters for {checked} vendor(s)"))
+
+    def check_vendor(self, vendor):
+        """Describe every way the vendor's stored counters and metrics drifted from its orders"""
+        mismatches = []
+        expected = compute_vendor_metrics(vendor)
+        for name in METRIC_FIELDS:
+            stored = getattr(vendor, name)
+            if not math.isclose(stored, expected[name], abs_tol=1e-6):
+                mismatches.append(
+                    f"{vendor.vendor_code}: {name} stored={stored} recompute={expected[name]}"
+                )
+
+        counters = VendorMetricCounters.objects.filter(vendor=vendor).values(*COUNTER_FIELDS).first()
+        if counters is None:
+            mismatches.append(f"{vendor.vendor_code}: no metric counters")
+        else:
+            recount = count_vendor_counters(vendor.pk)
+            for name in COUNTER_FIELDS:
+                if not math.isclose(counters[name], recount[name], abs_tol=1e-6):
+                    mismatches.append(
+                        f"{vendor.vendor_code}: {name} counters={counters[name]} "
+                        f"recount={recount[name]}"
+                    )
+
+        stored = {
+            row['date']: row
+            for row in VendorDailyRollup.objects.filter(vendor=vendor).values('date', *ROLLUP_FIELDS)
+        }
+        for row in vendor_rollup_rows([vendor.pk]):
+            day = stored.pop(row.date, None)
+            if day is None:
+                mismatches.append(f"{vendor.vendor_code}: no rollup for {row.date}")
+                continue
+            for name in ROLLUP_FIELDS:
+                expected = getattr(row, name)
+                if not math.isclose(day[name], expected, abs_tol=1e-6):
+                    mismatches.append(
+                        f"{vendor.vendor_code}: {row.date} {name} rollup={day[name]} "
+                        f"recount={expected}"
+                    )
+        for date in stored:
+            mismatches.append(f"{vendor.vendor_code}: rollup for {date} has no orders")
+        return mismatches
@@ -0,0 +1,46 @@
+"""
+Refresh the SQLite read replica from the primary database.
+
+    python manage.py refresh_replica
+    python manage.py refresh_replica --loop --interval 5
+
+Needs VMS_DB_REPLICA (see settings.py). Replicas on other database backends
+are kept up to date by the database's own replication instead.
+"""
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+
+from app.db import REPLICA_ALIAS, copy_sqlite_database
+
+
+class Command(BaseCommand):
+    help = "Copy the primary SQLite database over the read replica"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--loop', action='store_true',
+            help="Keep running, refreshing the replica every --interval seconds",
+        )
+        parser.add_argument(
+            '--interval', type=float, default=5.0,
+            help="Seconds between refreshes with --loop; bounds how stale replica reads get",
+        )
+
+    def handle(self, *args, **options):
+        if REPLICA_ALIAS not in settings.DATABASES:
+            raise CommandError("No replica database is configured (set VMS_DB_REPLICA)")
+        source, target = settings.DATABASES[DEFAULT_DB_ALIAS], settings.DATABASES[REPLICA_ALIAS]
+        if not all(db['ENGINE'] == 'django.db.backends.sqlite3' for db in (source, target)):
+            raise CommandError("refresh_replica only copies SQLite databases")
+        while True:
+            started = time.perf_counter()
+            copy_sqlite_database(source['NAME'], target['NAME'])
+            self.stdout.write(
+                f"Refreshed {target['NAME']} in {(time.perf_counter() - started) * 1000:.0f}ms"
+            )
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,43 @@
+"""
+Snapshot every vendor's performance metrics into HistoricalPerformance.
+
+    python manage.py snapshot_vendor_performance
+    python manage.py snapshot_vendor_performance --period hour --loop
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from app.history import SNAPSHOT_PERIODS, snapshot_vendor_performance
+
+
+class Command(BaseCommand):
+    help = "Record one HistoricalPerformance row per vendor for the current period"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--period', choices=sorted(SNAPSHOT_PERIODS), default='day',
+            help="Snapshot granularity; reruns within a period are skipped",
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help="Rows per bulk insert",
+        )
+        parser.add_argument(
+            '--loop', action='store_true',
+            help="Keep running, taking a snapshot every --interval seconds",
+        )
+        parser.add_argument(
+            '--interval', type=float, default=300.0,
+            help="Seconds between snapshot attempts with --loop",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            count = snapshot_vendor_performance(
+                period=options['period'], batch_size=options['batch_size']
+            )
+            self.stdout.write(f"Snapshotted {count} vendor(s)")
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,531 @@
+"""
+Vendor performance metric engine.
+
+Every vendor keeps a row of running counters (VendorMetricCounters). A purchase
+order only contributes to those counters while it is completed, so a save is
+applied as "subtract the old contribution, add the new one" - a constant amount
+of work however many orders the vendor already has.
+
+Alongside, VendorDailyRollup keeps the same counters (plus canceled orders)
+per vendor per day, updated by the same deltas, for metrics over a window of
+days (see ``app.history.windowed_metrics``).
+
+The counters and rollups can always be rebuilt from the raw PurchaseOrder rows
+with ``rebuild_vendor_counters`` or, for many vendors at once,
+``recompute_vendors`` (see the ``rebuild_vendor_metrics`` command).
+"""
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Avg, Count, F, Q, Sum
+from django.db.models.functions import Coalesce, TruncDate
+
+from django.utils import timezone
+
+from .cache import invalidate_vendor_performance
+from .models import (
+    VERSION_ATTEMPTS,
+    DirtyVendor,
+    PurchaseOrder,
+    Vendor,
+    VendorDailyRollup,
+    VendorMetricCounters,
+    VersionConflict,
+    retry_on_conflict,
+)
+
+
+COUNTER_FIELDS = (
+    'completed_count',
+    'on_time_count',
+    'rating_sum',
+    'rating_count',
+    'response_time_sum',
+    'response_time_count',
+    'fulfilled_count',
+)
+
+# Counters kept per vendor per day
+ROLLUP_FIELDS = (*COUNTER_FIELDS, 'canceled_count')
+ROLLUP_STATUSES = ('completed', 'canceled')
+
+METRIC_FIELDS = (
+    'on_time_delivery_rate',
+    'quality_rating_avg',
+    'average_response_time',
+    'fulfillment_rate',
+)
+
+# Each metric is numerator / denominator * scale over two counters
+METRIC_COUNTERS = {
+    'on_time_delivery_rate': ('on_time_count', 'completed_count', 100),
+    'quality_rating_avg': ('rating_sum', 'rating_count', 1),
+    'average_response_time': ('response_time_sum', 'response_time_count', 1 / 3600),
+    'fulfillment_rate': ('fulfilled_count', 'completed_count', 100),
+}
+
+# The PurchaseOrder columns each counter reads, besides vendor_id which
+# they all do (see order_rollup_contribution)
+COUNTER_INPUTS = {
+    'completed_count': ('status',),
+    'on_time_count': ('status', 'is_on_time'),
+    'rating_sum': ('status', 'quality_rating'),
+    'rating_count': ('status', 'quality_rating'),
+    'response_time_sum': ('status', 'response_seconds'),
+    'response_time_count': ('status', 'response_seconds'),
+    'fulfilled_count': ('status',),
+    'canceled_count': ('status',),
+}
+
+# The columns a rollup's day is taken from (see rollup_date)
+ROLLUP_DATE_INPUTS = ('completed_date', 'order_date')
+
+# A PO save that changes none of these leaves every counter, rollup and
+# metric as it was
+ORDER_METRIC_INPUTS = frozenset({
+    'vendor_id',
+    *ROLLUP_DATE_INPUTS,
+    *(name for inputs in COUNTER_INPUTS.values() for name in inputs),
+})
+
+
+def order_contribution(state):
+    """
+    Return the counter values a single purchase order adds to its vendor.
+
+    ``state`` is a mapping of PurchaseOrder attnames to values (see
+    ``PurchaseOrder.snapshot``); ``None`` means the order does not exist.
+    """
+    contribution = dict.fromkeys(COUNTER_FIELDS, 0)
+    if not state or state.get('status') != 'completed':
+        return contribution
+
+    contribution['completed_count'] = 1
+    if state.get('is_on_time'):
+        contribution['on_time_count'] = 1
+    if state.get('quality_rating') is not None:
+        contribution['rating_sum'] = state['quality_rating']
+        contribution['rating_count'] = 1
+    if state.get('response_seconds') is not None:
+        contribution['response_time_sum'] = state['response_seconds']
+        contribution['response_time_count'] = 1
+    if state['status'] != 'canceled':
+        contribution['fulfilled_count'] = 1
+    return contribution
+
+
+def rollup_date(state):
+    """
+    The day an order is rolled up under: completed orders count on the day
+    they were completed, canceled ones on the day they were ordered.
+    """
+    return timezone.localtime(state.get('completed_date') or state['order_date']).date()
+
+
+def order_rollup_contribution(state):
+    """Like ``order_contribution``, plus ``canceled_count``"""
+    return {
+        **order_contribution(state),
+        'canceled_count': int(bool(state) and state.get('status') == 'canceled'),
+    }
+
+
+def rates_from_counters(counters, names=METRIC_FIELDS):
+    """
+    Derive the vendor metrics ``names`` (by default all four) from a mapping
+    holding at least their ``METRIC_COUNTERS``.
+    """
+    rates = {}
+    for name in names:
+        numerator, denominator, scale = METRIC_COUNTERS[name]
+        rates[name] = (
+            counters[numerator] / counters[denominator] * scale if counters[denominator] else 0.0
+        )
+    return rates
+
+
+def metrics_reading(counter_names):
+    """The metrics computed from any of ``counter_names``, in METRIC_FIELDS order"""
+    return tuple(
+        name for name, (numerator, denominator, _) in METRIC_COUNTERS.items()
+        if numerator in counter_names or denominator in counter_names
+    )
+
+
+def metric_inputs_changed(changed_fields):
+    """True if a PO save changing ``changed_fields`` (attnames) can move any metric"""
+    return not ORDER_METRIC_INPUTS.isdisjoint(changed_fields)
+
+
+def completed_orders():
+    """
+    The only orders that feed the metrics. Filtering on status in the WHERE
+    clause (rather than in each aggregate's FILTER) turns the recompute into
+    a range lookup on the (vendor, status, ...) index.
+    """
+    return PurchaseOrder.objects.filter(status='completed')
+
+
+def counter_aggregates(only=None):
+    """
+    Conditional aggregates that compute every counter in a single pass over
+    a queryset of ``completed_orders()`` - or of any orders, with ``only`` a
+    Q object selecting the completed ones.
+    """
+    def where(condition=None):
+        if only is None:
+            return condition
+        return only if condition is None else only & condition
+
+    return {
+        'completed_count': Count('pk', filter=where()),
+        'on_time_count': Count('pk', filter=where(Q(is_on_time=True))),
+        'rating_sum': Sum('quality_rating', filter=where()),
+        'rating_count': Count('quality_rating', filter=where()),
+        'response_time_sum': Sum('response_seconds', filter=where()),
+        'response_time_count': Count('response_seconds', filter=where()),
+        'fulfilled_count': Count('pk', filter=where(~Q(status='canceled'))),
+    }
+
+
+def rollup_orders():
+    """The orders that feed the daily rollups, annotated with ``rollup_date``"""
+    return PurchaseOrder.objects.filter(status__in=ROLLUP_STATUSES).annotate(
+        rollup_date=TruncDate(Coalesce('completed_date', 'order_date'))
+    )
+
+
+def rollup_aggregates():
+    """Aggregates computing every rollup field over ``rollup_orders()``"""
+    return {
+        **counter_aggregates(only=Q(status='completed')),
+        'canceled_count': Count('pk', filter=Q(status='canceled')),
+    }
+
+
+def _normalize_totals(totals):
+    """Turn raw aggregate output into plain counter values"""
+    return {
+        **{name: totals[name] for name in COUNTER_FIELDS},
+        'rating_sum': totals['rating_sum'] or 0.0,
+        'response_time_sum': totals['response_time_sum'] or 0.0,
+    }
+
+
+def _normalize_rollup(totals):
+    return {**_normalize_totals(totals), 'canceled_count': totals['canceled_count']}
+
+
+def count_vendor_counters(vendor_id):
+    """Count a vendor's counters from scratch in one query over its purchase orders"""
+    return _normalize_totals(
+        completed_orders().filter(vendor_id=vendor_id).aggregate(**counter_aggregates())
+    )
+
+
+def write_vendor_metrics(vendor_id, names=METRIC_FIELDS):
+    """
+    Refresh a vendor's metric fields ``names`` (by default all four) from
+    its counters.
+
+    Only those metric columns are written (plus the version), as a
+    compare-and-swap on ``version``: if the vendor was edited between reading
+    the counters and writing, the counters and version are read again and
+    the write retried, so neither write is lost. Returns the written metrics
+    and the vendor's new version.
+    """
+    counter_names = dict.fromkeys(
+        counter for name in names for counter in METRIC_COUNTERS[name][:2]
+    )
+    for _ in range(VERSION_ATTEMPTS):
+        totals = VendorMetricCounters.objects.filter(
+            vendor_id=vendor_id
+        ).values(*counter_names, 'vendor__version').get()
+        version = totals.pop('vendor__version')
+        metrics = rates_from_counters(totals, names)
+        written = Vendor.objects.filter(pk=vendor_id, version=version).update(
+            **metrics, version=version + 1, last_modified=timezone.now()
+        )
+        if written:
+            invalidate_vendor_performance([vendor_id])
+            return {**metrics, 'version': version + 1}
+    raise VersionConflict(f"Vendor {vendor_id} kept changing while its metrics were written")
+
+
+def count_vendor_rollup(vendor_id, date):
+    """Count one day's rollup of a vendor from scratch"""
+    return _normalize_rollup(
+        rollup_orders().filter(vendor_id=vendor_id, rollup_date=date).aggregate(**rollup_aggregates())
+    )
+
+
+def vendor_rollup_rows(vendor_ids):
+    """Every day's rollup of the vendors as unsaved VendorDailyRollup rows, in one query"""
+    rows = (
+        rollup_orders().filter(vendor_id__in=vendor_ids)
+        .values('vendor_id', 'rollup_date').annotate(**rollup_aggregates()).order_by()
+    )
+    return [
+        VendorDailyRollup(vendor_id=row['vendor_id'], date=row['rollup_date'], **_normalize_rollup(row))
+        for row in rows
+    ]
+
+
+def _replace_rollups(vendor_ids, rollups):
+    VendorDailyRollup.objects.filter(vendor_id__in=vendor_ids).delete()
+    VendorDailyRollup.objects.bulk_create(rollups)
+
+
+def rebuild_vendor_counters(vendor_id):
+    """
+    Recount a vendor's counters and daily rollups from its purchase orders
+    and refresh the vendor's metric fields. Returns the saved
+    VendorMetricCounters row.
+    """
+    totals = count_vendor_counters(vendor_id)
+    rollups = vendor_rollup_rows([vendor_id])
+    with transaction.atomic():
+        counters, _ = VendorMetricCounters.objects.update_or_create(
+            vendor_id=vendor_id, defaults=totals
+        )
+        _replace_rollups([vendor_id], rollups)
+        write_vendor_metrics(vendor_id)
+    return counters
+
+
+def order_change_deltas(old_state, new_state):
+    """
+    Return ``{vendor_id: counter deltas}`` for the vendors whose counters move
+    when a purchase order goes from ``old_state`` to ``new_state``.
+
+    Either state may be ``None`` (order created / deleted).
+    """
+    deltas = {}
+    for state, sign in ((old_state, -1), (new_state, 1)):
+        if not state:
+            continue
+        delta = deltas.setdefault(state['vendor_id'], dict.fromkeys(COUNTER_FIELDS, 0))
+        for name, value in order_contribution(state).items():
+            delta[name] += sign * value
+    return {
+        vendor_id: delta for vendor_id, delta in deltas.items() if any(delta.values())
+    }
+
+
+def order_rollup_deltas(old_state, new_state):
+    """
+    Return ``{vendor_id: {date: rollup deltas}}`` for the daily rollups that
+    move when a purchase order goes from ``old_state`` to ``new_state``.
+    """
+    deltas = {}
+    for state, sign in ((old_state, -1), (new_state, 1)):
+        if not state or state.get('status') not in ROLLUP_STATUSES:
+            continue
+        delta = deltas.setdefault(state['vendor_id'], {}).setdefault(
+            rollup_date(state), dict.fromkeys(ROLLUP_FIELDS, 0)
+        )
+        for name, value in order_rollup_contribution(state).items():
+            delta[name] += sign * value
+    deltas = {
+        vendor_id: {date: delta for date, delta in days.items() if any(delta.values())}
+        for vendor_id, days in deltas.items()
+    }
+    return {vendor_id: days for vendor_id, days in deltas.items() if days}
+
+
+def apply_rollup_deltas(vendor_id, days):
+    """Add ``{date: deltas}`` to a vendor's daily rollups"""
+    for date, delta in days.items():
+        updated = VendorDailyRollup.objects.filter(vendor_id=vendor_id, date=date).update(
+            **{name: F(name) + value for name, value in delta.items() if value}
+        )
+        if not updated:
+            # First order of the day (or rollups not built yet): the order
+            # is already saved, so a recount of the day includes it.
+            VendorDailyRollup.objects.update_or_create(
+                vendor_id=vendor_id, date=date, defaults=count_vendor_rollup(vendor_id, date)
+            )
+
+
+def apply_order_change(old_state, new_state):
+    """
+    Apply the difference between two states of one purchase order to the
+    counters and daily rollups of the affected vendor(s).
+
+    Only the metrics computed from counters that moved are rewritten.
+    Returns a dict of ``{vendor_id: metrics}`` (see ``write_vendor_metrics``)
+    for every vendor whose metrics were refreshed.
+    """
+    refreshed = {}
+    rollups = order_rollup_deltas(old_state, new_state)
+    for vendor_id, delta in order_change_deltas(old_state, new_state).items():
+        with transaction.atomic():
+            updated = VendorMetricCounters.objects.filter(vendor_id=vendor_id).update(
+                **{name: F(name) + value for name, value in delta.items() if value}
+            )
+            if not updated:
+                # No counters yet: the order is already saved, so a recount
+                # includes it.
+                VendorMetricCounters.objects.update_or_create(
+                    vendor_id=vendor_id, defaults=count_vendor_counters(vendor_id)
+                )
+            apply_rollup_deltas(vendor_id, rollups.pop(vendor_id, {}))
+            moved = {name for name, value in delta.items() if value}
+            refreshed[vendor_id] = write_vendor_metrics(vendor_id, metrics_reading(moved))
+    # Cancellations and moved completion days change rollups but no counters
+    for vendor_id, days in rollups.items():
+        with transaction.atomic():
+            apply_rollup_deltas(vendor_id, days)
+    return refreshed
+
+
+def _recount_batch(vendor_ids):
+    """
+    Recount and write the counters, daily rollups and metrics of a batch of
+    vendors. The counters are the sums of the rollups.
+
+    The counts are taken without locks, so the write is verified instead:
+    each vendor's version must have moved by exactly one (this write). If an
+    order save or vendor edit got in between, VersionConflict rolls the
+    batch back for ``retry_on_conflict`` to recount it.
+    """
+    versions = dict(Vendor.objects.filter(pk__in=vendor_ids).values_list('pk', 'version'))
+    rollups = vendor_rollup_rows(versions)
+    sums = {vendor_id: dict.fromkeys(COUNTER_FIELDS, 0) for vendor_id in versions}
+    for rollup in rollups:
+        totals = sums[rollup.vendor_id]
+        for name in COUNTER_FIELDS:
+            totals[name] += getattr(rollup, name)
+
+    counters, vendor_rows = [], []
+    bump = Vendor.version_bump()
+    for vendor_id, totals in sums.items():
+        counters.append(VendorMetricCounters(vendor_id=vendor_id, **totals))
+        vendor_rows.append(Vendor(pk=vendor_id, **rates_from_counters(totals), **bump))
+
+    VendorMetricCounters.objects.bulk_create(
+        counters,
+        update_conflicts=True,
+        unique_fields=['vendor'],
+        update_fields=list(COUNTER_FIELDS),
+    )
+    _replace_rollups(versions, rollups)
+    Vendor.objects.bulk_update(vendor_rows, [*METRIC_FIELDS, *Vendor.VERSION_FIELDS])
+    moved = [
+        vendor_id
+        for vendor_id, version in Vendor.objects.filter(pk__in=versions).values_list('pk', 'version')
+        if version != versions[vendor_id] + 1
+    ]
+    if moved:
+        raise VersionConflict(f"Vendors {moved} changed while being recounted")
+    invalidate_vendor_performance(versions)
+
+
+def recompute_vendors(vendors, batch_size=500):
+    """
+    Recompute counters, daily rollups and metrics for every vendor in a
+    queryset.
+
+    Each batch of vendors costs one grouped aggregate query plus a few bulk
+    writes (and a version read before and after), so nightly backfills do
+    not issue per-vendor queries. Returns the number of vendors recomputed.
+    """
+    vendor_ids = list(vendors.order_by('pk').values_list('pk', flat=True))
+    for start in range(0, len(vendor_ids), batch_size):
+        batch = vendor_ids[start:start + batch_size]
+        retry_on_conflict(lambda: _recount_batch(batch))
+    return len(vendor_ids)
+
+
+def deferred_recompute_enabled():
+    """True when PO saves only queue their vendor for the metric worker"""
+    return getattr(settings, 'METRICS_RECOMPUTE_MODE', 'immediate') == 'deferred'
+
+
+def mark_vendors_dirty(vendor_ids):
+    """Queue vendors for a deferred recompute; repeated marks coalesce"""
+    now = timezone.now()
+    DirtyVendor.objects.bulk_create(
+        [DirtyVendor(vendor_id=vendor_id, marked_at=now) for vendor_id in vendor_ids],
+        update_conflicts=True,
+        unique_fields=['vendor'],
+        update_fields=['marked_at'],
+    )
+
+
+def _flush_batch(vendor_ids, cutoff, batch_size):
+    """
+    Dequeue and recompute one batch in a single transaction, so a failed
+    recompute leaves its vendors queued
+    """
+    with transaction.atomic():
+        DirtyVendor.objects.filter(vendor_id__in=vendor_ids, marked_at__lte=cutoff).delete()
+        return recompute_vendors(Vendor.objects.filter(pk__in=vendor_ids), batch_size=batch_size)
+
+
+def _flush_batch_in_thread(vendor_ids, cutoff, batch_size):
+    try:
+        return _flush_batch(vendor_ids, cutoff, batch_size)
+    finally:
+        # Worker threads own their connection; don't leak it
+        connection.close()
+
+
+def flush_dirty_vendors(workers=1, batch_size=500):
+    """
+    Recompute every vendor queued before now, once each.
+
+    Each batch is dequeued in the same transaction as its recompute, before
+    the recompute reads any orders: a vendor marked again meanwhile simply
+    stays queued for the next flush, and a batch whose recompute fails is
+    rolled back into the queue. Returns the number of vendors recomputed.
+    """
+    cutoff = timezone.now()
+    vendor_ids = list(
+        DirtyVendor.objects.filter(marked_at__lte=cutoff)
+        .order_by('vendor_id').values_list('vendor_id', flat=True)
+    )
+    if not vendor_ids:
+        return 0
+
+    batches = [
+        vendor_ids[start:start + batch_size]
+        for start in range(0, len(vendor_ids), batch_size)
+    ]
+    if workers <= 1:
+        return sum(_flush_batch(batch, cutoff, batch_size) for batch in batches)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return sum(pool.map(lambda batch: _flush_batch_in_thread(batch, cutoff, batch_size), batches))
+
+
+def compute_vendor_metrics(vendor):
+    """
+    Full recompute of a vendor's metrics straight from its purchase orders,
+    in a single conditional-aggregate query.
+
+    Independent of the counters; used to verify them.
+    """
+    totals = completed_orders().filter(vendor=vendor).aggregate(
+        completed_count=Count('pk'),
+        on_time_count=Count('pk', filter=Q(is_on_time=True)),
+        quality_rating_avg=Avg('quality_rating'),
+        response_seconds=Avg('response_seconds'),
+        fulfilled_count=Count('pk', filter=~Q(status='canceled')),
+    )
+    completed_count = totals['completed_count']
+    response_seconds = totals['response_seconds']
+    return {
+        'on_time_delivery_rate': (
+            (totals['on_time_count'] / completed_count) * 100 if completed_count else 0
+        ),
+        'quality_rating_avg': (
+            totals['quality_rating_avg'] if totals['quality_rating_avg'] is not None else 0.0
+        ),
+        'average_response_time': (
+            response_seconds / 3600 if response_seconds else 0
+        ),
+        'fulfillment_rate': (
+            (totals['fulfilled_count'] / completed_count) * 100 if completed_count else 0
+        ),
+    }
@@ -0,0 +1,42 @@
+# Generated by Django 5.0.4 on 2026-10-17 05:49
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_completed_date(apps, schema_editor):
+    """Existing completed orders have no completion time; assume delivery_date"""
+    PurchaseOrder = apps.get_model('app', 'PurchaseOrder')
+    PurchaseOrder.objects.filter(status='completed').update(
+        completed_date=models.F('delivery_date')
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='purchaseorder',
+            name='completed_date',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='VendorMetricCounters',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('completed_count', models.IntegerField(default=0)),
+                ('on_time_count', models.IntegerField(default=0)),
+                ('rating_sum', models.FloatField(default=0.0)),
+                ('rating_count', models.IntegerField(default=0)),
+                ('response_time_sum', models.FloatField(default=0.0)),
+                ('response_time_count', models.IntegerField(default=0)),
+                ('fulfilled_count', models.IntegerField(default=0)),
+                ('vendor', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='metric_counters', to='app.vendor')),
+            ],
+        ),
+        migrations.RunPython(backfill_completed_date, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.0.4 on 2026-10-17 05:52
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0002_vendor_metric_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DirtyVendor',
+            fields=[
+                ('vendor', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, serialize=False, to='app.vendor')),
+                ('marked_at', models.DateTimeField()),
+            ],
+        ),
+    ]
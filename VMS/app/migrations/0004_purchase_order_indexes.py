@@ -0,0 +1,40 @@
+# Generated by Django 5.0.4 on 2026-10-17 05:55
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0003_dirty_vendor'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='dirtyvendor',
+            name='marked_at',
+            field=models.DateTimeField(db_index=True),
+        ),
+        migrations.AlterField(
+            model_name='purchaseorder',
+            name='vendor',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='app.vendor'),
+        ),
+        migrations.AddIndex(
+            model_name='purchaseorder',
+            index=models.Index(fields=['vendor', 'status', 'delivery_date'], name='po_vendor_status_dlv_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='purchaseorder',
+            index=models.Index(condition=models.Q(('quality_rating__isnull', False), ('status', 'completed')), fields=['vendor', 'quality_rating'], name='po_completed_rated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='purchaseorder',
+            index=models.Index(condition=models.Q(('acknowledgment_date__isnull', False), ('status', 'completed')), fields=['vendor', 'acknowledgment_date', 'issue_date'], name='po_completed_acked_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='purchaseorder',
+            index=models.Index(fields=['order_date', 'id'], name='po_order_date_id_idx'),
+        ),
+    ]
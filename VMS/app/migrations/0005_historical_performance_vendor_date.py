@@ -0,0 +1,23 @@
+# Generated by Django 5.0.4 on 2026-10-17 05:57
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0004_purchase_order_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='historicalperformance',
+            name='vendor',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='app.vendor'),
+        ),
+        migrations.AddConstraint(
+            model_name='historicalperformance',
+            constraint=models.UniqueConstraint(fields=('vendor', 'date'), name='unique_vendor_snapshot_date'),
+        ),
+    ]
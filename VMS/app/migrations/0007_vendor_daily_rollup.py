@@ -0,0 +1,73 @@
+# Generated by Django 5.0.4 on 2026-10-17 06:42
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def backfill_rollups(apps, schema_editor):
+    """
+    Roll up the existing completed and canceled orders per vendor per day,
+    as app.metrics does: completed orders on their completed_date, canceled
+    ones on their order_date.
+    """
+    PurchaseOrder = apps.get_model('app', 'PurchaseOrder')
+    VendorDailyRollup = apps.get_model('app', 'VendorDailyRollup')
+    orders = PurchaseOrder.objects.filter(status__in=('completed', 'canceled')).only(
+        'vendor_id', 'status', 'order_date', 'delivery_date', 'completed_date',
+        'quality_rating', 'issue_date', 'acknowledgment_date',
+    )
+    rollups = {}
+    for order in orders.iterator(chunk_size=2000):
+        day = timezone.localtime(order.completed_date or order.order_date).date()
+        rollup = rollups.get((order.vendor_id, day))
+        if rollup is None:
+            rollup = rollups[order.vendor_id, day] = VendorDailyRollup(
+                vendor_id=order.vendor_id, date=day
+            )
+        if order.status == 'canceled':
+            rollup.canceled_count += 1
+            continue
+        rollup.completed_count += 1
+        rollup.fulfilled_count += 1
+        if order.completed_date is not None and order.completed_date <= order.delivery_date:
+            rollup.on_time_count += 1
+        if order.quality_rating is not None:
+            rollup.rating_sum += order.quality_rating
+            rollup.rating_count += 1
+        if order.acknowledgment_date is not None:
+            response_time = order.acknowledgment_date - order.issue_date
+            rollup.response_time_sum += response_time.total_seconds()
+            rollup.response_time_count += 1
+    VendorDailyRollup.objects.bulk_create(rollups.values(), batch_size=2000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0006_versioned_rows'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VendorDailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('completed_count', models.IntegerField(default=0)),
+                ('on_time_count', models.IntegerField(default=0)),
+                ('rating_sum', models.FloatField(default=0.0)),
+                ('rating_count', models.IntegerField(default=0)),
+                ('response_time_sum', models.FloatField(default=0.0)),
+                ('response_time_count', models.IntegerField(default=0)),
+                ('fulfilled_count', models.IntegerField(default=0)),
+                ('canceled_count', models.IntegerField(default=0)),
+                ('vendor', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='app.vendor')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='vendordailyrollup',
+            constraint=models.UniqueConstraint(fields=('vendor', 'date'), name='unique_vendor_rollup_date'),
+        ),
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
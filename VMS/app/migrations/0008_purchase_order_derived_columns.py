@@ -0,0 +1,63 @@
+# Generated by Django 5.0.4 on 2026-10-17 06:49
+
+from django.db import migrations, models
+from django.db.models.functions import Now
+
+
+BACKFILLED_FIELDS = ['response_seconds', 'is_on_time', 'version', 'last_modified']
+
+
+def backfill_derived_columns(apps, schema_editor):
+    """
+    Compute response_seconds and is_on_time for existing orders (as
+    PurchaseOrder.stamp_derived_fields does), bumping the version and
+    last_modified since the columns are served by the API.
+    """
+    PurchaseOrder = apps.get_model('app', 'PurchaseOrder')
+    orders = PurchaseOrder.objects.only(
+        'issue_date', 'acknowledgment_date', 'delivery_date', 'completed_date'
+    ).order_by('pk')
+    batch = []
+    for order in orders.iterator(chunk_size=2000):
+        if order.acknowledgment_date is not None:
+            order.response_seconds = (order.acknowledgment_date - order.issue_date).total_seconds()
+        if order.completed_date is not None:
+            order.is_on_time = order.completed_date <= order.delivery_date
+        if order.response_seconds is None and order.is_on_time is None:
+            continue
+        order.version = models.F('version') + 1
+        order.last_modified = Now()
+        batch.append(order)
+        if len(batch) == 2000:
+            PurchaseOrder.objects.bulk_update(batch, BACKFILLED_FIELDS)
+            batch = []
+    PurchaseOrder.objects.bulk_update(batch, BACKFILLED_FIELDS)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0007_vendor_daily_rollup'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='purchaseorder',
+            name='po_completed_acked_idx',
+        ),
+        migrations.AddField(
+            model_name='purchaseorder',
+            name='is_on_time',
+            field=models.BooleanField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='purchaseorder',
+            name='response_seconds',
+            field=models.FloatField(editable=False, null=True),
+        ),
+        migrations.RunPython(backfill_derived_columns, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='purchaseorder',
+            index=models.Index(condition=models.Q(('response_seconds__isnull', False), ('status', 'completed')), fields=['vendor', 'response_seconds'], name='po_completed_response_idx'),
+        ),
+    ]
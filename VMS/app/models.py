@@ -1,8 +1,92 @@
-from django.db import models
+from django.db import models, transaction
+from django.utils import timezone
 
 
 
-class Vendor(models.Model):
+VERSION_ATTEMPTS = 5
+
+
+class VersionConflict(Exception):
+    """A versioned row was written by someone else since it was read"""
+
+
+def retry_on_conflict(func, attempts=VERSION_ATTEMPTS, before_retry=None):
+    """
+    Run ``func`` in a transaction (a savepoint inside an outer one), again
+    while it raises VersionConflict, up to ``attempts`` times. ``func`` must
+    re-read what it writes, or ``before_retry`` reload it.
+    """
+    for attempt in range(attempts):
+        try:
+            with transaction.atomic():
+                return func()
+        except VersionConflict:
+            if attempt == attempts - 1:
+                raise
+            if before_retry is not None:
+                before_retry()
+
+
+class Versioned:
+    """
+    Model mixin for rows served with HTTP validators (see app/api/conditional.py)
+    and written optimistically.
+
+    The model declares ``version`` and ``last_modified`` (``auto_now``).
+    Saving a row loaded from the database is a compare-and-swap: the UPDATE
+    only matches while the row still has the version that was loaded, bumps
+    it, and raises VersionConflict otherwise (see ``retry_on_conflict``).
+    Queryset ``update()`` and ``bulk_update()`` calls that change served
+    columns must bump the version too, e.g. with ``version_bump()``.
+    """
+    VERSION_FIELDS = ('version', 'last_modified')
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        self._expected_version = None
+        if update_fields is None or update_fields:
+            if not self._state.adding:
+                self._expected_version = self.version
+                self.version += 1
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, *self.VERSION_FIELDS}
+        try:
+            super().save(*args, **kwargs)
+        except VersionConflict:
+            self.version = self._expected_version
+            raise
+
+    def _do_update(self, base_qs, using, pk_val, values, update_fields, forced_update):
+        expected = getattr(self, '_expected_version', None)
+        if expected is None:
+            # A hand-built instance over an existing row (Django tries an
+            # UPDATE before the INSERT): no version was loaded to compare, so
+            # bump the stored one rather than overwrite it with ours
+            values = [
+                (field, model, models.F('version') + 1 if field.attname == 'version' else value)
+                for field, model, value in values
+            ]
+            updated = super()._do_update(base_qs, using, pk_val, values, update_fields, forced_update)
+            if updated:
+                self.version = base_qs.filter(pk=pk_val).values_list('version', flat=True).get()
+            return updated
+        if super()._do_update(
+            base_qs.filter(version=expected), using, pk_val, values, update_fields, forced_update
+        ):
+            return True
+        if base_qs.filter(pk=pk_val).exists():
+            raise VersionConflict(
+                f"{self._meta.object_name} {pk_val} changed since version {expected} was read"
+            )
+        return False
+
+    @staticmethod
+    def version_bump():
+        """``update()`` keyword arguments that bump the version in SQL"""
+        return {'version': models.F('version') + 1, 'last_modified': timezone.now()}
+
+
+class Vendor(Versioned, models.Model):
     name = models.CharField(max_length=100)
     contact_details = models.TextField()
     address = models.TextField()
@@ -11,14 +95,17 @@ class Vendor(models.Model):
     quality_rating_avg = models.FloatField()
     average_response_time = models.FloatField()
     fulfillment_rate = models.FloatField()
+    version = models.PositiveIntegerField(default=1, editable=False)
+    last_modified = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return self.name
-    
-    
-class PurchaseOrder(models.Model):
+
+
+class PurchaseOrder(Versioned, models.Model):
     po_number = models.CharField(max_length=50, unique=True)
-    vendor = models.ForeignKey(Vendor, on_delete=models.CASCADE)
+    # Indexed through po_vendor_status_dlv_idx, which leads with vendor
+    vendor = models.ForeignKey(Vendor, on_delete=models.CASCADE, db_index=False)
     order_date = models.DateTimeField()
     delivery_date = models.DateTimeField()
     items = models.JSONField()
@@ -27,20 +114,205 @@ class PurchaseOrder(models.Model):
     quality_rating = models.FloatField(null=True)
     issue_date = models.DateTimeField()
     acknowledgment_date = models.DateTimeField(null=True)
+    completed_date = models.DateTimeField(null=True, blank=True)
+    # Derived from the dates on every save (see stamp_derived_fields), so the
+    # metrics are plain SUM/COUNT aggregates
+    response_seconds = models.FloatField(null=True, editable=False)
+    is_on_time = models.BooleanField(null=True, editable=False)
+    version = models.PositiveIntegerField(default=1, editable=False)
+    last_modified = models.DateTimeField(auto_now=True)
+
+    DERIVED_FIELDS = ('response_seconds', 'is_on_time')
+
+    class Meta:
+        indexes = [
+            # Metric recomputes: completed orders of one vendor
+            models.Index(
+                fields=['vendor', 'status', 'delivery_date'],
+                name='po_vendor_status_dlv_idx',
+            ),
+            models.Index(
+                fields=['vendor', 'quality_rating'],
+                condition=models.Q(status='completed', quality_rating__isnull=False),
+                name='po_completed_rated_idx',
+            ),
+            models.Index(
+                fields=['vendor', 'response_seconds'],
+                condition=models.Q(status='completed', response_seconds__isnull=False),
+                name='po_completed_response_idx',
+            ),
+            # Keyset pagination and date-range exports
+            models.Index(fields=['order_date', 'id'], name='po_order_date_id_idx'),
+        ]
 
     def __str__(self):
         return self.po_number
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the persisted state so the metric signals can diff against it
+        instance._loaded_values = dict(zip(
+            field_names,
+            (value for value in values if value is not models.DEFERRED),
+        ))
+        return instance
+
+    def refresh_from_db(self, using=None, fields=None, **kwargs):
+        super().refresh_from_db(using=using, fields=fields, **kwargs)
+        # The refreshed values are the persisted state now; leave the rest
+        deferred = self.get_deferred_fields()
+        if fields is None:
+            names = [field.attname for field in self._meta.concrete_fields]
+        else:
+            names = [self._meta.get_field(name).attname for name in fields]
+        self._loaded_values = {
+            **getattr(self, '_loaded_values', {}),
+            **{name: getattr(self, name) for name in names if name not in deferred},
+        }
+
+    def stamp_completed_date(self):
+        """
+        Set completed_date when the order is first marked completed and clear
+        it otherwise. Returns True if the value changed.
+        """
+        completed_date = self.completed_date
+        if self.status == 'completed':
+            self.completed_date = completed_date or timezone.now()
+        else:
+            self.completed_date = None
+        return self.completed_date != completed_date
+
+    def stamp_derived_fields(self):
+        """
+        Set the columns derived from the order's dates: ``response_seconds``
+        (issue to acknowledgment) and ``is_on_time`` (completed by the
+        delivery date; None until completed). Returns the names that changed.
+        """
+        old = {name: getattr(self, name) for name in self.DERIVED_FIELDS}
+        self.response_seconds = (
+            (self.acknowledgment_date - self.issue_date).total_seconds()
+            if self.acknowledgment_date is not None else None
+        )
+        self.is_on_time = (
+            self.completed_date <= self.delivery_date
+            if self.completed_date is not None else None
+        )
+        return {name for name, value in old.items() if getattr(self, name) != value}
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        stamped = {'completed_date'} if self.stamp_completed_date() else set()
+        stamped |= self.stamp_derived_fields()
+        if stamped and update_fields is not None:
+            kwargs['update_fields'] = {*update_fields, *stamped}
+        super().save(*args, **kwargs)
+
+    def snapshot(self):
+        """Return the current field values keyed by attname"""
+        deferred = self.get_deferred_fields()
+        return {
+            field.attname: getattr(self, field.attname)
+            for field in self._meta.concrete_fields
+            if field.attname not in deferred
+        }
+
+    def changed_fields(self, state=None):
+        """
+        Attnames whose value in ``state`` (by default the current
+        ``snapshot()``) differs from the persisted state remembered by
+        ``from_db``, or None if that state is unknown.
+        """
+        loaded = getattr(self, '_loaded_values', None)
+        if loaded is None:
+            return None
+        state = self.snapshot() if state is None else state
+        return {
+            name for name, value in state.items()
+            if name not in loaded or loaded[name] != value
+        }
+
+
+class VendorMetricCounters(models.Model):
+    """
+    Running totals behind a vendor's performance metrics.
+
+    Maintained incrementally by the PurchaseOrder signals so the metrics can be
+    refreshed without scanning the vendor's order history.
+    """
+    vendor = models.OneToOneField(Vendor, on_delete=models.CASCADE, related_name='metric_counters')
+    completed_count = models.IntegerField(default=0)
+    on_time_count = models.IntegerField(default=0)
+    rating_sum = models.FloatField(default=0.0)
+    rating_count = models.IntegerField(default=0)
+    response_time_sum = models.FloatField(default=0.0)
+    response_time_count = models.IntegerField(default=0)
+    fulfilled_count = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.vendor_id} - {self.completed_count} completed"
+
+
+class VendorDailyRollup(models.Model):
+    """
+    A vendor's counters restricted to the orders of one day: completed
+    orders by their completed_date, canceled orders by their order_date.
+
+    Maintained with the counters, so a windowed metric sums at most one row
+    per day in the window.
+    """
+    # Indexed through unique_vendor_rollup_date, which leads with vendor
+    vendor = models.ForeignKey(Vendor, on_delete=models.CASCADE, db_index=False)
+    date = models.DateField()
+    completed_count = models.IntegerField(default=0)
+    on_time_count = models.IntegerField(default=0)
+    rating_sum = models.FloatField(default=0.0)
+    rating_count = models.IntegerField(default=0)
+    response_time_sum = models.FloatField(default=0.0)
+    response_time_count = models.IntegerField(default=0)
+    fulfilled_count = models.IntegerField(default=0)
+    canceled_count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['vendor', 'date'], name='unique_vendor_rollup_date'),
+        ]
+
+    def __str__(self):
+        return f"{self.vendor_id} - {self.date}"
+
+
+class DirtyVendor(models.Model):
+    """
+    Queue of vendors whose metrics need a deferred recompute.
+
+    One row per vendor, so repeated marks coalesce into a single recompute.
+    """
+    vendor = models.OneToOneField(Vendor, on_delete=models.CASCADE, primary_key=True)
+    marked_at = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return f"{self.vendor_id} - {self.marked_at}"
+
 
 class HistoricalPerformance(models.Model):
-    vendor = models.ForeignKey(Vendor, on_delete=models.CASCADE)
+    # Indexed through unique_vendor_snapshot_date, which leads with vendor
+    vendor = models.ForeignKey(Vendor, on_delete=models.CASCADE, db_index=False)
     date = models.DateTimeField()
     on_time_delivery_rate = models.FloatField()
     quality_rating_avg = models.FloatField()
     average_response_time = models.FloatField()
     fulfillment_rate = models.FloatField()
 
+    class Meta:
+        constraints = [
+            # One snapshot per vendor per period; also serves (vendor, date) range scans
+            models.UniqueConstraint(fields=['vendor', 'date'], name='unique_vendor_snapshot_date'),
+        ]
+
     def __str__(self):
-        return f"{self.vendor.name} - {self.date}"
+        # vendor_id, not vendor.name: rendering a list of snapshots must not
+        # fetch each vendor
+        return f"{self.vendor_id} - {self.date}"
 
 
@@ -1,67 +1,154 @@
 """
 Signal handlers for VMS models
 """
-from django.db.models.signals import post_save
+from django.contrib.auth.models import User
+from django.db.models.signals import pre_save, post_save, post_delete
 from django.dispatch import receiver
-from django.db.models import Avg, F, ExpressionWrapper, fields
+from rest_framework.authtoken.models import Token
 
-from .models import PurchaseOrder
+from .models import Vendor, PurchaseOrder
+from .cache import invalidate_tokens, invalidate_vendor_performance
+from .instrumentation import profiled
+from .metrics import (
+    METRIC_FIELDS,
+    apply_order_change,
+    deferred_recompute_enabled,
+    mark_vendors_dirty,
+    metric_inputs_changed,
+    order_rollup_deltas,
+)
+
+
+def _record_order_change(old_state, new_state):
+    """
+    Apply an order change to the metrics now, or only queue the affected
+    vendors when deferred recompute is enabled.
+    """
+    if deferred_recompute_enabled():
+        # Every vendor whose counters move also has a rollup that moves
+        vendor_ids = order_rollup_deltas(old_state, new_state)
+        if vendor_ids:
+            mark_vendors_dirty(vendor_ids)
+        return {}
+    return apply_order_change(old_state, new_state)
+
+
+def _refresh_cached_vendor(instance, refreshed):
+    """Copy freshly written metrics onto the order's cached vendor, if any"""
+    if not PurchaseOrder.vendor.is_cached(instance):
+        return
+    metrics = refreshed.get(instance.vendor_id)
+    if metrics:
+        # Only the metrics that were rewritten
+        for name in METRIC_FIELDS:
+            if name in metrics:
+                setattr(instance.vendor, name, metrics[name])
+        # Keep the version in step, so saving this vendor later is not a
+        # spurious conflict (unless it was loaded with only() without it)
+        if 'version' not in instance.vendor.get_deferred_fields():
+            instance.vendor.version = metrics['version']
+
+
+def _updates_metric_inputs(sender, update_fields):
+    """False for a save limited to ``update_fields`` that no metric reads"""
+    if update_fields is None:
+        return True
+    return metric_inputs_changed({sender._meta.get_field(name).attname for name in update_fields})
+
+
+@receiver(pre_save, sender=PurchaseOrder)
+@profiled('signal')
+def remember_purchase_order_state(sender, instance, raw=False, update_fields=None, **kwargs):
+    """
+    Make sure the persisted state of an existing order is known before it is
+    overwritten. Orders loaded through the ORM already carry it (see
+    ``PurchaseOrder.from_db``); only hand-built instances need a lookup, and
+    not for a save whose ``update_fields`` no metric reads.
+    """
+    if raw or instance.pk is None or not _updates_metric_inputs(sender, update_fields):
+        return
+    loaded = getattr(instance, '_loaded_values', None)
+    if loaded is not None and len(loaded) == len(sender._meta.concrete_fields):
+        return
+    instance._loaded_values = (
+        PurchaseOrder.objects.filter(pk=instance.pk).values().first()
+    )
 
 
 @receiver(post_save, sender=PurchaseOrder)
-def update_vendor_performance_metrics(sender, instance, created, **kwargs):
+@profiled('signal')
+def update_vendor_performance_metrics(sender, instance, created, raw=False, update_fields=None,
+                                     **kwargs):
     """
     Automatically update vendor performance metrics when a purchase order is saved.
-    
-    Calculates:
-    - On-Time Delivery Rate: Percentage of completed orders delivered on time
+
+    Only the difference between the order's previous and new state is applied
+    to the vendor's running counters, so the cost does not depend on the
+    vendor's order history. With ``METRICS_RECOMPUTE_MODE = 'deferred'`` the
+    vendor is only queued for the ``process_metric_queue`` worker. Saves that
+    change no column a metric reads (see ``ORDER_METRIC_INPUTS``), such as
+    ``items`` or ``quantity``, skip the metrics entirely, and only the
+    metrics whose counters moved are rewritten.
+
+    - On-Time Delivery Rate: Percentage of completed orders completed by delivery_date
     - Quality Rating Average: Average quality rating of completed orders
     - Average Response Time: Average time to acknowledge orders (in hours)
     - Fulfillment Rate: Percentage of completed orders not canceled
     """
-    vendor = instance.vendor
-    
-    # Get all completed orders for this vendor
-    completed_orders = PurchaseOrder.objects.filter(vendor=vendor, status='completed')
-    
-    # Calculate On-Time Delivery Rate
-    on_time_delivery_count = completed_orders.filter(
-        delivery_date__lte=instance.delivery_date
-    ).count()
-    vendor.on_time_delivery_rate = (
-        (on_time_delivery_count / completed_orders.count()) * 100
-        if completed_orders.exists() else 0
-    )
-    
-    # Calculate Quality Rating Average
-    completed_orders_with_rating = completed_orders.exclude(quality_rating__isnull=True)
-    quality_avg = completed_orders_with_rating.aggregate(
-        Avg('quality_rating')
-    )['quality_rating__avg']
-    vendor.quality_rating_avg = quality_avg if quality_avg is not None else 0.0
-    
-    # Calculate Average Response Time (in hours)
-    acknowledged_orders = completed_orders.filter(acknowledgment_date__isnull=False)
-    if acknowledged_orders.exists():
-        response_times = acknowledged_orders.annotate(
-            response_time=ExpressionWrapper(
-                F('acknowledgment_date') - F('issue_date'),
-                output_field=fields.DurationField()
-            )
-        ).aggregate(Avg('response_time'))['response_time__avg']
-        vendor.average_response_time = (
-            response_times.total_seconds() / 3600
-            if response_times else 0
-        )
-    else:
-        vendor.average_response_time = 0
-    
-    # Calculate Fulfillment Rate
-    fulfilled_orders = completed_orders.exclude(status='canceled')
-    vendor.fulfillment_rate = (
-        (fulfilled_orders.count() / completed_orders.count()) * 100
-        if completed_orders.exists() else 0
-    )
-    
-    # Save vendor instance with updated performance metrics
-    vendor.save()
+    if raw:
+        return
+    old_state = None
+    new_state = instance.snapshot()
+    if not created:
+        old_state = getattr(instance, '_loaded_values', None)
+        written = new_state
+        if update_fields is not None:
+            attnames = {sender._meta.get_field(name).attname for name in update_fields}
+            written = {name: value for name, value in new_state.items() if name in attnames}
+        changed = instance.changed_fields(written)
+        if not metric_inputs_changed(written if changed is None else changed):
+            # Nothing a counter, rollup or metric reads was written
+            if old_state is not None:
+                instance._loaded_values = {**old_state, **written}
+            return
+        if old_state is not None:
+            # The row as saved: unsaved changes outside update_fields count later
+            new_state = {**old_state, **written}
+    refreshed = _record_order_change(old_state, new_state)
+    _refresh_cached_vendor(instance, refreshed)
+    instance._loaded_values = new_state
+
+
+@receiver(post_delete, sender=PurchaseOrder)
+@profiled('signal')
+def remove_purchase_order_from_metrics(sender, instance, origin=None, **kwargs):
+    """Take a deleted purchase order out of its vendor's metrics"""
+    origin_model = getattr(origin, 'model', type(origin))
+    if origin_model is Vendor:
+        # The vendor and its counters are being deleted along with the order
+        return
+    old_state = getattr(instance, '_loaded_values', None) or instance.snapshot()
+    _record_order_change(old_state, None)
+
+
+@receiver(post_save, sender=Vendor)
+@receiver(post_delete, sender=Vendor)
+@profiled('signal')
+def invalidate_vendor_cache(sender, instance, **kwargs):
+    """Vendors can also be edited directly through the API"""
+    invalidate_vendor_performance([instance.pk])
+
+
+@receiver(post_save, sender=Token)
+@receiver(post_delete, sender=Token)
+def invalidate_token_cache(sender, instance, **kwargs):
+    """Deleted or regenerated tokens must stop authenticating immediately"""
+    invalidate_tokens([instance.key])
+
+
+@receiver(post_save, sender=User)
+def invalidate_user_token_cache(sender, instance, created, **kwargs):
+    """Cached authentications hold a copy of the user (e.g. is_active)"""
+    if created:
+        return
+    invalidate_tokens(Token.objects.filter(user=instance).values_list('key', flat=True))
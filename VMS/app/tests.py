@@ -1,11 +1,56 @@
-from django.test import TestCase
+from asgiref.sync import sync_to_async
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.conf import settings
+from django.db import OperationalError, connection, connections, transaction
 from django.contrib.auth.models import User
 from rest_framework.test import APITestCase, APIClient
 from rest_framework.authtoken.models import Token
 from rest_framework import status
 from django.utils import timezone
-from datetime import timedelta
-from app.models import Vendor, PurchaseOrder, HistoricalPerformance
+from django.utils.http import http_date
+from django.core.management import CommandError, call_command
+from django.core.cache import caches
+from datetime import datetime, timedelta
+from io import StringIO
+from urllib.parse import urlencode
+from app.models import (
+    DirtyVendor,
+    HistoricalPerformance,
+    PurchaseOrder,
+    Vendor,
+    VendorDailyRollup,
+    VendorMetricCounters,
+    VERSION_ATTEMPTS,
+    VersionConflict,
+    retry_on_conflict,
+)
+from app import metrics
+from app.metrics import compute_vendor_metrics, recompute_vendors
+from app.history import snapshot_vendor_performance, windowed_metrics
+from app.benchmark import SCENARIOS, run_benchmarks, seed
+from app.instrumentation import stats
+from app.api.serializers import (
+    PurchaseOrderSerializer,
+    ValuesSerializer,
+    VendorPerformanceSerializer,
+    VendorSerializer,
+)
+from django.apps import apps
+from django.core.exceptions import ImproperlyConfigured
+from rest_framework import serializers
+from rest_framework.renderers import JSONRenderer
+from app.api import parsers, renderers
+from app.cache import _performance_query, get_vendor_performance
+from app.db import ReadReplicaRouter, apply_sqlite_pragmas, copy_sqlite_database, replica_reads
+from collections import OrderedDict
+from unittest import mock
+from decimal import Decimal
+import importlib
+import os
+import sqlite3
+import tempfile
+import uuid
 import json
 
 
@@ -475,3 +520,2354 @@ class AcknowledgePurchaseOrderTest(APITestCase):
         """Test acknowledging non-existent purchase order"""
         response = self.client.post('/api/purchase_orders/99999/acknowledge/')
         self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class IncrementalMetricsTest(TestCase):
+    """Test cases for the incremental vendor metric counters"""
+
+    def setUp(self):
+        self.vendor = Vendor.objects.create(
+            name='Test Vendor',
+            contact_details='test@vendor.com',
+            address='123 Test St',
+            vendor_code='VEN001',
+            on_time_delivery_rate=0.0,
+            quality_rating_avg=0.0,
+            average_response_time=0.0,
+            fulfillment_rate=0.0
+        )
+
+    def _create_po(self, po_number, **kwargs):
+        data = {
+            'po_number': po_number,
+            'vendor': self.vendor,
+            'order_date': timezone.now(),
+            'delivery_date': timezone.now() + timedelta(days=7),
+            'items': {"item1": "Product A"},
+            'quantity': 10,
+            'status': 'completed',
+            'issue_date': timezone.now(),
+        }
+        data.update(kwargs)
+        return PurchaseOrder.objects.create(**data)
+
+    def test_on_time_rate_uses_completion_date(self):
+        """Test orders completed after their delivery date count as late"""
+        self._create_po('PO001')
+        self._create_po('PO002', delivery_date=timezone.now() - timedelta(days=3))
+        self.vendor.refresh_from_db()
+        self.assertEqual(self.vendor.on_time_delivery_rate, 50.0)
+
+    def test_save_after_refresh_from_db(self):
+        """Test a refreshed instance diffs against the refreshed state, not the first load"""
+        self._create_po('PO001', status='pending')
+        first = PurchaseOrder.objects.get(po_number='PO001')
+        other = PurchaseOrder.objects.get(po_number='PO001')
+        other.status = 'completed'
+        other.save()
+
+        first.refresh_from_db()
+        self.assertEqual(first.changed_fields(), set())
+        first.quality_rating = 5.0
+        first.save()
+        counters = VendorMetricCounters.objects.get(vendor=self.vendor)
+        self.assertEqual((counters.completed_count, counters.on_time_count), (1, 1))
+        self.assertEqual(counters.rating_count, 1)
+
+        # Refreshing some fields only updates those in the remembered state
+        other.refresh_from_db()
+        PurchaseOrder.objects.filter(pk=first.pk).update(quantity=3)
+        first.quality_rating = 3.0
+        first.refresh_from_db(fields=['quantity'])
+        self.assertEqual(first.changed_fields(), {'quality_rating'})
+        first.save()
+        self.vendor.refresh_from_db()
+        self.assertEqual(self.vendor.quality_rating_avg, 3.0)
+        self.assertEqual(VendorMetricCounters.objects.get(vendor=self.vendor).rating_count, 1)
+
+    def test_status_change_and_delete_update_counters(self):
+        """Test counters follow status changes and deletions"""
+        po1 = self._create_po('PO001', quality_rating=4.0)
+        po2 = self._create_po('PO002', quality_rating=2.0)
+        self.vendor.refresh_from_db()
+        self.assertEqual(self.vendor.quality_rating_avg, 3.0)
+
+        po2.status = 'pending'
+        po2.save()
+        self.vendor.refresh_from_db()
+        self.assertEqual(self.vendor.quality_rating_avg, 4.0)
+        self.assertEqual(self.vendor.metric_counters.completed_count, 1)
+
+        po1.delete()
+        self.vendor.refresh_from_db()
+        self.assertEqual(self.vendor.quality_rating_avg, 0.0)
+        self.assertEqual(self.vendor.metric_counters.completed_count, 0)
+
+    def test_response_time_from_acknowledgment(self):
+        """Test acknowledging a completed order updates the response time"""
+        issue_date = timezone.now()
+        po = self._create_po('PO001', issue_date=issue_date)
+        po.acknowledgment_date = issue_date + timedelta(hours=6)
+        po.save()
+        self.vendor.refresh_from_db()
+        self.assertAlmostEqual(self.vendor.average_response_time, 6.0)
+
+    def test_save_is_independent_of_order_history(self):
+        """Test a PO save costs the same number of queries for any history size"""
+        for i in range(20):
+            self._create_po(f'PO{i:03}', quality_rating=3.0)
+        po = PurchaseOrder.objects.get(po_number='PO000')
+        po.quality_rating = 5.0
+        # UPDATE po, UPDATE counters, UPDATE rollup, SELECT counters, UPDATE vendor
+        # (+ savepoints)
+        with self.assertNumQueries(7):
+            po.save()
+
+    def test_rebuild_command_matches_full_recompute(self):
+        """Test the rebuild command recreates counters that match a full recompute"""
+        issue_date = timezone.now()
+        self._create_po('PO001', quality_rating=4.5,
+                        acknowledgment_date=issue_date + timedelta(hours=2), issue_date=issue_date)
+        self._create_po('PO002', delivery_date=timezone.now() - timedelta(days=1))
+        self._create_po('PO003', status='pending')
+        self.vendor.metric_counters.delete()
+
+        out = StringIO()
+        call_command('rebuild_vendor_metrics', stdout=out)
+        self.assertIn('1 vendor(s)', out.getvalue())
+        counters = VendorMetricCounters.objects.get(vendor=self.vendor)
+        self.assertEqual(counters.completed_count, 2)
+        self.assertEqual(counters.on_time_count, 1)
+        self.assertEqual(counters.rating_count, 1)
+        self.assertEqual(counters.response_time_count, 1)
+        call_command('rebuild_vendor_metrics', '--check', stdout=StringIO())
+
+    def test_rebuild_command_check_reports_drift(self):
+        """Test --check compares the stored counters and metrics with the orders without rebuilding"""
+        self._create_po('PO001', quality_rating=4.0)
+        VendorMetricCounters.objects.filter(vendor=self.vendor).update(rating_sum=2.0)
+        Vendor.objects.filter(pk=self.vendor.pk).update(fulfillment_rate=50.0)
+
+        err = StringIO()
+        with self.assertRaises(CommandError):
+            call_command('rebuild_vendor_metrics', '--check', stdout=StringIO(), stderr=err)
+        self.assertIn('rating_sum counters=2.0 recount=4.0', err.getvalue())
+        self.assertIn('fulfillment_rate stored=50.0 recompute=100.0', err.getvalue())
+        # Checking leaves the drift in place
+        self.assertEqual(VendorMetricCounters.objects.get(vendor=self.vendor).rating_sum, 2.0)
+
+        call_command('rebuild_vendor_metrics', stdout=StringIO())
+        call_command('rebuild_vendor_metrics', '--check', stdout=StringIO())
+
+
+class SinglePassRecomputeTest(TestCase):
+    """Test cases for the single-query and bulk metric recompute paths"""
+
+    def setUp(self):
+        self.vendors = [
+            Vendor.objects.create(
+                name=f'Vendor {i}',
+                contact_details='test@vendor.com',
+                address='123 Test St',
+                vendor_code=f'VEN00{i}',
+                on_time_delivery_rate=0.0,
+                quality_rating_avg=0.0,
+                average_response_time=0.0,
+                fulfillment_rate=0.0
+            )
+            for i in range(3)
+        ]
+        issue_date = timezone.now()
+        for i, vendor in enumerate(self.vendors):
+            for j in range(i + 1):
+                PurchaseOrder.objects.create(
+                    po_number=f'PO{i}{j}',
+                    vendor=vendor,
+                    order_date=issue_date,
+                    delivery_date=issue_date + timedelta(days=7 - 10 * j),
+                    items={"item1": "Product A"},
+                    quantity=10,
+                    status='completed',
+                    quality_rating=float(j + 1),
+                    issue_date=issue_date,
+                    acknowledgment_date=issue_date + timedelta(hours=j + 1),
+                )
+
+    def test_compute_vendor_metrics_single_query(self):
+        """Test a full recompute is one SQL round trip"""
+        with self.assertNumQueries(1):
+            metrics = compute_vendor_metrics(self.vendors[2])
+        self.assertAlmostEqual(metrics['on_time_delivery_rate'], 100 / 3)
+        self.assertEqual(metrics['quality_rating_avg'], 2.0)
+        self.assertAlmostEqual(metrics['average_response_time'], 2.0)
+        self.assertEqual(metrics['fulfillment_rate'], 100.0)
+
+    def test_recompute_vendors_in_bulk(self):
+        """Test bulk recompute uses a fixed number of queries for all vendors"""
+        Vendor.objects.update(quality_rating_avg=0.0)
+        VendorMetricCounters.objects.all().delete()
+        # id list, versions, grouped rollup aggregate, counters upsert,
+        # rollups delete + insert, vendors bulk_update, versions check
+        # (+ savepoints)
+        with self.assertNumQueries(10):
+            recomputed = recompute_vendors(Vendor.objects.all())
+        self.assertEqual(recomputed, 3)
+        for vendor in self.vendors:
+            vendor.refresh_from_db()
+            self.assertEqual(vendor.quality_rating_avg,
+                             compute_vendor_metrics(vendor)['quality_rating_avg'])
+        self.assertEqual(VendorMetricCounters.objects.get(vendor=self.vendors[2]).completed_count, 3)
+
+
+@override_settings(METRICS_RECOMPUTE_MODE='deferred')
+class DeferredMetricsTest(TestCase):
+    """Test cases for deferred, coalesced metric recomputation"""
+
+    def setUp(self):
+        self.vendor = Vendor.objects.create(
+            name='Test Vendor',
+            contact_details='test@vendor.com',
+            address='123 Test St',
+            vendor_code='VEN001',
+            on_time_delivery_rate=0.0,
+            quality_rating_avg=0.0,
+            average_response_time=0.0,
+            fulfillment_rate=0.0
+        )
+        for i in range(5):
+            PurchaseOrder.objects.create(
+                po_number=f'PO00{i}',
+                vendor=self.vendor,
+                order_date=timezone.now(),
+                delivery_date=timezone.now() + timedelta(days=7),
+                items={"item1": "Product A"},
+                quantity=10,
+                status='completed',
+                quality_rating=4.0,
+                issue_date=timezone.now()
+            )
+
+    def test_saves_only_queue_vendor(self):
+        """Test PO saves coalesce into one queue entry without touching metrics"""
+        self.assertEqual(DirtyVendor.objects.count(), 1)
+        self.vendor.refresh_from_db()
+        self.assertEqual(self.vendor.quality_rating_avg, 0.0)
+
+    def test_worker_recomputes_queued_vendors(self):
+        """Test the worker recomputes queued vendors once and empties the queue"""
+        out = StringIO()
+        call_command('process_metric_queue', '--once', stdout=out)
+        self.assertIn('1 vendor(s)', out.getvalue())
+        self.assertFalse(DirtyVendor.objects.exists())
+        self.vendor.refresh_from_db()
+        self.assertEqual(self.vendor.quality_rating_avg, 4.0)
+        self.assertEqual(self.vendor.metric_counters.completed_count, 5)
+
+    def test_failed_recompute_stays_queued(self):
+        """Test a batch whose recompute fails is left in the queue for the next flush"""
+        with mock.patch('app.metrics._recount_batch', side_effect=OperationalError('locked')):
+            with self.assertRaises(OperationalError):
+                metrics.flush_dirty_vendors()
+        self.assertTrue(DirtyVendor.objects.filter(vendor=self.vendor).exists())
+
+        self.assertEqual(metrics.flush_dirty_vendors(), 1)
+        self.assertFalse(DirtyVendor.objects.exists())
+        self.vendor.refresh_from_db()
+        self.assertEqual(self.vendor.quality_rating_avg, 4.0)
+
+
+class PurchaseOrderBulkUpsertTest(APITestCase):
+    """Test cases for the bulk purchase order upsert endpoint"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+
+        self.vendor = Vendor.objects.create(
+            name='Test Vendor',
+            contact_details='test@vendor.com',
+            address='123 Test St',
+            vendor_code='VEN001',
+            on_time_delivery_rate=0.0,
+            quality_rating_avg=0.0,
+            average_response_time=0.0,
+            fulfillment_rate=0.0
+        )
+
+    def _po_data(self, po_number, **kwargs):
+        data = {
+            'po_number': po_number,
+            'vendor': self.vendor.id,
+            'order_date': timezone.now().isoformat(),
+            'delivery_date': (timezone.now() + timedelta(days=7)).isoformat(),
+            'items': {"item1": "Product A"},
+            'quantity': 10,
+            'status': 'completed',
+            'quality_rating': 4.0,
+            'issue_date': timezone.now().isoformat()
+        }
+        data.update(kwargs)
+        return data
+
+    def test_bulk_create_json_array(self):
+        """Test creating many purchase orders from a JSON array"""
+        payload = [self._po_data(f'PO{i:03}') for i in range(25)]
+        response = self.client.post('/api/purchase_orders/bulk/', payload, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, {'created': 25, 'updated': 0, 'vendors': 1})
+        self.assertEqual(PurchaseOrder.objects.count(), 25)
+        self.vendor.refresh_from_db()
+        self.assertEqual(self.vendor.quality_rating_avg, 4.0)
+        self.assertEqual(self.vendor.metric_counters.completed_count, 25)
+
+    def test_bulk_upsert_ndjson_stream(self):
+        """Test NDJSON rows update existing purchase orders by po_number"""
+        self.client.post('/api/purchase_orders/bulk/', [self._po_data('PO001')], format='json')
+        body = '\n'.join(json.dumps(row) for row in [
+            self._po_data('PO001', quality_rating=2.0),
+            self._po_data('PO002', status='pending'),
+        ])
+        response = self.client.post(
+            '/api/purchase_orders/bulk/', body, content_type='application/x-ndjson'
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['created'], 1)
+        self.assertEqual(response.data['updated'], 1)
+        self.vendor.refresh_from_db()
+        self.assertEqual(self.vendor.quality_rating_avg, 2.0)
+
+    def test_bulk_invalid_row_rolls_back(self):
+        """Test an invalid row rejects the whole request"""
+        payload = [self._po_data('PO001'), self._po_data('PO002', vendor=99999)]
+        response = self.client.post('/api/purchase_orders/bulk/', payload, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn(1, response.data['errors'])
+        self.assertEqual(PurchaseOrder.objects.count(), 0)
+
+    def test_bulk_query_count_independent_of_rows(self):
+        """Test bulk ingestion does not issue per-row queries"""
+        payload = [self._po_data(f'PO{i:03}') for i in range(50)]
+        # token, vendors, existing orders, insert, 9 for the metric recompute (+ savepoints)
+        with self.assertNumQueries(16):
+            self.client.post('/api/purchase_orders/bulk/', payload, format='json')
+
+
+class ExportTest(APITestCase):
+    """Test cases for the streaming NDJSON/CSV exports"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+
+        self.vendors = [
+            Vendor.objects.create(
+                name=f'Vendor {i}',
+                contact_details='test@vendor.com',
+                address='123 Test St',
+                vendor_code=f'VEN00{i}',
+                on_time_delivery_rate=0.0,
+                quality_rating_avg=0.0,
+                average_response_time=0.0,
+                fulfillment_rate=0.0
+            )
+            for i in range(2)
+        ]
+        self.now = timezone.now()
+        for i in range(6):
+            PurchaseOrder.objects.create(
+                po_number=f'PO00{i}',
+                vendor=self.vendors[i % 2],
+                order_date=self.now - timedelta(days=i),
+                delivery_date=self.now + timedelta(days=7),
+                items={"item1": "Product A", "quantity": i},
+                quantity=10,
+                status='pending',
+                issue_date=self.now
+            )
+
+    def _lines(self, response):
+        return b''.join(response.streaming_content).decode().splitlines()
+
+    def test_ndjson_export_matches_serializer(self):
+        """Test NDJSON rows match the regular API representation"""
+        response = self.client.get('/api/purchase_orders/export/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        rows = [json.loads(line) for line in self._lines(response)]
+        self.assertEqual(len(rows), 6)
+        detail = self.client.get(f"/api/purchase_orders/{rows[0]['id']}/")
+        self.assertEqual(rows[0], json.loads(detail.content))
+
+    def test_csv_export_with_filters(self):
+        """Test CSV export filtered by vendor and order date range"""
+        start = (self.now - timedelta(days=3, hours=1)).isoformat()
+        response = self.client.get('/api/purchase_orders/export/', {
+            'output': 'csv', 'vendor': self.vendors[0].id, 'start': start,
+        })
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        lines = self._lines(response)
+        self.assertTrue(lines[0].startswith('id,po_number,vendor,'))
+        self.assertEqual([line.split(',')[1] for line in lines[1:]], ['PO000', 'PO002'])
+
+    def test_vendor_export_and_invalid_format(self):
+        """Test vendor export and rejection of unknown formats"""
+        response = self.client.get('/api/vendors/export/', {'output': 'csv'})
+        self.assertEqual(len(self._lines(response)), 3)
+        response = self.client.get('/api/vendors/export/', {'output': 'xml'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class KeysetPaginationTest(APITestCase):
+    """Test cases for opt-in keyset pagination on list endpoints"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+
+        self.vendor = Vendor.objects.create(
+            name='Test Vendor',
+            contact_details='test@vendor.com',
+            address='123 Test St',
+            vendor_code='VEN001',
+            on_time_delivery_rate=0.0,
+            quality_rating_avg=0.0,
+            average_response_time=0.0,
+            fulfillment_rate=0.0
+        )
+        order_date = timezone.now()
+        for i in range(7):
+            PurchaseOrder.objects.create(
+                po_number=f'PO00{i}',
+                vendor=self.vendor,
+                # Pairs of orders share an order_date to exercise the id tiebreak
+                order_date=order_date - timedelta(days=i // 2),
+                delivery_date=order_date + timedelta(days=7),
+                items={"item1": "Product A"},
+                quantity=10,
+                status='pending',
+                issue_date=order_date
+            )
+
+    def _walk(self, url, direction='next'):
+        pages = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            pages.append([row['po_number'] for row in response.data['results']])
+            url = response.data[direction]
+        return pages
+
+    def test_unpaginated_by_default(self):
+        """Test list responses stay plain lists without pagination params"""
+        response = self.client.get('/api/purchase_orders/')
+        self.assertEqual(len(response.data), 7)
+
+    def test_walk_forward_and_back(self):
+        """Test next/previous cursors visit every row exactly once in key order"""
+        pages = self._walk('/api/purchase_orders/?page_size=3')
+        self.assertEqual([len(page) for page in pages], [3, 3, 1])
+        expected = list(PurchaseOrder.objects.order_by('order_date', 'id')
+                        .values_list('po_number', flat=True))
+        self.assertEqual(sum(pages, []), expected)
+
+        response = self.client.get('/api/purchase_orders/?page_size=3')
+        last = self.client.get(self.client.get(response.data['next']).data['next'])
+        back = self._walk(last.data['previous'], direction='previous')
+        self.assertEqual(back, pages[1::-1])
+
+    def test_page_query_count_is_constant(self):
+        """Test a deep page costs the same number of queries as the first"""
+        response = self.client.get('/api/vendors/?page_size=1')
+        self.assertEqual(len(response.data['results']), 1)
+        self.assertIsNone(response.data['next'])
+        # The token is cached after the first request, leaving the page query
+        with self.assertNumQueries(1):
+            self.client.get('/api/purchase_orders/?page_size=2')
+        cursor_url = self.client.get('/api/purchase_orders/?page_size=2').data['next']
+        with self.assertNumQueries(1):
+            self.client.get(cursor_url)
+
+    def test_invalid_cursor(self):
+        """Test malformed cursors are rejected"""
+        response = self.client.get('/api/purchase_orders/?cursor=garbage')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class PurchaseOrderIndexTest(TestCase):
+    """Test cases asserting the metric and list queries use the PO indexes"""
+
+    def setUp(self):
+        self.vendor = Vendor.objects.create(
+            name='Test Vendor',
+            contact_details='test@vendor.com',
+            address='123 Test St',
+            vendor_code='VEN001',
+            on_time_delivery_rate=0.0,
+            quality_rating_avg=0.0,
+            average_response_time=0.0,
+            fulfillment_rate=0.0
+        )
+
+    def assertUsesIndex(self, queryset, index_name):
+        plan = queryset.explain()
+        self.assertIn(index_name, plan)
+
+    def test_completed_orders_use_vendor_status_index(self):
+        """Test metric recompute queries are index range lookups"""
+        self.assertUsesIndex(
+            PurchaseOrder.objects.filter(vendor=self.vendor, status='completed'),
+            'po_vendor_status_dlv_idx',
+        )
+        self.assertUsesIndex(
+            PurchaseOrder.objects.filter(
+                vendor=self.vendor, status='completed', delivery_date__lte=timezone.now()
+            ),
+            'po_vendor_status_dlv_idx',
+        )
+
+    def test_partial_indexes_for_rated_and_acknowledged_orders(self):
+        """Test rating and response-time lookups use the partial indexes"""
+        self.assertUsesIndex(
+            PurchaseOrder.objects.filter(
+                vendor=self.vendor, status='completed', quality_rating__isnull=False
+            ).values('quality_rating'),
+            'po_completed_rated_idx',
+        )
+        self.assertUsesIndex(
+            PurchaseOrder.objects.filter(
+                vendor=self.vendor, status='completed', response_seconds__isnull=False
+            ).values('response_seconds'),
+            'po_completed_response_idx',
+        )
+
+    def test_keyset_ordering_uses_order_date_index(self):
+        """Test (order_date, id) pagination is served by an index"""
+        self.assertUsesIndex(
+            PurchaseOrder.objects.filter(order_date__gte=timezone.now()).order_by('order_date', 'id'),
+            'po_order_date_id_idx',
+        )
+
+
+class VendorPerformanceCacheTest(APITestCase):
+    """Test cases for the cached vendor performance endpoint"""
+
+    def setUp(self):
+        caches['performance'].clear()
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+
+        self.vendor = Vendor.objects.create(
+            name='Test Vendor',
+            contact_details='test@vendor.com',
+            address='123 Test St',
+            vendor_code='VEN001',
+            on_time_delivery_rate=0.0,
+            quality_rating_avg=0.0,
+            average_response_time=0.0,
+            fulfillment_rate=0.0
+        )
+        self.url = f'/api/vendors/{self.vendor.id}/performance/'
+
+    def test_repeat_reads_served_from_cache(self):
+        """Test the second read needs no vendor query"""
+        self.client.get(self.url)
+        with self.assertNumQueries(0):  # token and metrics both cached
+            response = self.client.get(self.url)
+        self.assertEqual(response.data['quality_rating_avg'], 0.0)
+
+    def test_if_none_match_returns_304(self):
+        """Test a matching ETag is answered with 304 and no body"""
+        etag = self.client.get(self.url)['ETag']
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response.content, b'')
+
+    def test_metric_update_invalidates_cache(self):
+        """Test a PO save refreshes the cached metrics and ETag"""
+        etag = self.client.get(self.url)['ETag']
+        PurchaseOrder.objects.create(
+            po_number='PO001',
+            vendor=self.vendor,
+            order_date=timezone.now(),
+            delivery_date=timezone.now() + timedelta(days=7),
+            items={"item1": "Product A"},
+            quantity=10,
+            status='completed',
+            quality_rating=4.0,
+            issue_date=timezone.now()
+        )
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['quality_rating_avg'], 4.0)
+        self.assertNotEqual(response['ETag'], etag)
+
+
+class VendorPerformanceBatchTest(APITestCase):
+    """Test cases for the batch vendor performance endpoint"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+
+        self.vendors = [
+            Vendor.objects.create(
+                name=f'Vendor {i}',
+                contact_details='test@vendor.com',
+                address='123 Test St',
+                vendor_code=f'VEN00{i}',
+                on_time_delivery_rate=10.0 * i,
+                quality_rating_avg=float(i),
+                average_response_time=0.0,
+                fulfillment_rate=0.0
+            )
+            for i in range(4)
+        ]
+
+    def test_batch_matches_single_endpoint(self):
+        """Test batch results match the per-vendor endpoint, in one query"""
+        ids = [self.vendors[2].id, self.vendors[0].id]
+        with self.assertNumQueries(2):  # token lookup + metrics
+            response = self.client.get('/api/vendors/performance/', {'ids': ','.join(map(str, ids))})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([row['id'] for row in response.data], sorted(ids))
+        single = self.client.get(f'/api/vendors/{self.vendors[2].id}/performance/')
+        self.assertEqual(json.loads(response.content)[1], json.loads(single.content))
+
+    def test_batch_all_with_filters(self):
+        """Test selecting all vendors with filters through a POST body"""
+        response = self.client.post(
+            '/api/vendors/performance/', {'ids': 'all', 'vendor_code': 'VEN003'}, format='json'
+        )
+        self.assertEqual(len(response.data), 1)
+        self.assertEqual(response.data[0]['quality_rating_avg'], 3.0)
+        response = self.client.post('/api/vendors/performance/', {'ids': 'all'}, format='json')
+        self.assertEqual(len(response.data), 4)
+
+    def test_batch_rejects_bad_ids(self):
+        """Test invalid id lists are rejected"""
+        response = self.client.get('/api/vendors/performance/', {'ids': '1,x'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get('/api/vendors/performance/')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class PerformanceHistoryTest(APITestCase):
+    """Test cases for performance snapshots and the history endpoint"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+
+        self.vendor = Vendor.objects.create(
+            name='Test Vendor',
+            contact_details='test@vendor.com',
+            address='123 Test St',
+            vendor_code='VEN001',
+            on_time_delivery_rate=0.0,
+            quality_rating_avg=0.0,
+            average_response_time=0.0,
+            fulfillment_rate=0.0
+        )
+        self.url = f'/api/vendors/{self.vendor.id}/performance/history/'
+
+    def test_snapshot_command_is_idempotent_per_period(self):
+        """Test one snapshot row per vendor per period"""
+        out = StringIO()
+        call_command('snapshot_vendor_performance', stdout=out)
+        call_command('snapshot_vendor_performance', stdout=out)
+        self.assertEqual(HistoricalPerformance.objects.filter(vendor=self.vendor).count(), 1)
+
+    def test_history_downsampled_into_buckets(self):
+        """Test daily snapshots are averaged into weekly and monthly buckets"""
+        start = timezone.make_aware(datetime(2024, 1, 1))  # a Monday
+        for day in range(14):
+            self.vendor.quality_rating_avg = float(day)
+            self.vendor.save()
+            snapshot_vendor_performance(period='day', now=start + timedelta(days=day, hours=12))
+
+        response = self.client.get(self.url, {'bucket': 'weekly'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([row['samples'] for row in response.data], [7, 7])
+        self.assertEqual([row['quality_rating_avg'] for row in response.data], [3.0, 10.0])
+
+        response = self.client.get(self.url, {'bucket': 'daily', 'start': '2024-01-10', 'end': '2024-01-12'})
+        self.assertEqual([row['quality_rating_avg'] for row in response.data], [9.0, 10.0])
+
+        response = self.client.get(self.url, {'bucket': 'monthly'})
+        self.assertEqual(len(response.data), 1)
+
+    def test_history_errors(self):
+        """Test unknown vendors and buckets"""
+        response = self.client.get('/api/vendors/99999/performance/history/')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        response = self.client.get(self.url, {'bucket': 'yearly'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class BenchmarkHarnessTest(TestCase):
+    """Smoke test for the benchmark seeding and measurement helpers"""
+
+    def test_seed_and_run_all_scenarios(self):
+        """Test a tiny benchmark run covers every scenario without errors"""
+        vendor_ids = seed(3, 40)
+        self.assertEqual(PurchaseOrder.objects.count(), 40)
+        results = run_benchmarks(vendor_ids, iterations=3)
+        self.assertEqual(set(results), set(SCENARIOS))
+        for result in results.values():
+            self.assertEqual(result['errors'], 0)
+            self.assertEqual(result['iterations'], 3)
+            self.assertGreater(result['queries'], 0)
+            self.assertLessEqual(result['p50_ms'], result['p99_ms'])
+
+    def test_concurrent_writes_need_db_file(self):
+        """Test --writers and --profiles refuse the shared in-memory database"""
+        for option in ('--writers', '--profiles'):
+            with self.assertRaisesMessage(CommandError, '--db-file'):
+                call_command('benchmark_api', option, '4', stdout=StringIO())
+
+
+@override_settings(REQUEST_PROFILING=True)
+class RequestProfilingTest(APITestCase):
+    """Test cases for the request profiling middleware and stats endpoint"""
+
+    def setUp(self):
+        stats.clear()
+        self.user = User.objects.create_user(username='admin', password='testpass', is_staff=True)
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+
+        self.vendor = Vendor.objects.create(
+            name='Test Vendor',
+            contact_details='test@vendor.com',
+            address='123 Test St',
+            vendor_code='VEN001',
+            on_time_delivery_rate=0.0,
+            quality_rating_avg=0.0,
+            average_response_time=0.0,
+            fulfillment_rate=0.0
+        )
+
+    def tearDown(self):
+        stats.clear()
+
+    def create_order(self):
+        now = timezone.now()
+        return self.client.post('/api/purchase_orders/', {
+            'po_number': 'PO001',
+            'vendor': self.vendor.id,
+            'order_date': now.isoformat(),
+            'delivery_date': (now + timedelta(days=7)).isoformat(),
+            'items': {'item': 'Widget'},
+            'quantity': 10,
+            'status': 'completed',
+            'quality_rating': 4.0,
+            'issue_date': now.isoformat(),
+        }, format='json')
+
+    def test_server_timing_header(self):
+        """Test every section is reported, with the query count"""
+        response = self.create_order()
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        timing = {
+            part.split(';')[0]: part for part in response['Server-Timing'].split(', ')
+        }
+        self.assertEqual(set(timing), {'db', 'serializer', 'signal', 'total'})
+        self.assertRegex(timing['db'], r'desc="[1-9]\d* queries"')
+
+    async def test_asgi_requests_count_queries(self):
+        """Test queries run by the ORM in sync_to_async threads are counted under ASGI"""
+        headers = {'Authorization': 'Token ' + self.token.key}
+        for path in ('/api/async/vendors/', '/api/vendors/'):
+            response = await self.async_client.get(path, headers=headers)
+            self.assertEqual(response.status_code, status.HTTP_200_OK, path)
+            db = response['Server-Timing'].split(', ')[0]
+            self.assertRegex(db, r'desc="[1-9]\d* queries"', path)
+
+    def test_stats_endpoint_summarizes_per_view(self):
+        """Test samples are grouped per view with percentile summaries"""
+        self.create_order()
+        for _ in range(3):
+            self.client.get('/api/vendors/')
+        response = self.client.get('/api/stats/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        views = response.data['views']
+        self.assertEqual(views['GET api:vendor-list-create']['count'], 3)
+        created = views['POST api:purchase-order-list-create']
+        self.assertEqual(created['count'], 1)
+        self.assertGreater(created['signal_ms']['max'], 0)
+        self.assertGreater(created['queries']['p50'], 0)
+        self.assertLessEqual(created['total_ms']['p50'], created['total_ms']['p99'])
+
+        self.client.delete('/api/stats/')
+        # Only the DELETE itself is recorded after the reset
+        views = self.client.get('/api/stats/').data['views']
+        self.assertEqual(list(views), ['DELETE api:request-stats'])
+
+    def test_stats_require_staff(self):
+        """Test non-staff users cannot read the stats"""
+        user = User.objects.create_user(username='regular', password='testpass')
+        token = Token.objects.create(user=user)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + token.key)
+        response = self.client.get('/api/stats/')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    @override_settings(REQUEST_PROFILING=False)
+    def test_disabled_by_default(self):
+        """Test no header is added when profiling is off"""
+        response = self.client.get('/api/vendors/')
+        self.assertNotIn('Server-Timing', response)
+
+
+class CachedTokenAuthenticationTest(APITestCase):
+    """Test cases for the cached token authentication"""
+
+    def setUp(self):
+        caches['tokens'].clear()
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+
+    def test_repeat_requests_skip_token_query(self):
+        """Test only the first request looks the token up"""
+        with self.assertNumQueries(2):
+            self.client.get('/api/vendors/')
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/vendors/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_deleted_token_is_rejected(self):
+        """Test a deleted or regenerated token stops authenticating"""
+        self.client.get('/api/vendors/')
+        self.token.delete()
+        response = self.client.get('/api/vendors/')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+        new_token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + new_token.key)
+        response = self.client.get('/api/vendors/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_deactivated_user_is_rejected(self):
+        """Test user changes invalidate the cached authentication"""
+        self.client.get('/api/vendors/')
+        self.user.is_active = False
+        self.user.save()
+        response = self.client.get('/api/vendors/')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class AsyncReadEndpointsTest(APITestCase):
+    """Test cases for the async read endpoints under /api/async/"""
+
+    def setUp(self):
+        caches['performance'].clear()
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.token = Token.objects.create(user=self.user)
+        self.headers = {'Authorization': 'Token ' + self.token.key}
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+
+        self.vendor = Vendor.objects.create(
+            name='Test Vendor',
+            contact_details='test@vendor.com',
+            address='123 Test St',
+            vendor_code='VEN001',
+            on_time_delivery_rate=0.0,
+            quality_rating_avg=0.0,
+            average_response_time=0.0,
+            fulfillment_rate=0.0
+        )
+        now = timezone.now()
+        for i in range(3):
+            self.po = PurchaseOrder.objects.create(
+                po_number=f'PO00{i}',
+                vendor=self.vendor,
+                order_date=now - timedelta(days=i),
+                delivery_date=now + timedelta(days=7),
+                items={'item': 'Widget'},
+                quantity=10,
+                status='completed',
+                quality_rating=4.0,
+                issue_date=now,
+            )
+
+    async def test_responses_match_sync_endpoints(self):
+        """Test every async endpoint returns the same bytes as its sync endpoint"""
+        paths = [
+            '/vendors/',
+            f'/vendors/{self.vendor.id}/',
+            f'/vendors/{self.vendor.id}/performance/',
+            '/purchase_orders/',
+            '/purchase_orders/?page_size=2',
+            f'/purchase_orders/{self.po.id}/',
+        ]
+        for path in paths:
+            response = await self.async_client.get('/api/async' + path, headers=self.headers)
+            self.assertEqual(response.status_code, status.HTTP_200_OK, path)
+            self.assertEqual(response['Content-Type'], 'application/json')
+            expected = await sync_to_async(self.client.get)('/api' + path)
+            # Pagination links point back at the async endpoint
+            content = response.content.replace(b'/api/async/', b'/api/')
+            self.assertEqual(content, expected.content, path)
+            self.assertEqual(response.get('ETag'), expected.get('ETag'), path)
+
+    async def test_pagination_cursor(self):
+        """Test the async list follows keyset cursors"""
+        response = await self.async_client.get(
+            '/api/async/purchase_orders/', {'page_size': 2}, headers=self.headers
+        )
+        page = json.loads(response.content)
+        self.assertEqual(len(page['results']), 2)
+        response = await self.async_client.get(page['next'], headers=self.headers)
+        self.assertEqual(len(json.loads(response.content)['results']), 1)
+
+    async def test_authentication_required(self):
+        """Test missing and invalid tokens are rejected like the sync views"""
+        response = await self.async_client.get('/api/async/vendors/')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(response['WWW-Authenticate'], 'Token')
+        response = await self.async_client.get(
+            '/api/async/vendors/', headers={'Authorization': 'Token invalid'}
+        )
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    async def test_not_found_and_not_modified(self):
+        """Test 404s and ETag handling"""
+        response = await self.async_client.get('/api/async/vendors/99999/', headers=self.headers)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        response = await self.async_client.get(
+            '/api/async/vendors/99999/performance/', headers=self.headers
+        )
+        self.assertEqual(json.loads(response.content), {'message': 'Vendor not found'})
+
+        url = f'/api/async/vendors/{self.vendor.id}/performance/'
+        etag = (await self.async_client.get(url, headers=self.headers))['ETag']
+        response = await self.async_client.get(url, headers={**self.headers, 'If-None-Match': etag})
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_writes_not_allowed(self):
+        """Test the async endpoints are read-only"""
+        response = self.client.post('/api/async/vendors/', {}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_405_METHOD_NOT_ALLOWED)
+
+
+class ListQueryTest(APITestCase):
+    """Test cases for list filtering, ordering and sparse fieldsets"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+
+        self.vendors = [
+            Vendor.objects.create(
+                name=f'Vendor {code}',
+                contact_details='test@vendor.com',
+                address='123 Test St',
+                vendor_code=code,
+                on_time_delivery_rate=0.0,
+                quality_rating_avg=0.0,
+                average_response_time=0.0,
+                fulfillment_rate=0.0
+            )
+            for code in ('VEN001', 'VEN002')
+        ]
+        self.start = timezone.make_aware(datetime(2024, 1, 1))
+        statuses = ['pending', 'completed', 'canceled']
+        for i in range(6):
+            PurchaseOrder.objects.create(
+                po_number=f'PO{i:03}',
+                vendor=self.vendors[i % 2],
+                order_date=self.start + timedelta(days=i),
+                delivery_date=self.start + timedelta(days=10 - i),
+                items={'item': 'Widget'},
+                quantity=i,
+                status=statuses[i % 3],
+                issue_date=self.start,
+            )
+
+    def po_numbers(self, params):
+        response = self.client.get('/api/purchase_orders/', {'ordering': 'id', **params})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [row['po_number'] for row in response.data]
+
+    def test_filters(self):
+        """Test vendor, status and date range filters"""
+        self.assertEqual(self.po_numbers({'vendor': self.vendors[1].id}), ['PO001', 'PO003', 'PO005'])
+        self.assertEqual(self.po_numbers({'status': 'pending,canceled'}), ['PO000', 'PO002', 'PO003', 'PO005'])
+        self.assertEqual(
+            self.po_numbers({'order_date_after': '2024-01-02', 'order_date_before': '2024-01-04'}),
+            ['PO001', 'PO002'],
+        )
+        self.assertEqual(self.po_numbers({'delivery_date_before': '2024-01-07'}), ['PO005'])
+
+        response = self.client.get('/api/vendors/', {'vendor_code': 'VEN002'})
+        self.assertEqual([row['vendor_code'] for row in response.data], ['VEN002'])
+
+    def test_invalid_filter_values(self):
+        """Test malformed filter values are rejected"""
+        response = self.client.get('/api/purchase_orders/', {'vendor': 'abc'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get('/api/purchase_orders/', {'order_date_after': 'yesterday'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_ordering(self):
+        """Test ordering, including with keyset pagination"""
+        expected = ['PO005', 'PO004', 'PO003', 'PO002', 'PO001', 'PO000']
+        self.assertEqual(self.po_numbers({'ordering': '-order_date'}), expected)
+
+        seen, url = [], '/api/purchase_orders/?ordering=-order_date&page_size=4'
+        while url:
+            response = self.client.get(url)
+            seen += [row['po_number'] for row in response.data['results']]
+            url = response.data['next']
+        self.assertEqual(seen, expected)
+
+    def test_sparse_fields_are_not_fetched(self):
+        """Test ?fields= limits both the response and the SELECT"""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(
+                '/api/purchase_orders/', {'fields': 'po_number,status', 'ordering': 'id'}
+            )
+        self.assertEqual(response.data[0], {'po_number': 'PO000', 'status': 'pending'})
+        select = queries[-1]['sql']
+        self.assertIn('"po_number"', select)
+        self.assertNotIn('"items"', select)
+
+        response = self.client.get('/api/purchase_orders/', {'fields': 'po_number,bogus'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_fields_ignored_on_create(self):
+        """Test ?fields= does not restrict what a POST validates"""
+        response = self.client.post('/api/vendors/?fields=id', {
+            'name': 'New Vendor',
+            'contact_details': 'new@vendor.com',
+            'address': '1 New St',
+            'vendor_code': 'VEN003',
+            'on_time_delivery_rate': 0.0,
+            'quality_rating_avg': 0.0,
+            'average_response_time': 0.0,
+            'fulfillment_rate': 0.0,
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['vendor_code'], 'VEN003')
+
+    async def test_async_list_accepts_same_parameters(self):
+        """Test the async list applies the same filters and projection"""
+        params = {'status': 'completed', 'ordering': '-order_date', 'fields': 'po_number'}
+        response = await self.async_client.get(
+            '/api/async/purchase_orders/', params,
+            headers={'Authorization': 'Token ' + self.token.key},
+        )
+        self.assertEqual(json.loads(response.content), [{'po_number': 'PO004'}, {'po_number': 'PO001'}])
+
+
+class QueryBudgetTest(APITestCase):
+    """
+    Fixed query budgets per endpoint: each request is run, then repeated
+    with more rows in the database, and must cost exactly ``budget``
+    queries both times (the token is cached after setUp).
+    """
+
+    def setUp(self):
+        caches['tokens'].clear()
+        caches['performance'].clear()
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+
+        self.vendor = Vendor.objects.create(
+            name='Test Vendor',
+            contact_details='test@vendor.com',
+            address='123 Test St',
+            vendor_code='VEN001',
+            on_time_delivery_rate=0.0,
+            quality_rating_avg=0.0,
+            average_response_time=0.0,
+            fulfillment_rate=0.0
+        )
+        self.counter = 0
+        self.po = self.add_orders(1)
+        self.client.get('/api/vendors/')  # warm the token cache
+
+    def add_orders(self, count, vendor=None):
+        now = timezone.now()
+        order = None
+        for _ in range(count):
+            self.counter += 1
+            order = PurchaseOrder.objects.create(
+                po_number=f'PO{self.counter:05}',
+                vendor=vendor or self.vendor,
+                order_date=now,
+                delivery_date=now + timedelta(days=7),
+                items={'item': 'Widget'},
+                quantity=10,
+                status='completed',
+                quality_rating=4.0,
+                issue_date=now,
+                acknowledgment_date=now,
+            )
+            HistoricalPerformance.objects.create(
+                vendor=order.vendor,
+                date=now - timedelta(days=self.counter),
+                on_time_delivery_rate=100.0,
+                quality_rating_avg=4.0,
+                average_response_time=0.0,
+                fulfillment_rate=100.0,
+            )
+        return order
+
+    def assertBudget(self, budget, request):
+        for extra in (0, 10):
+            self.add_orders(extra)
+            with self.assertNumQueries(budget):
+                response = request()
+                if response.streaming:
+                    b''.join(response.streaming_content)
+            self.assertLess(response.status_code, 300, response)
+
+    def test_vendor_read_endpoints(self):
+        """Test vendor reads cost one query whatever the row count"""
+        self.assertBudget(1, lambda: self.client.get('/api/vendors/'))
+        self.assertBudget(1, lambda: self.client.get('/api/vendors/', {'page_size': 2}))
+        self.assertBudget(1, lambda: self.client.get(f'/api/vendors/{self.vendor.id}/'))
+        self.assertBudget(1, lambda: self.client.get('/api/vendors/performance/', {'ids': 'all'}))
+        self.assertBudget(1, lambda: self.client.get('/api/vendors/export/'))
+        self.assertBudget(2, lambda: self.client.get(f'/api/vendors/{self.vendor.id}/performance/history/'))
+
+        def cold_performance():
+            caches['performance'].clear()
+            return self.client.get(f'/api/vendors/{self.vendor.id}/performance/')
+        self.assertBudget(1, cold_performance)
+
+    def test_purchase_order_read_endpoints(self):
+        """Test purchase order reads cost one query whatever the row count"""
+        self.assertBudget(1, lambda: self.client.get('/api/purchase_orders/'))
+        self.assertBudget(1, lambda: self.client.get('/api/purchase_orders/', {'page_size': 5}))
+        self.assertBudget(1, lambda: self.client.get('/api/purchase_orders/', {'fields': 'po_number'}))
+        self.assertBudget(1, lambda: self.client.get(f'/api/purchase_orders/{self.po.id}/'))
+        self.assertBudget(1, lambda: self.client.get('/api/purchase_orders/export/'))
+
+    def test_purchase_order_write_endpoints(self):
+        """Test purchase order writes do not fetch the vendor or its orders"""
+        def create():
+            self.counter += 1
+            now = timezone.now()
+            return self.client.post('/api/purchase_orders/', {
+                'po_number': f'NEW{self.counter:05}',
+                'vendor': self.vendor.id,
+                'order_date': now.isoformat(),
+                'delivery_date': (now + timedelta(days=7)).isoformat(),
+                'items': {'item': 'Widget'},
+                'quantity': 10,
+                'status': 'completed',
+                'quality_rating': 4.0,
+                'issue_date': now.isoformat(),
+            }, format='json')
+        # 2 validation reads, INSERT, then the metric update's savepoint,
+        # counter UPDATE, rollup UPDATE, counter SELECT, vendor UPDATE and release
+        self.assertBudget(9, create)
+
+        url = f'/api/purchase_orders/{self.po.id}/'
+        ratings = iter([3.0, 2.0])
+        # Updates run in retry_on_conflict's transaction: 2 more for its savepoint.
+        # Every metric change also updates the day's rollup row.
+        self.assertBudget(
+            10, lambda: self.client.patch(url, {'quality_rating': next(ratings)}, format='json')
+        )
+        self.assertBudget(10, lambda: self.client.post(f"{url}acknowledge/"))
+        doomed = [self.add_orders(1).id for _ in range(2)]
+        self.assertBudget(8, lambda: self.client.delete(f'/api/purchase_orders/{doomed.pop()}/'))
+
+    def test_signal_does_not_fetch_vendor(self):
+        """Test saving an order loaded without its vendor issues no vendor SELECT"""
+        order = PurchaseOrder.objects.get(pk=self.po.pk)
+        order.quality_rating = 2.0
+        with CaptureQueriesContext(connection) as queries:
+            order.save()
+        self.assertFalse([
+            query for query in queries
+            if query['sql'].startswith('SELECT') and 'FROM "app_vendor"' in query['sql']
+        ])
+
+    def test_historical_performance_str(self):
+        """Test rendering snapshots does not fetch their vendors"""
+        self.add_orders(5)
+        snapshots = list(HistoricalPerformance.objects.all())
+        with self.assertNumQueries(0):
+            [str(snapshot) for snapshot in snapshots]
+
+    def test_admin_changelists(self):
+        """Test admin changelists do not issue a query per row"""
+        admin_user = User.objects.create_superuser(username='admin', password='testpass')
+        self.client.force_login(admin_user)
+        for url in ('/admin/app/purchaseorder/', '/admin/app/historicalperformance/'):
+            counts = []
+            for extra in (0, 10):
+                self.add_orders(extra, vendor=Vendor.objects.create(
+                    name=f'Vendor {extra}',
+                    contact_details='test@vendor.com',
+                    address='123 Test St',
+                    vendor_code=f'VEN{url[-5:-1]}{extra}',
+                    on_time_delivery_rate=0.0,
+                    quality_rating_avg=0.0,
+                    average_response_time=0.0,
+                    fulfillment_rate=0.0
+                ))
+                with CaptureQueriesContext(connection) as queries:
+                    response = self.client.get(url)
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+                counts.append(len(queries))
+            self.assertEqual(counts[0], counts[1], url)
+
+
+class ValuesSerializerTest(APITestCase):
+    """Test cases for the ValuesSerializer fast path"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+
+        self.vendor = Vendor.objects.create(
+            name='Tést Vendor',
+            contact_details='test@vendor.com',
+            address='123 Test St',
+            vendor_code='VEN001',
+            on_time_delivery_rate=0.0,
+            quality_rating_avg=0.0,
+            average_response_time=0.0,
+            fulfillment_rate=0.0
+        )
+        now = timezone.now()
+        for i, status_name in enumerate(['pending', 'completed', 'canceled']):
+            PurchaseOrder.objects.create(
+                po_number=f'PO00{i}',
+                vendor=self.vendor,
+                order_date=now - timedelta(days=i, microseconds=i),
+                delivery_date=now + timedelta(days=7),
+                items={'item': 'Widget', 'notes': 'ünïcode', 'lines': [1, 2.5, None]},
+                quantity=10,
+                status=status_name,
+                quality_rating=4.5 if status_name == 'completed' else None,
+                issue_date=now,
+                acknowledgment_date=now if i else None,
+            )
+
+    def test_matches_model_serializer_bytes(self):
+        """Test list responses are byte-identical to ModelSerializer output"""
+        render = JSONRenderer().render
+        cases = [
+            ('/api/vendors/', {}, VendorSerializer, Vendor.objects.all(), None),
+            ('/api/purchase_orders/', {'ordering': 'id'}, PurchaseOrderSerializer,
+             PurchaseOrder.objects.order_by('id'), None),
+            ('/api/purchase_orders/', {'ordering': 'id', 'fields': 'vendor,completed_date,items'},
+             PurchaseOrderSerializer, PurchaseOrder.objects.order_by('id'),
+             ['vendor', 'completed_date', 'items']),
+        ]
+        for url, params, serializer_class, queryset, fields in cases:
+            response = self.client.get(url, params)
+            expected = serializer_class(queryset, many=True, context={'fields': fields}).data
+            self.assertEqual(response.content, render(expected), (url, params))
+
+    def test_paginated_without_key_fields(self):
+        """Test keyset pagination works when the key columns are not requested"""
+        response = self.client.get('/api/purchase_orders/', {'page_size': 2, 'fields': 'po_number'})
+        self.assertEqual(response.data['results'], [{'po_number': 'PO002'}, {'po_number': 'PO001'}])
+        response = self.client.get(response.data['next'])
+        self.assertEqual(response.data['results'], [{'po_number': 'PO000'}])
+
+    def test_performance_matches_model_serializer(self):
+        """Test the cached performance payload matches VendorPerformanceSerializer"""
+        caches['performance'].clear()
+        response = self.client.get(f'/api/vendors/{self.vendor.id}/performance/')
+        self.vendor.refresh_from_db()
+        self.assertEqual(response.data, VendorPerformanceSerializer(self.vendor).data)
+
+    def test_rejects_unsupported_fields(self):
+        """Test nested or computed fields are refused up front"""
+        class NestedSerializer(serializers.ModelSerializer):
+            vendor = VendorSerializer()
+
+            class Meta:
+                model = PurchaseOrder
+                fields = ['po_number', 'vendor']
+
+        with self.assertRaises(ImproperlyConfigured):
+            ValuesSerializer(NestedSerializer)
+
+
+class FastJSONTest(APITestCase):
+    """Test the FastJSONRenderer/FastJSONParser pair configured in REST_FRAMEWORK"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='12345')
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+        self.vendor = Vendor.objects.create(
+            name='Vendor Ünïcode', contact_details='a\u2028b', address='Address', vendor_code='V001',
+            on_time_delivery_rate=0.0, quality_rating_avg=0.0,
+            average_response_time=0.0, fulfillment_rate=0.0,
+        )
+
+    def payload(self):
+        now = timezone.now().replace(microsecond=123456)
+        return OrderedDict([
+            ('datetime', now),
+            ('naive', now.replace(tzinfo=None)),
+            ('date', now.date()),
+            ('time', now.time()),
+            ('duration', timedelta(days=1, seconds=5)),
+            ('decimal', Decimal('1.25')),
+            ('uuid', uuid.UUID(int=1)),
+            ('text', 'ünïcode \u2028 \u2029 "quoted"'),
+            ('numbers', [1, 2.5, 0.1, -0, 2 ** 70, True, None]),
+            (1, 'integer key'),
+            ('queryset', Vendor.objects.values_list('vendor_code', flat=True)),
+        ])
+
+    def test_matches_json_renderer(self):
+        """Test both encoders produce JSONRenderer's exact bytes"""
+        expected = JSONRenderer().render(self.payload())
+        self.assertEqual(renderers.FastJSONRenderer().render(self.payload()), expected)
+        self.assertEqual(renderers._stdlib_dumps(self.payload()), expected)
+        self.assertEqual(renderers.FastJSONRenderer().render(None), b'')
+
+    def test_non_finite_floats_rejected(self):
+        """Test NaN and Infinity raise on the orjson and stdlib paths, as in JSONRenderer"""
+        values = [float('nan'), float('inf'), -float('inf'), Decimal('NaN')]
+        for value in values:
+            data = {'rows': [{'rate': value, 'note': None}]}
+            for dumps in (JSONRenderer().render, renderers.dumps, renderers._stdlib_dumps):
+                with self.assertRaises(ValueError, msg=f'{dumps} {value}'):
+                    dumps(data)
+        # Nulls alone are still encoded as usual
+        data = {'rows': [{'rate': 1.5, 'note': None, 'date': timezone.now()}]}
+        self.assertEqual(renderers.dumps(data), JSONRenderer().render(data))
+        self.assertFalse(renderers._has_non_finite(data))
+
+    def test_api_responses(self):
+        """Test API responses match JSONRenderer and indented output is still honoured"""
+        response = self.client.get(f'/api/vendors/{self.vendor.id}/')
+        self.assertIn(b'\\u2028', response.content)
+        self.assertEqual(response.content, JSONRenderer().render(response.data))
+
+        response = self.client.get(
+            f'/api/vendors/{self.vendor.id}/', HTTP_ACCEPT='application/json; indent=2'
+        )
+        self.assertEqual(
+            response.content,
+            JSONRenderer().render(response.data, 'application/json; indent=2'),
+        )
+        self.assertIn(b'\n  "id"', response.content)
+
+    def test_parser(self):
+        """Test request bodies are decoded by FastJSONParser and bad JSON is a 400"""
+        data = {
+            'name': 'Ünïcode', 'contact_details': 'c', 'address': 'a', 'vendor_code': 'V002',
+            'on_time_delivery_rate': 0.0, 'quality_rating_avg': 0.0,
+            'average_response_time': 0.0, 'fulfillment_rate': 0.0,
+        }
+        response = self.client.post(
+            '/api/vendors/', json.dumps(data, ensure_ascii=False).encode(), content_type='application/json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['name'], 'Ünïcode')
+
+        for body in ('{"name": ', '{"quantity": NaN}'):
+            response = self.client.post('/api/vendors/', body, content_type='application/json')
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, body)
+            self.assertTrue(response.data['detail'].startswith('JSON parse error'), body)
+
+    def test_loads_fallback(self):
+        """Test the stdlib decoder accepts the same input and rejects NaN"""
+        body = '{"a": [1, 2.5, null, "\u00fc"]}'.encode()
+        self.assertEqual(parsers._stdlib_loads(body), parsers.loads(body))
+        for loads in (parsers.loads, parsers._stdlib_loads):
+            with self.assertRaises(ValueError):
+                loads(b'[NaN]')
+
+
+class ConditionalGetTest(APITestCase):
+    """Test ETag / Last-Modified validators and 304 responses"""
+
+    def setUp(self):
+        caches['tokens'].clear()
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.token = Token.objects.create(user=self.user)
+        self.headers = {'Authorization': 'Token ' + self.token.key}
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+
+        self.vendor = Vendor.objects.create(
+            name='Test Vendor',
+            contact_details='test@vendor.com',
+            address='123 Test St',
+            vendor_code='VEN001',
+            on_time_delivery_rate=0.0,
+            quality_rating_avg=0.0,
+            average_response_time=0.0,
+            fulfillment_rate=0.0
+        )
+        self.counter = 0
+        self.po = self.add_order()
+        self.client.get('/api/vendors/')  # warm the token cache
+
+    def add_order(self, **kwargs):
+        now = timezone.now()
+        self.counter += 1
+        return PurchaseOrder.objects.create(**{
+            'po_number': f'PO{self.counter:03}',
+            'vendor': self.vendor,
+            'order_date': now,
+            'delivery_date': now + timedelta(days=7),
+            'items': {'item': 'Widget'},
+            'quantity': 10,
+            'status': 'pending',
+            'issue_date': now,
+            **kwargs,
+        })
+
+    def detail_urls(self):
+        return [f'/api/vendors/{self.vendor.id}/', f'/api/purchase_orders/{self.po.id}/']
+
+    def assertNotModified(self, url, queries=1, **headers):
+        with self.assertNumQueries(queries):
+            response = self.client.get(url, headers=headers)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED, url)
+        self.assertEqual(response.content, b'')
+        return response
+
+    def assertModified(self, url, **headers):
+        response = self.client.get(url, headers=headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK, url)
+        return response
+
+    def test_versions_bumped_on_write(self):
+        """Test saves and metric updates bump version; clients cannot set it"""
+        self.assertEqual((self.vendor.version, self.po.version), (1, 1))
+        self.po.status = 'completed'
+        self.po.save()
+        self.vendor.refresh_from_db()
+        self.assertEqual((self.vendor.version, self.po.version), (2, 2))
+
+        response = self.client.patch(
+            f'/api/vendors/{self.vendor.id}/', {'name': 'Renamed', 'version': 99}, format='json'
+        )
+        self.assertEqual(response.data['version'], 3)
+        self.vendor.refresh_from_db()
+        self.assertEqual(self.vendor.version, 3)
+        self.assertEqual(
+            response.data['last_modified'],
+            self.vendor.last_modified.isoformat().replace('+00:00', 'Z'),
+        )
+
+    def test_detail_not_modified(self):
+        """Test a matching If-None-Match / If-Modified-Since is answered from one lookup"""
+        for url in self.detail_urls():
+            response = self.assertModified(url)
+            self.assertEqual(response['ETag'], 'W/"1"')
+            not_modified = self.assertNotModified(url, If_None_Match=response['ETag'])
+            self.assertEqual(not_modified['ETag'], response['ETag'])
+            self.assertEqual(not_modified['Last-Modified'], response['Last-Modified'])
+            self.assertNotModified(url, If_Modified_Since=response['Last-Modified'])
+
+            earlier = http_date(timezone.now().timestamp() - 3600)
+            self.assertModified(url, If_Modified_Since=earlier)
+            self.assertModified(url, If_None_Match='W/"0"')
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/purchase_orders/0/', headers={'If-None-Match': '*'})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_detail_changes_after_write(self):
+        """Test acknowledging an order and the metric signal invalidate ETags"""
+        po_url, vendor_url = f'/api/purchase_orders/{self.po.id}/', f'/api/vendors/{self.vendor.id}/'
+        po_etag = self.assertModified(po_url)['ETag']
+        vendor_etag = self.assertModified(vendor_url)['ETag']
+
+        self.client.post(f'/api/purchase_orders/{self.po.id}/acknowledge/')
+        self.assertModified(po_url, If_None_Match=po_etag)
+        self.assertNotModified(vendor_url, If_None_Match=vendor_etag)
+
+        self.client.patch(po_url, {'status': 'completed', 'quality_rating': 4.0}, format='json')
+        response = self.assertModified(vendor_url, If_None_Match=vendor_etag)
+        self.assertEqual(response.data['quality_rating_avg'], 4.0)
+
+    def test_list_not_modified(self):
+        """Test list ETags cover the page's rows and whether more pages exist"""
+        cases = [
+            ('/api/purchase_orders/', {}),
+            ('/api/purchase_orders/', {'page_size': 1}),
+            ('/api/purchase_orders/', {'fields': 'po_number', 'ordering': '-po_number'}),
+            ('/api/vendors/', {}),
+        ]
+        etags = {}
+        for url, params in cases:
+            full_url = f'{url}?{urlencode(params)}'
+            response = self.assertModified(full_url)
+            etags[full_url] = response['ETag']
+            self.assertNotModified(full_url, If_None_Match=response['ETag'])
+            # Lists have no Last-Modified, so If-Modified-Since alone is ignored
+            self.assertNotIn('Last-Modified', response)
+            self.assertModified(full_url, If_Modified_Since=http_date(timezone.now().timestamp()))
+
+        # A new order changes every PO list (a next page appears on page 1)
+        # and the vendor list (the vendor's metrics stay the same: pending)
+        self.add_order()
+        for full_url, etag in etags.items():
+            if full_url.startswith('/api/vendors/'):
+                self.assertNotModified(full_url, If_None_Match=etag)
+            else:
+                etags[full_url] = self.assertModified(full_url, If_None_Match=etag)['ETag']
+
+        self.po.delete()
+        for full_url, etag in etags.items():
+            if not full_url.startswith('/api/vendors/'):
+                self.assertModified(full_url, If_None_Match=etag)
+
+    def test_bulk_upsert_bumps_version(self):
+        """Test re-sent orders get a new version through the bulk upsert"""
+        response = self.client.post('/api/purchase_orders/bulk/', [{
+            'po_number': self.po.po_number,
+            'vendor': self.vendor.id,
+            'order_date': self.po.order_date.isoformat(),
+            'delivery_date': self.po.delivery_date.isoformat(),
+            'items': {'item': 'Gadget'},
+            'quantity': 5,
+            'status': 'pending',
+            'issue_date': self.po.issue_date.isoformat(),
+        }], format='json')
+        self.assertEqual(response.data['updated'], 1)
+        self.po.refresh_from_db()
+        self.assertEqual(self.po.version, 2)
+
+    async def test_async_endpoints(self):
+        """Test the async detail and list endpoints honour the same validators"""
+        paths = [*self.detail_urls(), '/api/purchase_orders/', '/api/vendors/?page_size=1']
+        for path in paths:
+            url = path.replace('/api/', '/api/async/')
+            response = await self.async_client.get(url, headers=self.headers)
+            self.assertEqual(response.status_code, status.HTTP_200_OK, url)
+            response = await self.async_client.get(
+                url, headers={**self.headers, 'If-None-Match': response['ETag']}
+            )
+            self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED, url)
+
+
+class OptimisticConcurrencyTest(APITestCase):
+    """Test version compare-and-swap on saves and vendor metric writes"""
+
+    def setUp(self):
+        caches['tokens'].clear()
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+
+        self.vendor = Vendor.objects.create(
+            name='Test Vendor',
+            contact_details='test@vendor.com',
+            address='123 Test St',
+            vendor_code='VEN001',
+            on_time_delivery_rate=0.0,
+            quality_rating_avg=0.0,
+            average_response_time=0.0,
+            fulfillment_rate=0.0
+        )
+        now = timezone.now()
+        self.orders = [
+            PurchaseOrder.objects.create(
+                po_number=f'PO{i:03}',
+                vendor=self.vendor,
+                order_date=now,
+                delivery_date=now + timedelta(days=7),
+                items={'item': 'Widget'},
+                quantity=10,
+                status='pending',
+                issue_date=now,
+            )
+            for i in range(2)
+        ]
+
+    def complete(self, order, rating):
+        order.refresh_from_db()
+        order.status = 'completed'
+        order.quality_rating = rating
+        order.completed_date = timezone.now()
+        order.save()
+
+    def assertMetricsConsistent(self):
+        self.vendor.refresh_from_db()
+        for name, value in compute_vendor_metrics(self.vendor).items():
+            self.assertAlmostEqual(getattr(self.vendor, name), value, msg=name)
+
+    def test_stale_save_conflicts(self):
+        """Test saving a stale copy raises instead of overwriting the newer row"""
+        stale = PurchaseOrder.objects.get(pk=self.orders[0].pk)
+        self.complete(self.orders[0], 4.0)
+
+        stale.quantity = 99
+        with self.assertRaises(VersionConflict), transaction.atomic():
+            stale.save()
+        self.assertEqual(stale.version, 1)
+
+        self.orders[0].refresh_from_db()
+        self.assertEqual((self.orders[0].quantity, self.orders[0].version), (10, 2))
+        self.assertEqual(self.vendor.metric_counters.completed_count, 1)
+
+        # Reloaded, the same edit goes through
+        stale.refresh_from_db()
+        stale.quantity = 99
+        stale.save()
+        self.assertEqual(PurchaseOrder.objects.get(pk=stale.pk).version, 3)
+
+    def test_hand_built_save_bumps_version(self):
+        """Test saving an unsaved copy over an existing row bumps its version instead of resetting it"""
+        Vendor.objects.filter(pk=self.vendor.pk).update(version=7)
+        copy = Vendor(
+            pk=self.vendor.pk,
+            name='Copied Vendor',
+            contact_details='copy@vendor.com',
+            address='1 Copy St',
+            vendor_code='VEN001',
+            on_time_delivery_rate=0.0,
+            quality_rating_avg=0.0,
+            average_response_time=0.0,
+            fulfillment_rate=0.0,
+        )
+        copy.save()
+        self.assertEqual(copy.version, 8)
+        stored = Vendor.objects.get(pk=self.vendor.pk)
+        self.assertEqual((stored.name, stored.version), ('Copied Vendor', 8))
+
+        # The copy now holds the stored version, so it saves optimistically
+        copy.name = 'Renamed Copy'
+        copy.save()
+        self.assertEqual(Vendor.objects.get(pk=self.vendor.pk).version, 9)
+
+    def test_retry_on_conflict(self):
+        """Test the operation is retried, and the last conflict re-raised"""
+        calls, reloads = [], []
+
+        def flaky():
+            calls.append(1)
+            if len(calls) < 3:
+                raise VersionConflict()
+            return 'done'
+
+        self.assertEqual(retry_on_conflict(flaky, before_retry=lambda: reloads.append(1)), 'done')
+        self.assertEqual((len(calls), len(reloads)), (3, 2))
+
+        with self.assertRaises(VersionConflict):
+            retry_on_conflict(mock.Mock(side_effect=VersionConflict), attempts=2)
+
+    def test_metric_write_retries_after_vendor_edit(self):
+        """Test a vendor edit between the counter read and the metric write survives"""
+        rates_from_counters = metrics.rates_from_counters
+
+        def edit_vendor(totals, *args):
+            if not edited:
+                edited.append(1)
+                vendor = Vendor.objects.get(pk=self.vendor.pk)
+                vendor.name = 'Renamed Vendor'
+                vendor.save()
+            return rates_from_counters(totals, *args)
+
+        edited = []
+        with mock.patch('app.metrics.rates_from_counters', side_effect=edit_vendor) as patched:
+            self.complete(self.orders[0], 4.0)
+        self.assertEqual(patched.call_count, 2)
+
+        self.vendor.refresh_from_db()
+        self.assertEqual(self.vendor.name, 'Renamed Vendor')
+        self.assertEqual(self.vendor.quality_rating_avg, 4.0)
+        self.assertMetricsConsistent()
+
+    def test_api_update_retries_after_metric_write(self):
+        """Test a vendor PATCH racing an order completion is reloaded and retried"""
+        version = Vendor.objects.get(pk=self.vendor.pk).version
+
+        def complete_during_validation(serializer, attrs):
+            # The view has loaded the vendor; the completion bumps its version
+            self.complete(self.orders[0], 5.0)
+            return attrs
+
+        with mock.patch.object(
+            VendorSerializer, 'validate', autospec=True, side_effect=complete_during_validation
+        ), mock.patch.object(Vendor, 'save', autospec=True, side_effect=Vendor.save) as save:
+            response = self.client.patch(
+                f'/api/vendors/{self.vendor.id}/', {'name': 'Renamed Vendor'}, format='json'
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(save.call_count, 2)
+        self.assertEqual(response.data['name'], 'Renamed Vendor')
+        self.assertEqual(response.data['quality_rating_avg'], 5.0)
+        self.assertEqual(response.data['version'], version + 2)
+        self.assertMetricsConsistent()
+
+    def admin_vendor_form(self, **kwargs):
+        vendor = Vendor.objects.get(pk=self.vendor.pk)
+        data = {
+            name: getattr(vendor, name) for name in (
+                'name', 'contact_details', 'address', 'vendor_code', *metrics.METRIC_FIELDS
+            )
+        }
+        data.update(loaded_version=vendor.version, **kwargs)
+        return data
+
+    def test_admin_reports_concurrent_edit(self):
+        """Test an admin save over a newer version is a form error, and a racing save a message"""
+        self.client.force_login(User.objects.create_superuser(username='admin', password='pass'))
+        url = f'/admin/app/vendor/{self.vendor.pk}/change/'
+        response = self.client.get(url)
+        self.assertContains(response, f'name="loaded_version" value="{self.vendor.version}"')
+
+        stale = self.admin_vendor_form(name='Stale Edit')
+        self.complete(self.orders[0], 4.0)
+        response = self.client.post(url, stale)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'changed by someone else since you loaded it')
+        self.assertEqual(Vendor.objects.get(pk=self.vendor.pk).name, 'Test Vendor')
+
+        # The row moves between validation and the save
+        with mock.patch.object(Vendor, 'save', side_effect=VersionConflict):
+            response = self.client.post(url, self.admin_vendor_form(name='Racing Edit'), follow=True)
+        self.assertRedirects(response, url)
+        self.assertContains(response, 'changed by someone else since you loaded it')
+        self.assertEqual(Vendor.objects.get(pk=self.vendor.pk).name, 'Test Vendor')
+
+        response = self.client.post(url, self.admin_vendor_form(name='Fresh Edit'))
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(Vendor.objects.get(pk=self.vendor.pk).name, 'Fresh Edit')
+
+        order = PurchaseOrder.objects.get(pk=self.orders[0].pk)
+        response = self.client.get(f'/admin/app/purchaseorder/{order.pk}/change/')
+        self.assertContains(response, f'name="loaded_version" value="{order.version}"')
+
+    def test_persistent_conflict_returns_409(self):
+        """Test updates that keep conflicting answer 409 and change nothing"""
+        po = self.orders[0]
+        with mock.patch(
+            'app.models.Versioned._do_update', autospec=True, side_effect=VersionConflict('busy')
+        ):
+            responses = [
+                self.client.patch(f'/api/vendors/{self.vendor.id}/', {'name': 'X'}, format='json'),
+                self.client.patch(f'/api/purchase_orders/{po.id}/', {'quantity': 1}, format='json'),
+                self.client.post(f'/api/purchase_orders/{po.id}/acknowledge/'),
+            ]
+        for response in responses:
+            self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        po.refresh_from_db()
+        self.assertEqual((po.quantity, po.acknowledgment_date, po.version), (10, None, 1))
+
+    def test_recompute_detects_concurrent_write(self):
+        """Test a batch recompute is rolled back when a vendor changes under it"""
+        self.complete(self.orders[0], 3.0)
+        counter_aggregates = metrics.counter_aggregates
+
+        def bump_during_count(**kwargs):
+            Vendor.objects.filter(pk=self.vendor.pk).update(**Vendor.version_bump())
+            return counter_aggregates(**kwargs)
+
+        VendorMetricCounters.objects.filter(vendor=self.vendor).update(completed_count=0)
+        with mock.patch('app.metrics.counter_aggregates', side_effect=bump_during_count) as patched:
+            with self.assertRaises(VersionConflict):
+                recompute_vendors(Vendor.objects.all())
+        self.assertEqual(patched.call_count, VERSION_ATTEMPTS)
+        self.assertEqual(VendorMetricCounters.objects.get(vendor=self.vendor).completed_count, 0)
+
+        recompute_vendors(Vendor.objects.all())
+        self.assertEqual(VendorMetricCounters.objects.get(vendor=self.vendor).completed_count, 1)
+        self.assertMetricsConsistent()
+
+
+class DatabaseProfileTest(TestCase):
+    """Test the SQLite pragmas of the database profiles"""
+
+    def open_file_database(self, directory):
+        """A new connection to an SQLite file, so connection_created fires"""
+        default = connections['default']
+        wrapper = type(default)(
+            {**default.settings_dict, 'NAME': os.path.join(directory, 'profile.sqlite3')}
+        )
+        wrapper.ensure_connection()
+        return wrapper
+
+    def pragma(self, wrapper, name):
+        with wrapper.cursor() as cursor:
+            cursor.execute(f'PRAGMA {name}')
+            return cursor.fetchone()[0]
+
+    def test_production_pragmas_applied_on_connect(self):
+        """Test every new connection runs the production profile's pragmas"""
+        pragmas = settings.DATABASE_PROFILES['production']['SQLITE_PRAGMAS']
+        with tempfile.TemporaryDirectory() as directory, override_settings(SQLITE_PRAGMAS=pragmas):
+            wrapper = self.open_file_database(directory)
+            self.assertEqual(self.pragma(wrapper, 'journal_mode'), 'wal')
+            self.assertEqual(self.pragma(wrapper, 'synchronous'), 1)  # NORMAL
+            self.assertEqual(self.pragma(wrapper, 'temp_store'), 2)  # MEMORY
+            for name in ('busy_timeout', 'cache_size', 'mmap_size'):
+                self.assertEqual(self.pragma(wrapper, name), pragmas[name], name)
+            wrapper.close()
+
+    def test_development_profile_keeps_defaults(self):
+        """Test the development profile leaves SQLite's defaults alone"""
+        pragmas = settings.DATABASE_PROFILES['development']['SQLITE_PRAGMAS']
+        with tempfile.TemporaryDirectory() as directory, override_settings(SQLITE_PRAGMAS=pragmas):
+            wrapper = self.open_file_database(directory)
+            self.assertEqual(self.pragma(wrapper, 'journal_mode'), 'delete')
+            self.assertEqual(self.pragma(wrapper, 'synchronous'), 2)  # FULL
+            wrapper.close()
+
+    def test_other_backends_skipped(self):
+        """Test pragmas are only sent to SQLite"""
+        other = mock.Mock(vendor='postgresql')
+        with override_settings(SQLITE_PRAGMAS={'journal_mode': 'wal'}):
+            apply_sqlite_pragmas(sender=type(other), connection=other)
+        other.cursor.assert_not_called()
+
+
+class ReadReplicaRouterTest(APITestCase):
+    """Test read routing to the replica database and read-your-writes pinning"""
+
+    def setUp(self):
+        caches['tokens'].clear()
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+        self.vendor = Vendor.objects.create(
+            name='Test Vendor',
+            contact_details='test@vendor.com',
+            address='123 Test St',
+            vendor_code='VEN001',
+            on_time_delivery_rate=0.0,
+            quality_rating_avg=0.0,
+            average_response_time=0.0,
+            fulfillment_rate=0.0
+        )
+        # Pretend a replica is configured; the tests only look at routing decisions
+        patcher = mock.patch('app.db.replica_configured', return_value=True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_reads_routed_until_first_write(self):
+        """Test reads go to the replica inside a block, and to default after a write"""
+        self.assertEqual(Vendor.objects.all().db, 'default')
+        with replica_reads():
+            self.assertEqual(Vendor.objects.all().db, 'replica')
+            self.assertEqual(Token.objects.all().db, 'default')
+            self.vendor.name = 'Renamed Vendor'
+            self.vendor.save()
+            self.assertEqual(Vendor.objects.all().db, 'default')
+        with replica_reads():
+            self.assertEqual(PurchaseOrder.objects.all().db, 'replica')
+
+    def test_writes_go_to_default(self):
+        """Test an instance read from the replica is written back to default"""
+        self.vendor._state.db = 'replica'
+        router = ReadReplicaRouter()
+        self.assertEqual(router.db_for_write(Vendor, instance=self.vendor), 'default')
+        self.assertTrue(router.allow_relation(self.vendor, self.user))
+        self.assertFalse(router.allow_migrate('replica', 'app'))
+        self.assertIsNone(router.allow_migrate('default', 'app'))
+
+    def test_api_requests_routed(self):
+        """Test GETs and batch performance requests read from the replica, other writes do not"""
+        def routed(method, url, data=None):
+            # Only consulted inside a replica_reads() block that has not written
+            with mock.patch('app.db.replica_configured', return_value=False) as configured:
+                response = getattr(self.client, method)(url, data, format='json')
+            self.assertLess(response.status_code, 400, url)
+            return configured.called
+
+        vendor_url = f'/api/vendors/{self.vendor.id}/'
+        self.assertTrue(routed('get', '/api/vendors/'))
+        self.assertTrue(routed('get', vendor_url))
+        # Performance cache fills always read default
+        self.assertFalse(routed('get', f'{vendor_url}performance/'))
+        self.assertTrue(routed('post', '/api/vendors/performance/', {'ids': [self.vendor.id]}))
+        self.assertTrue(routed('get', '/api/async/vendors/'))
+        self.assertFalse(routed('patch', vendor_url, {'name': 'Renamed Vendor'}))
+
+    def test_performance_cache_filled_from_default(self):
+        """Test the performance cache is never filled from a lagging replica"""
+        with replica_reads():
+            self.assertEqual(Vendor.objects.all().db, 'replica')
+            _, queryset = _performance_query(self.vendor.id)
+            self.assertEqual(queryset.db, 'default')
+            caches['performance'].clear()
+            self.assertEqual(get_vendor_performance(self.vendor.id)['data']['id'], self.vendor.id)
+
+    def test_export_keeps_routed_alias(self):
+        """Test a streamed export reads from the alias chosen in the view"""
+        with mock.patch('app.db.reads_from_replica', return_value=False) as routing:
+            response = self.client.get('/api/vendors/export/')
+            routing.reset_mock()
+            b''.join(response.streaming_content)
+        routing.assert_not_called()
+
+    def test_copy_sqlite_database(self):
+        """Test refreshing a replica file takes a snapshot of the primary"""
+        with tempfile.TemporaryDirectory() as directory:
+            primary, replica = (os.path.join(directory, name) for name in ('p.sqlite3', 'r.sqlite3'))
+            db = sqlite3.connect(primary)
+            db.execute('CREATE TABLE item (name TEXT)')
+            db.execute("INSERT INTO item VALUES ('a')")
+            db.commit()
+            copy_sqlite_database(primary, replica)
+            db.execute("INSERT INTO item VALUES ('b')")
+            db.commit()
+
+            copy = sqlite3.connect(replica)
+            self.assertEqual(copy.execute('SELECT count(*) FROM item').fetchone(), (1,))
+            copy.close()
+            copy_sqlite_database(primary, replica)
+            copy = sqlite3.connect(replica)
+            self.assertEqual(copy.execute('SELECT count(*) FROM item').fetchone(), (2,))
+            copy.close()
+            db.close()
+
+
+class DailyRollupTest(APITestCase):
+    """Test the daily per-vendor rollups and the windowed performance endpoint"""
+
+    def setUp(self):
+        caches['tokens'].clear()
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+        self.vendor = Vendor.objects.create(
+            name='Test Vendor',
+            contact_details='test@vendor.com',
+            address='123 Test St',
+            vendor_code='VEN001',
+            on_time_delivery_rate=0.0,
+            quality_rating_avg=0.0,
+            average_response_time=0.0,
+            fulfillment_rate=0.0
+        )
+        self.url = f'/api/vendors/{self.vendor.id}/performance/window/'
+
+    def _create_po(self, po_number, days_ago=0, **kwargs):
+        when = timezone.now() - timedelta(days=days_ago)
+        data = {
+            'po_number': po_number,
+            'vendor': self.vendor,
+            'order_date': when,
+            'delivery_date': when + timedelta(days=7),
+            'items': {"item1": "Product A"},
+            'quantity': 10,
+            'status': 'completed',
+            'issue_date': when,
+            'completed_date': when,
+        }
+        data.update(kwargs)
+        return PurchaseOrder.objects.create(**data)
+
+    def rollups(self):
+        return {
+            row.pop('date'): row
+            for row in VendorDailyRollup.objects.filter(vendor=self.vendor).values(
+                'date', *metrics.ROLLUP_FIELDS
+            )
+        }
+
+    def test_rollups_follow_order_changes(self):
+        """Test creates, edits, moved completions, cancellations and deletes match a rebuild"""
+        po1 = self._create_po('PO001', quality_rating=4.0)
+        po2 = self._create_po('PO002', days_ago=40, quality_rating=2.0)
+        po3 = self._create_po('PO003', days_ago=100)
+        today = timezone.localdate()
+        self.assertEqual(len(self.rollups()), 3)
+        self.assertEqual(self.rollups()[today]['rating_sum'], 4.0)
+
+        po1.quality_rating = 5.0
+        po1.save()
+        po2.completed_date = timezone.now() - timedelta(days=10)
+        po2.save()
+        po3.status = 'canceled'
+        po3.save()
+        self._create_po('PO004', status='canceled', completed_date=None)
+        po1.delete()
+
+        incremental = self.rollups()
+        self.assertEqual(incremental[today]['canceled_count'], 1)
+        self.assertEqual(incremental[today]['completed_count'], 0)
+        self.assertEqual(incremental[today - timedelta(days=10)]['completed_count'], 1)
+        self.assertEqual(incremental[today - timedelta(days=100)]['canceled_count'], 1)
+        recompute_vendors(Vendor.objects.all())
+        rebuilt = self.rollups()
+        # An emptied day keeps a zero row until the next rebuild
+        self.assertEqual(
+            {date: row for date, row in incremental.items() if any(row.values())}, rebuilt
+        )
+
+    def test_windowed_metrics(self):
+        """Test each window sums only its own days, in one query"""
+        self._create_po('PO001', days_ago=5, quality_rating=5.0)
+        self._create_po('PO002', days_ago=60, quality_rating=3.0)
+        self._create_po('PO003', days_ago=200, quality_rating=1.0)
+        self._create_po('PO004', days_ago=20, status='canceled', completed_date=None)
+
+        with self.assertNumQueries(1):
+            month, quarter = windowed_metrics(self.vendor.id)
+        self.assertEqual((month['days'], quarter['days']), (30, 90))
+        self.assertEqual(month['end'], timezone.localdate())
+        self.assertEqual(month['start'], timezone.localdate() - timedelta(days=29))
+        self.assertEqual(month['quality_rating_avg'], 5.0)
+        self.assertEqual((month['completed_count'], month['canceled_count']), (1, 1))
+        self.assertEqual(quarter['quality_rating_avg'], 4.0)
+        self.assertEqual(quarter['fulfillment_rate'], 100.0)
+        self.assertEqual((quarter['completed_count'], quarter['canceled_count']), (2, 1))
+
+    def test_window_endpoint(self):
+        """Test the endpoint's default and custom windows and its errors"""
+        self._create_po('PO001', days_ago=3, quality_rating=4.0)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['vendor'], self.vendor.id)
+        self.assertEqual([window['days'] for window in response.data['windows']], [30, 90])
+
+        response = self.client.get(self.url, {'days': '7,2'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        week, two_days = response.data['windows']
+        self.assertEqual(week['completed_count'], 1)
+        self.assertEqual(week['quality_rating_avg'], 4.0)
+        self.assertEqual(two_days['completed_count'], 0)
+
+        for days in ('0', '367', 'month', '7,-1'):
+            response = self.client.get(self.url, {'days': days})
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, days)
+        response = self.client.get('/api/vendors/999/performance/window/')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_window_endpoint_query_count(self):
+        """Test the endpoint's query count does not grow with the order history"""
+        self.client.get(self.url)
+        with CaptureQueriesContext(connection) as before:
+            self.client.get(self.url)
+        for i in range(30):
+            self._create_po(f'PO{i:03}', days_ago=i * 3)
+        with CaptureQueriesContext(connection) as after:
+            self.client.get(self.url)
+        self.assertEqual(len(before), len(after))
+
+    @override_settings(METRICS_RECOMPUTE_MODE='deferred')
+    def test_deferred_cancellation_marks_vendor(self):
+        """Test a cancellation, which moves no counters, still queues the vendor"""
+        self._create_po('PO001', status='canceled', completed_date=None)
+        self.assertTrue(DirtyVendor.objects.filter(vendor=self.vendor).exists())
+        DirtyVendor.objects.all().delete()
+        self._create_po('PO002', status='pending', completed_date=None)
+        self.assertFalse(DirtyVendor.objects.filter(vendor=self.vendor).exists())
+
+    def test_migration_backfills_rollups(self):
+        """Test the data migration rolls up existing orders as a rebuild would"""
+        self._create_po('PO001', quality_rating=4.0, acknowledgment_date=timezone.now())
+        self._create_po('PO002', days_ago=40, delivery_date=timezone.now() - timedelta(days=50))
+        self._create_po('PO003', days_ago=40, status='canceled', completed_date=None)
+        self._create_po('PO004', status='pending', completed_date=None)
+        recompute_vendors(Vendor.objects.all())
+        rebuilt = self.rollups()
+
+        VendorDailyRollup.objects.all().delete()
+        migration = importlib.import_module('app.migrations.0007_vendor_daily_rollup')
+        migration.backfill_rollups(apps, None)
+        backfilled = self.rollups()
+        self.assertEqual(set(backfilled), set(rebuilt))
+        for date, row in rebuilt.items():
+            for name, value in row.items():
+                self.assertAlmostEqual(backfilled[date][name], value, msg=f'{date} {name}')
+
+    def test_rebuild_command_checks_rollups(self):
+        """Test rebuild_vendor_metrics --check compares the counters with the rollups"""
+        self._create_po('PO001', quality_rating=4.0)
+        call_command('rebuild_vendor_metrics', '--check', stdout=StringIO(), stderr=StringIO())
+        VendorDailyRollup.objects.filter(vendor=self.vendor).update(rating_sum=1.0)
+        err = StringIO()
+        with self.assertRaises(CommandError):
+            call_command('rebuild_vendor_metrics', '--check', stdout=StringIO(), stderr=err)
+        self.assertIn('rating_sum rollup=1.0 recount=4.0', err.getvalue())
+
+        call_command('rebuild_vendor_metrics', stdout=StringIO())
+        self.assertEqual(VendorDailyRollup.objects.get(vendor=self.vendor).rating_sum, 4.0)
+        call_command('rebuild_vendor_metrics', '--check', stdout=StringIO(), stderr=StringIO())
+
+    def test_rebuild_command_checks_rollup_days(self):
+        """Test --check catches a rollup on the wrong day even when the sums still match"""
+        self._create_po('PO001', quality_rating=4.0)
+        rollup = VendorDailyRollup.objects.get(vendor=self.vendor)
+        completed_date = rollup.date
+        rollup.date -= timedelta(days=1)
+        rollup.save()
+
+        err = StringIO()
+        with self.assertRaises(CommandError):
+            call_command('rebuild_vendor_metrics', '--check', stdout=StringIO(), stderr=err)
+        self.assertIn(f'no rollup for {completed_date}', err.getvalue())
+        self.assertIn(f'rollup for {rollup.date} has no orders', err.getvalue())
+
+
+class DerivedColumnsTest(APITestCase):
+    """Test the stored response_seconds and is_on_time columns"""
+
+    def setUp(self):
+        caches['tokens'].clear()
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+        self.vendor = Vendor.objects.create(
+            name='Test Vendor',
+            contact_details='test@vendor.com',
+            address='123 Test St',
+            vendor_code='VEN001',
+            on_time_delivery_rate=0.0,
+            quality_rating_avg=0.0,
+            average_response_time=0.0,
+            fulfillment_rate=0.0
+        )
+        self.issue_date = timezone.now() - timedelta(days=2)
+
+    def _create_po(self, po_number, **kwargs):
+        data = {
+            'po_number': po_number,
+            'vendor': self.vendor,
+            'order_date': self.issue_date,
+            'delivery_date': timezone.now() + timedelta(days=7),
+            'items': {"item1": "Product A"},
+            'quantity': 10,
+            'status': 'pending',
+            'issue_date': self.issue_date,
+        }
+        data.update(kwargs)
+        return PurchaseOrder.objects.create(**data)
+
+    def test_columns_stamped_on_save(self):
+        """Test the columns follow acknowledgment, completion and late delivery"""
+        po = self._create_po('PO001')
+        self.assertIsNone(po.response_seconds)
+        self.assertIsNone(po.is_on_time)
+
+        # update_fields saves include the derived columns
+        po.acknowledgment_date = self.issue_date + timedelta(hours=3)
+        po.save(update_fields=['acknowledgment_date'])
+        po.status = 'completed'
+        po.save(update_fields=['status'])
+        po.refresh_from_db()
+        self.assertEqual(po.response_seconds, 3 * 3600)
+        self.assertTrue(po.is_on_time)
+
+        po.delivery_date = self.issue_date
+        po.save()
+        po.refresh_from_db()
+        self.assertFalse(po.is_on_time)
+        self.vendor.refresh_from_db()
+        self.assertEqual(self.vendor.on_time_delivery_rate, 0.0)
+        self.assertAlmostEqual(self.vendor.average_response_time, 3.0)
+
+    def test_bulk_upsert_stamps_columns(self):
+        """Test orders written by the bulk endpoint carry the columns"""
+        row = {
+            'po_number': 'PO001',
+            'vendor': self.vendor.id,
+            'order_date': self.issue_date.isoformat(),
+            'delivery_date': (timezone.now() + timedelta(days=7)).isoformat(),
+            'items': {"item1": "Product A"},
+            'quantity': 10,
+            'status': 'completed',
+            'issue_date': self.issue_date.isoformat(),
+            'acknowledgment_date': (self.issue_date + timedelta(hours=6)).isoformat(),
+            # Read-only: ignored
+            'is_on_time': False,
+        }
+        response = self.client.post('/api/purchase_orders/bulk/', [row], format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        po = PurchaseOrder.objects.get(po_number='PO001')
+        self.assertEqual(po.response_seconds, 6 * 3600)
+        self.assertTrue(po.is_on_time)
+        response = self.client.get(f'/api/purchase_orders/{po.id}/')
+        self.assertEqual(response.data['response_seconds'], 6 * 3600)
+        self.assertIs(response.data['is_on_time'], True)
+
+    def test_metrics_match_date_arithmetic(self):
+        """Test the stored-column aggregates agree with the metrics computed from the dates"""
+        for i in range(6):
+            self._create_po(
+                f'PO{i:03}',
+                status='completed',
+                acknowledgment_date=self.issue_date + timedelta(minutes=37 * i) if i % 3 else None,
+                delivery_date=self.issue_date + timedelta(days=i - 2),
+                completed_date=self.issue_date + timedelta(days=1),
+            )
+        orders = list(PurchaseOrder.objects.filter(vendor=self.vendor))
+        on_time = [po.completed_date <= po.delivery_date for po in orders]
+        response_hours = [
+            (po.acknowledgment_date - po.issue_date).total_seconds() / 3600
+            for po in orders if po.acknowledgment_date
+        ]
+        expected = compute_vendor_metrics(self.vendor)
+        self.assertAlmostEqual(expected['on_time_delivery_rate'], sum(on_time) / len(orders) * 100)
+        self.assertAlmostEqual(
+            expected['average_response_time'], sum(response_hours) / len(response_hours)
+        )
+        self.vendor.refresh_from_db()
+        self.assertAlmostEqual(
+            self.vendor.average_response_time, expected['average_response_time']
+        )
+
+    def test_migration_backfills_columns(self):
+        """Test the data migration fills existing orders and bumps their version and last_modified"""
+        acked = self._create_po(
+            'PO001', acknowledgment_date=self.issue_date + timedelta(hours=2), status='completed'
+        )
+        pending = self._create_po('PO002')
+        stale = timezone.now() - timedelta(days=1)
+        PurchaseOrder.objects.update(response_seconds=None, is_on_time=None, last_modified=stale)
+        migration = importlib.import_module('app.migrations.0008_purchase_order_derived_columns')
+        migration.backfill_derived_columns(apps, None)
+
+        acked_version = acked.version
+        acked.refresh_from_db()
+        self.assertEqual(acked.response_seconds, 2 * 3600)
+        self.assertTrue(acked.is_on_time)
+        self.assertEqual(acked.version, acked_version + 1)
+        self.assertGreater(acked.last_modified, stale)
+        version = pending.version
+        pending.refresh_from_db()
+        self.assertIsNone(pending.response_seconds)
+        self.assertEqual(pending.version, version)
+        self.assertEqual(pending.last_modified, stale)
+
+
+class MetricDependencyTest(APITestCase):
+    """Test PO saves only recompute the metrics that read the changed fields"""
+
+    def setUp(self):
+        caches['tokens'].clear()
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+        self.vendor = Vendor.objects.create(
+            name='Test Vendor',
+            contact_details='test@vendor.com',
+            address='123 Test St',
+            vendor_code='VEN001',
+            on_time_delivery_rate=0.0,
+            quality_rating_avg=0.0,
+            average_response_time=0.0,
+            fulfillment_rate=0.0
+        )
+        self.issue_date = timezone.now() - timedelta(hours=5)
+        self.po = PurchaseOrder.objects.create(
+            po_number='PO001',
+            vendor=self.vendor,
+            order_date=self.issue_date,
+            delivery_date=timezone.now() + timedelta(days=7),
+            items={"item1": "Product A"},
+            quantity=10,
+            status='completed',
+            quality_rating=4.0,
+            issue_date=self.issue_date,
+        )
+
+    def vendor_version(self):
+        return Vendor.objects.values_list('version', flat=True).get(pk=self.vendor.pk)
+
+    def test_dependency_map_covers_counters(self):
+        """Test every counter and metric declares its inputs"""
+        attnames = {field.attname for field in PurchaseOrder._meta.concrete_fields}
+        self.assertEqual(set(metrics.COUNTER_INPUTS), set(metrics.ROLLUP_FIELDS))
+        self.assertLessEqual(metrics.ORDER_METRIC_INPUTS, attnames)
+        self.assertNotIn('items', metrics.ORDER_METRIC_INPUTS)
+        self.assertEqual(
+            metrics.metrics_reading({'response_time_sum'}), ('average_response_time',)
+        )
+        self.assertEqual(
+            metrics.metrics_reading({'completed_count'}),
+            ('on_time_delivery_rate', 'fulfillment_rate'),
+        )
+
+    def test_irrelevant_save_skips_metrics(self):
+        """Test a save changing only items and quantity writes nothing but the order"""
+        version = self.vendor_version()
+        po = PurchaseOrder.objects.get(pk=self.po.pk)
+        po.items = {"item1": "Product B"}
+        po.quantity = 20
+        with self.assertNumQueries(1):
+            po.save()
+        self.assertEqual(self.vendor_version(), version)
+
+        # Hand-built orders skip the state lookup too: UPDATE, then read back
+        # the version bumped in SQL
+        with self.assertNumQueries(2):
+            PurchaseOrder(pk=self.po.pk, items={}).save(update_fields=['items'])
+        self.assertEqual(self.vendor_version(), version)
+
+    def test_only_affected_metrics_written(self):
+        """Test an acknowledgment only rewrites the response time"""
+        Vendor.objects.filter(pk=self.vendor.pk).update(quality_rating_avg=1.5)
+        po = PurchaseOrder.objects.get(pk=self.po.pk)
+        po.acknowledgment_date = self.issue_date + timedelta(hours=2)
+        po.save()
+        self.vendor.refresh_from_db()
+        self.assertAlmostEqual(self.vendor.average_response_time, 2.0)
+        self.assertEqual(self.vendor.quality_rating_avg, 1.5)
+
+        po.quality_rating = 2.0
+        po.save()
+        self.vendor.refresh_from_db()
+        self.assertEqual(self.vendor.quality_rating_avg, 2.0)
+
+    def test_unsaved_changes_not_forgotten(self):
+        """Test fields left out of update_fields still count when saved later"""
+        po = PurchaseOrder.objects.get(pk=self.po.pk)
+        po.quality_rating = 2.0
+        po.items = {"item1": "Product B"}
+        po.save(update_fields=['items'])
+        self.vendor.refresh_from_db()
+        self.assertEqual(self.vendor.quality_rating_avg, 4.0)
+
+        po.quantity = 20
+        po.save(update_fields=['quality_rating', 'quantity'])
+        self.vendor.refresh_from_db()
+        self.assertEqual(self.vendor.quality_rating_avg, 2.0)
+        self.assertEqual(self.vendor.metric_counters.rating_sum, 2.0)
+
+    def test_acknowledge_uses_update_fields(self):
+        """Test acknowledging writes only the acknowledgment and its derived columns"""
+        url = f'/api/purchase_orders/{self.po.id}/acknowledge/'
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        update = next(
+            query['sql'] for query in queries
+            if query['sql'].startswith('UPDATE "app_purchaseorder"')
+        )
+        self.assertIn('"response_seconds"', update)
+        self.assertNotIn('"items"', update)
+        self.po.refresh_from_db()
+        self.assertIsNotNone(self.po.response_seconds)
+        self.vendor.refresh_from_db()
+        self.assertGreater(self.vendor.average_response_time, 0)